@@ -1,21 +1,129 @@
 # backup_manager.py
 
 import os
+import sys
 import shutil
 import sqlite3
 import gzip
 import json
+import subprocess
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import schedule
 import time
 import threading
+from contextlib import closing
+import hashlib
+import struct
+from sqlalchemy.engine import make_url
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import get_database_url, is_postgres
+from utils.sqlite_pool import apply_pragmas
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Online (SQLite backup API) settings: pages copied per step and the pause between
+# steps, during which writers get the database back.
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.05"))
+# A write from another connection restarts the copy; after this many restarts the
+# remaining pages are copied in a single step.
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "5"))
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "zstd" if zstandard else "gzip")
+if BACKUP_COMPRESSION == "zstd" and zstandard is None:
+    BACKUP_COMPRESSION = "gzip"
+BACKUP_CHECKSUM_ALGORITHM = "sha256"
+BACKUP_CHUNK_SIZE = 1024 * 1024
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+# Incremental backups store only the pages whose digest differs from the parent
+# backup's page manifest.
+MANIFEST_MAGIC = b"SSTDMSM1"
+DELTA_MAGIC = b"SSTDMSD1"
+PAGE_DIGEST_SIZE = 16
+
+class _BackupRestarted(Exception):
+    """Raised from the progress callback to abandon a copy that keeps restarting."""
+
+class _PageManifest:
+    """Per-page digests of a database snapshot (one file next to each online backup)."""
+    
+    def __init__(self, page_size: int, digests: bytes = b""):
+        self.page_size = page_size
+        self.digests = bytearray(digests)
+        self.changed_pages = 0  # pages written to the delta this manifest was built for
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.digests) // PAGE_DIGEST_SIZE
+    
+    def add(self, page: bytes) -> bytes:
+        digest = hashlib.blake2b(page, digest_size=PAGE_DIGEST_SIZE).digest()
+        self.digests += digest
+        return digest
+    
+    def get(self, page_number: int) -> Optional[bytes]:
+        """Digest of a 1-based page number, or None past the end."""
+        start = (page_number - 1) * PAGE_DIGEST_SIZE
+        return bytes(self.digests[start:start + PAGE_DIGEST_SIZE]) if page_number <= self.page_count else None
+    
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(MANIFEST_MAGIC + struct.pack(">I", self.page_size) + self.digests)
+    
+    @classmethod
+    def load(cls, path: str) -> "_PageManifest":
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MANIFEST_MAGIC)] != MANIFEST_MAGIC:
+            raise ValueError(f"Not a page manifest: {path}")
+        header_size = len(MANIFEST_MAGIC) + 4
+        page_size, = struct.unpack(">I", data[len(MANIFEST_MAGIC):header_size])
+        return cls(page_size, data[header_size:])
+
+def _read_page_size(db_path: str) -> int:
+    """Page size from the SQLite file header (stored as 1 for 65536)."""
+    with open(db_path, "rb") as f:
+        header = f.read(18)
+    page_size, = struct.unpack(">H", header[16:18])
+    return 65536 if page_size == 1 else page_size
+
+def _read_exact(stream, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+    
+    def __init__(self, fileobj, algorithm: str = BACKUP_CHECKSUM_ALGORITHM):
+        self.fileobj = fileobj
+        self.hash = hashlib.new(algorithm)
+    
+    def write(self, data) -> int:
+        self.hash.update(data)
+        return self.fileobj.write(data)
+    
+    def flush(self):
+        self.fileobj.flush()
 
 class BackupManager:
     """Comprehensive backup management system for SSTDMS database."""
     
-    def __init__(self, db_path: str = "./src/database/app.db", backup_dir: str = "./backups"):
+    def __init__(self, db_path: str = "./src/database/app.db", backup_dir: str = "./backups",
+                 database_url: Optional[str] = None):
         self.db_path = db_path
+        self.database_url = database_url or get_database_url(db_path)
+        self.postgres = is_postgres(self.database_url)
         self.backup_dir = backup_dir
         self.ensure_backup_directory()
         self.backup_metadata_file = os.path.join(backup_dir, "backup_metadata.json")
@@ -47,19 +155,33 @@ class BackupManager:
         except Exception as e:
             print(f"Error saving backup metadata: {e}")
     
-    def create_backup(self, backup_type: str = "manual", compress: bool = True) -> Optional[str]:
-        """Create a database backup."""
+    def create_backup(self, backup_type: str = "manual", compress: bool = True,
+                      online: bool = True) -> Optional[str]:
+        """Create a database backup.
+        
+        SQLite backups are taken online by default: pages are copied through the
+        SQLite backup API in small steps, so the app keeps writing and the copy is
+        always a consistent database. ``online=False`` keeps the old file copy.
+        """
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"sstdms_backup_{timestamp}.db"
+            backup_filename = f"sstdms_backup_{timestamp}.dump" if self.postgres else f"sstdms_backup_{timestamp}.db"
             
-            if compress:
-                backup_filename += ".gz"
+            compression = None
+            if compress and not self.postgres:
+                compression = BACKUP_COMPRESSION if online else "gzip"
+                backup_filename += COMPRESSION_EXTENSIONS[compression]
             
             backup_path = os.path.join(self.backup_dir, backup_filename)
             
             # Create backup
-            if compress:
+            checksum = manifest = None
+            if self.postgres:
+                self._create_postgres_backup(backup_path, compress)
+            elif online:
+                checksum, manifest = self._create_online_backup(backup_path, compression)
+                manifest.save(f"{backup_path}.pages")
+            elif compress:
                 self._create_compressed_backup(backup_path)
             else:
                 shutil.copy2(self.db_path, backup_path)
@@ -73,10 +195,20 @@ class BackupManager:
                 "path": backup_path,
                 "created_at": datetime.now().isoformat(),
                 "type": backup_type,
+                "engine": "postgresql" if self.postgres else "sqlite",
                 "size": file_size,
                 "compressed": compress,
-                "checksum": self._calculate_checksum(backup_path)
+                "compression": compression,
+                "online": online and not self.postgres,
+                "checksum_algorithm": BACKUP_CHECKSUM_ALGORITHM,
+                "checksum": checksum or self._calculate_checksum(backup_path, BACKUP_CHECKSUM_ALGORITHM)
             }
+            if manifest:
+                backup_info.update({
+                    "kind": "full",
+                    "manifest": f"{backup_path}.pages",
+                    "page_count": manifest.page_count
+                })
             
             self.metadata["backups"].append(backup_info)
             self.save_metadata()
@@ -90,20 +222,209 @@ class BackupManager:
             print(f"Backup creation failed: {str(e)}")
             return None
     
+    def create_incremental_backup(self, backup_type: str = "incremental", compress: bool = True,
+                                  differential: bool = False) -> Optional[str]:
+        """Store only the pages changed since the previous online backup (SQLite).
+        
+        Incremental backups chain from the latest online backup; differential ones
+        always diff against the latest full backup, so a restore needs at most one
+        delta. Falls back to a full backup when there is nothing to chain from.
+        """
+        if self.postgres:
+            print("Incremental backups are only supported for SQLite; creating a full backup")
+            return self.create_backup(backup_type, compress)
+        
+        parent = self._latest_chain_backup()
+        if parent and differential:
+            parent = self._backup_chain(parent)[0]
+        if not parent:
+            return self.create_backup(backup_type, compress)
+        
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            compression = BACKUP_COMPRESSION if compress else None
+            backup_filename = f"sstdms_backup_{timestamp}.delta" + (COMPRESSION_EXTENSIONS[compression] if compression else "")
+            backup_path = os.path.join(self.backup_dir, backup_filename)
+            
+            parent_manifest = _PageManifest.load(parent["manifest"])
+            checksum, manifest = self._create_online_backup(backup_path, compression, parent_manifest)
+            manifest.save(f"{backup_path}.pages")
+            
+            file_size = os.path.getsize(backup_path)
+            backup_info = {
+                "filename": backup_filename,
+                "path": backup_path,
+                "created_at": datetime.now().isoformat(),
+                "type": backup_type,
+                "engine": "sqlite",
+                "size": file_size,
+                "compressed": compress,
+                "compression": compression,
+                "online": True,
+                "kind": "differential" if differential else "incremental",
+                "parent": parent["filename"],
+                "manifest": f"{backup_path}.pages",
+                "page_count": manifest.page_count,
+                "changed_pages": manifest.changed_pages,
+                "checksum_algorithm": BACKUP_CHECKSUM_ALGORITHM,
+                "checksum": checksum
+            }
+            
+            self.metadata["backups"].append(backup_info)
+            self.save_metadata()
+            
+            print(f"Incremental backup created successfully: {backup_path}")
+            print(f"Changed pages: {manifest.changed_pages}/{manifest.page_count} ({self._format_size(file_size)})")
+            
+            return backup_path
+            
+        except Exception as e:
+            print(f"Incremental backup failed: {str(e)}")
+            return None
+    
+    def _latest_chain_backup(self) -> Optional[Dict]:
+        """Newest online SQLite backup with a page manifest that a delta can build on."""
+        for backup in self.list_backups():
+            if backup.get("manifest") and os.path.exists(backup["manifest"]) and os.path.exists(backup["path"]):
+                return backup
+        return None
+    
+    def _backup_chain(self, backup_info: Dict) -> List[Dict]:
+        """Full backup followed by the deltas needed to rebuild backup_info, oldest first."""
+        chain = [backup_info]
+        while chain[0].get("parent"):
+            parent = self._get_backup_info(chain[0]["parent"])
+            if not parent:
+                raise RuntimeError(f"Backup chain is broken: {chain[0]['parent']} is missing")
+            chain.insert(0, parent)
+        return chain
+    
     def _create_compressed_backup(self, backup_path: str):
         """Create a compressed backup."""
         with open(self.db_path, 'rb') as f_in:
             with gzip.open(backup_path, 'wb') as f_out:
                 shutil.copyfileobj(f_in, f_out)
     
-    def _calculate_checksum(self, file_path: str) -> str:
-        """Calculate MD5 checksum of a file."""
-        import hashlib
-        hash_md5 = hashlib.md5()
+    def _create_online_backup(self, backup_path: str, compression: Optional[str] = None,
+                              parent: Optional[_PageManifest] = None) -> tuple:
+        """Snapshot the live database with the backup API, then compress and hash it in one pass.
+        
+        The same pass builds the page manifest. With a parent manifest only the
+        changed pages are written (delta format). Returns (checksum of the file
+        written to backup_path, manifest).
+        """
+        snapshot_path = f"{backup_path}.snapshot"
+        partial_path = f"{backup_path}.partial"
+        try:
+            self._copy_online(self.db_path, snapshot_path)
+            page_size = _read_page_size(snapshot_path)
+            manifest = _PageManifest(page_size)
+            
+            with open(snapshot_path, "rb") as f_in, open(partial_path, "wb") as f_out:
+                writer = _HashingWriter(f_out)
+                if compression == "zstd":
+                    stream = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(writer, closefd=False)
+                elif compression == "gzip":
+                    stream = gzip.GzipFile(filename="", mode="wb", fileobj=writer, mtime=0)
+                else:
+                    stream = writer
+                if parent is not None:
+                    page_count = os.path.getsize(snapshot_path) // page_size
+                    stream.write(DELTA_MAGIC + struct.pack(">II", page_size, page_count))
+                
+                for chunk in iter(lambda: f_in.read(BACKUP_CHUNK_SIZE), b""):
+                    for offset in range(0, len(chunk), page_size):
+                        page = chunk[offset:offset + page_size]
+                        digest = manifest.add(page)
+                        if parent is not None and (parent.page_size != page_size
+                                                   or parent.get(manifest.page_count) != digest):
+                            stream.write(struct.pack(">I", manifest.page_count) + page)
+                            manifest.changed_pages += 1
+                    if parent is None:
+                        stream.write(chunk)
+                
+                if stream is not writer:
+                    stream.close()
+                f_out.flush()
+                os.fsync(f_out.fileno())
+            
+            os.replace(partial_path, backup_path)
+            return writer.hash.hexdigest(), manifest
+        finally:
+            for path in (snapshot_path, partial_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _copy_online(self, source_path: str, target_path: str,
+                     pages: int = BACKUP_PAGES_PER_STEP, sleep: float = BACKUP_STEP_SLEEP):
+        """Copy a live SQLite database page batch by page batch (sqlite3.Connection.backup)."""
+        progress = {"remaining": None, "restarts": 0}
+        
+        def on_progress(status, remaining, total):
+            # remaining only grows when another connection wrote and the copy restarted
+            if progress["remaining"] is not None and remaining > progress["remaining"]:
+                progress["restarts"] += 1
+                if progress["restarts"] > BACKUP_MAX_RESTARTS:
+                    raise _BackupRestarted()
+            progress["remaining"] = remaining
+        
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            apply_pragmas(source)
+            try:
+                source.backup(target, pages=pages, progress=on_progress, sleep=sleep)
+            except _BackupRestarted:
+                source.backup(target, pages=-1)
+        finally:
+            target.close()
+            source.close()
+    
+    def _postgres_command(self, program: str) -> tuple:
+        """Command line and environment for pg_dump / pg_restore.
+        
+        The password goes through PGPASSWORD so it never shows up in the process list.
+        """
+        url = make_url(self.database_url)
+        command = [program, "--dbname", url.database]
+        if url.host:
+            command += ["--host", url.host]
+        if url.port:
+            command += ["--port", str(url.port)]
+        if url.username:
+            command += ["--username", url.username]
+        
+        env = dict(os.environ)
+        if url.password:
+            env["PGPASSWORD"] = str(url.password)
+        if url.query.get("sslmode"):
+            env["PGSSLMODE"] = url.query["sslmode"]
+        return command, env
+    
+    def _create_postgres_backup(self, backup_path: str, compress: bool):
+        """Dump a PostgreSQL database in pg_dump custom format (consistent snapshot)."""
+        command, env = self._postgres_command("pg_dump")
+        command += ["--format=custom", f"--compress={6 if compress else 0}", "--file", backup_path]
+        self._run_postgres_tool(command, env)
+    
+    def _restore_postgres_backup(self, backup_path: str):
+        """Replace the PostgreSQL database contents with a pg_dump archive in one transaction."""
+        command, env = self._postgres_command("pg_restore")
+        command += ["--clean", "--if-exists", "--no-owner", "--single-transaction", backup_path]
+        self._run_postgres_tool(command, env)
+    
+    def _run_postgres_tool(self, command: List[str], env: Dict[str, str]):
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{command[0]} failed: {result.stderr.strip()}")
+    
+    def _calculate_checksum(self, file_path: str, algorithm: str = "md5") -> str:
+        """Calculate the checksum of a file (MD5 for backups made before sha256 was recorded)."""
+        file_hash = hashlib.new(algorithm)
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            for chunk in iter(lambda: f.read(BACKUP_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
     
     def _format_size(self, size_bytes: int) -> str:
         """Format file size in human readable format."""
@@ -135,7 +456,11 @@ class BackupManager:
                 return False
             
             # Restore from backup
-            if backup_info["compressed"]:
+            if backup_info.get("engine") == "postgresql":
+                self._restore_postgres_backup(backup_path)
+            elif backup_info.get("online"):
+                self._restore_online_backup(backup_info)
+            elif backup_info["compressed"]:
                 self._restore_compressed_backup(backup_path)
             else:
                 shutil.copy2(backup_path, self.db_path)
@@ -153,6 +478,82 @@ class BackupManager:
             with open(self.db_path, 'wb') as f_out:
                 shutil.copyfileobj(f_in, f_out)
     
+    def restore_to_point_in_time(self, point_in_time: datetime) -> bool:
+        """Restore the newest backup taken at or before point_in_time (full + deltas)."""
+        candidates = [
+            b for b in self.list_backups()
+            if b.get("engine", "sqlite") == ("postgresql" if self.postgres else "sqlite")
+            and b["type"] != "pre_restore"
+            and datetime.fromisoformat(b["created_at"]) <= point_in_time
+        ]
+        if not candidates:
+            print(f"No backup found at or before {point_in_time.isoformat()}")
+            return False
+        print(f"Restoring {candidates[0]['filename']} ({candidates[0]['created_at']})")
+        return self.restore_backup(candidates[0]["filename"])
+    
+    def _restore_online_backup(self, backup_info: Dict):
+        """Restore through the backup API so open connections and the WAL stay consistent.
+        
+        Incremental backups are rebuilt from their full backup and delta chain first.
+        """
+        restore_path = f"{self.db_path}.restore"
+        try:
+            self._materialize_backup(backup_info, restore_path)
+            with closing(sqlite3.connect(restore_path)) as check:
+                result = check.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise RuntimeError(f"Rebuilt database failed quick_check: {result}")
+            self._copy_online(restore_path, self.db_path, pages=-1)
+        finally:
+            if os.path.exists(restore_path):
+                os.remove(restore_path)
+    
+    def _materialize_backup(self, backup_info: Dict, target_path: str):
+        """Write the database as of backup_info to target_path."""
+        chain = self._backup_chain(backup_info)
+        for link in chain:
+            if not self._verify_backup_integrity(link):
+                raise RuntimeError(f"Backup integrity check failed: {link['filename']}")
+        
+        base = chain[0]
+        if base.get("compression") or base["compressed"]:
+            with self._open_backup(base["path"], base.get("compression") or "gzip") as f_in, \
+                    open(target_path, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out, BACKUP_CHUNK_SIZE)
+        else:
+            shutil.copy2(base["path"], target_path)
+        
+        for delta in chain[1:]:
+            self._apply_delta(delta, target_path)
+    
+    def _apply_delta(self, delta_info: Dict, target_path: str):
+        """Write a delta's pages into target_path and truncate it to the delta's page count."""
+        compression = delta_info.get("compression")
+        stream = self._open_backup(delta_info["path"], compression) if compression else open(delta_info["path"], "rb")
+        with stream, open(target_path, "r+b") as f_out:
+            header = _read_exact(stream, len(DELTA_MAGIC) + 8)
+            if header[:len(DELTA_MAGIC)] != DELTA_MAGIC:
+                raise RuntimeError(f"Not an incremental backup: {delta_info['filename']}")
+            page_size, page_count = struct.unpack(">II", header[len(DELTA_MAGIC):])
+            while True:
+                record = _read_exact(stream, 4 + page_size)
+                if not record:
+                    break
+                if len(record) != 4 + page_size:
+                    raise RuntimeError(f"Truncated incremental backup: {delta_info['filename']}")
+                page_number, = struct.unpack(">I", record[:4])
+                f_out.seek((page_number - 1) * page_size)
+                f_out.write(record[4:])
+            f_out.truncate(page_count * page_size)
+    
+    def _open_backup(self, backup_path: str, compression: str):
+        if compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to restore .zst backups")
+            return zstandard.ZstdDecompressor().stream_reader(open(backup_path, "rb"), closefd=True)
+        return gzip.open(backup_path, "rb")
+    
     def _get_backup_info(self, backup_filename: str) -> Optional[Dict]:
         """Get backup information by filename."""
         for backup in self.metadata["backups"]:
@@ -163,7 +564,9 @@ class BackupManager:
     def _verify_backup_integrity(self, backup_info: Dict) -> bool:
         """Verify backup file integrity using checksum."""
         try:
-            current_checksum = self._calculate_checksum(backup_info["path"])
+            current_checksum = self._calculate_checksum(
+                backup_info["path"], backup_info.get("checksum_algorithm", "md5")
+            )
             return current_checksum == backup_info["checksum"]
         except Exception as e:
             print(f"Integrity check failed: {e}")
@@ -184,9 +587,10 @@ class BackupManager:
                 print(f"Backup not found: {backup_filename}")
                 return False
             
-            # Remove file
-            if os.path.exists(backup_info["path"]):
-                os.remove(backup_info["path"])
+            # Remove file (and its page manifest)
+            for path in (backup_info["path"], backup_info.get("manifest")):
+                if path and os.path.exists(path):
+                    os.remove(path)
             
             # Remove from metadata
             self.metadata["backups"] = [
@@ -213,11 +617,26 @@ class BackupManager:
         backups_to_keep = backups[:keep_count]
         backups_to_check = backups[keep_count:]
         
-        for backup in backups_to_check:
-            backup_date = datetime.fromisoformat(backup["created_at"])
-            if backup_date < cutoff_date:
-                if self.delete_backup(backup["filename"]):
-                    deleted_count += 1
+        expired = [
+            backup for backup in backups_to_check
+            if datetime.fromisoformat(backup["created_at"]) < cutoff_date
+        ]
+        
+        # Full backups and deltas that a retained incremental is built on stay
+        required = set()
+        for backup in backups:
+            if backup in expired:
+                continue
+            try:
+                required.update(link["filename"] for link in self._backup_chain(backup))
+            except RuntimeError as e:
+                print(f"Warning: {e}")
+        
+        for backup in expired:
+            if backup["filename"] in required:
+                continue
+            if self.delete_backup(backup["filename"]):
+                deleted_count += 1
         
         print(f"Cleaned up {deleted_count} old backups")
         return deleted_count
@@ -255,15 +674,21 @@ class BackupManager:
             "backup_types": backup_types
         }
     
-    def setup_automatic_backups(self, interval_hours: int = 24):
-        """Setup automatic backup scheduling."""
+    def setup_automatic_backups(self, interval_hours: int = 24, incremental_interval_hours: Optional[int] = None):
+        """Setup automatic backup scheduling (optionally with incremental backups in between)."""
         def backup_job():
             print(f"Running automatic backup at {datetime.now()}")
             self.create_backup("automatic")
             self.cleanup_old_backups()
         
+        def incremental_job():
+            print(f"Running automatic incremental backup at {datetime.now()}")
+            self.create_incremental_backup("automatic_incremental")
+        
         # Schedule backup
         schedule.every(interval_hours).hours.do(backup_job)
+        if incremental_interval_hours and not self.postgres:
+            schedule.every(incremental_interval_hours).hours.do(incremental_job)
         
         # Start scheduler in background thread
         def run_scheduler():
@@ -275,6 +700,8 @@ class BackupManager:
         scheduler_thread.start()
         
         print(f"Automatic backups scheduled every {interval_hours} hours")
+        if incremental_interval_hours and not self.postgres:
+            print(f"Incremental backups scheduled every {incremental_interval_hours} hours")
     
     def export_backup_report(self, output_file: str = None) -> str:
         """Export backup report to file."""
@@ -289,7 +716,7 @@ class BackupManager:
             "SSTDMS Database Backup Report",
             "=" * 40,
             f"Generated: {datetime.now().isoformat()}",
-            f"Database: {self.db_path}",
+            f"Database: {make_url(self.database_url).render_as_string(hide_password=True) if self.postgres else self.db_path}",
             f"Backup Directory: {self.backup_dir}",
             "",
             "Statistics:",
@@ -326,6 +753,21 @@ class BackupManager:
 
 # Example usage and testing
 if __name__ == "__main__":
+    # Commands: incremental [--differential] | restore <filename> | restore-at <ISO time>
+    if len(sys.argv) > 1:
+        backup_manager = BackupManager()
+        command = sys.argv[1]
+        if command == "incremental":
+            ok = backup_manager.create_incremental_backup(differential="--differential" in sys.argv) is not None
+        elif command == "restore" and len(sys.argv) > 2:
+            ok = backup_manager.restore_backup(sys.argv[2])
+        elif command == "restore-at" and len(sys.argv) > 2:
+            ok = backup_manager.restore_to_point_in_time(datetime.fromisoformat(sys.argv[2]))
+        else:
+            print("Usage: backup_manager.py [incremental [--differential] | restore <filename> | restore-at <ISO time>]")
+            ok = False
+        sys.exit(0 if ok else 1)
+    
     # Initialize backup manager
     backup_manager = BackupManager()
     
@@ -1,23 +1,39 @@
 # migration_scripts.py
 
-import sqlite3
 import os
+import sys
+from contextlib import closing
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import open_connection, get_database_url, is_postgres
 
 class DatabaseMigration:
     """Database migration system for SSTDMS."""
     
-    def __init__(self, db_path: str = "./src/database/app.db"):
+    def __init__(self, db_path: str = "./src/database/app.db", database_url: Optional[str] = None):
         self.db_path = db_path
+        self.database_url = database_url or get_database_url(db_path)
+        self.postgres = is_postgres(self.database_url)
         self.migration_table = "schema_migrations"
         self.ensure_migration_table()
     
+    def _connect(self):
+        """Open a connection to the configured engine (SQLite file or PostgreSQL)."""
+        return closing(open_connection(self.database_url, self.db_path))
+    
+    def _portable_sql(self, command: str) -> str:
+        """Adapt SQLite DDL to the configured engine."""
+        if self.postgres:
+            return command.replace("INTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY")
+        return command
+    
     def ensure_migration_table(self):
         """Create migration tracking table if it doesn't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"""
+            cursor.execute(self._portable_sql(f"""
                 CREATE TABLE IF NOT EXISTS {self.migration_table} (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     version TEXT UNIQUE NOT NULL,
@@ -25,30 +41,30 @@ class DatabaseMigration:
                     executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     success BOOLEAN DEFAULT TRUE
                 )
-            """)
+            """))
             conn.commit()
     
     def get_executed_migrations(self) -> List[str]:
         """Get list of already executed migrations."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"SELECT version FROM {self.migration_table} WHERE success = 1")
+            cursor.execute(f"SELECT version FROM {self.migration_table} WHERE success = TRUE")
             return [row[0] for row in cursor.fetchall()]
     
     def execute_migration(self, version: str, description: str, sql_commands: List[str]) -> bool:
         """Execute a migration and record it."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Execute migration commands
                 for command in sql_commands:
-                    cursor.execute(command)
+                    cursor.execute(self._portable_sql(command))
                 
                 # Record migration
                 cursor.execute(f"""
                     INSERT INTO {self.migration_table} (version, description, success)
-                    VALUES (?, ?, 1)
+                    VALUES (?, ?, TRUE)
                 """, (version, description))
                 
                 conn.commit()
@@ -58,11 +74,11 @@ class DatabaseMigration:
         except Exception as e:
             print(f"Migration {version} failed: {str(e)}")
             # Record failed migration
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"""
                     INSERT INTO {self.migration_table} (version, description, success)
-                    VALUES (?, ?, 0)
+                    VALUES (?, ?, FALSE)
                 """, (version, f"{description} - FAILED: {str(e)}"))
                 conn.commit()
             return False
@@ -84,8 +100,8 @@ class DatabaseMigration:
                         hashed_password TEXT NOT NULL,
                         salt TEXT NOT NULL,
                         email TEXT UNIQUE NOT NULL,
-                        is_active BOOLEAN DEFAULT 1,
-                        is_admin BOOLEAN DEFAULT 0,
+                        is_active BOOLEAN DEFAULT TRUE,
+                        is_admin BOOLEAN DEFAULT FALSE,
                         role TEXT DEFAULT 'user',
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -177,7 +193,7 @@ class DatabaseMigration:
                         title TEXT NOT NULL,
                         message TEXT NOT NULL,
                         type TEXT DEFAULT 'info',
-                        is_read BOOLEAN DEFAULT 0,
+                        is_read BOOLEAN DEFAULT FALSE,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         FOREIGN KEY (user_id) REFERENCES users_enhanced(id)
                     )
@@ -185,6 +201,122 @@ class DatabaseMigration:
                     "CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id)",
                     "CREATE INDEX IF NOT EXISTS idx_notifications_is_read ON notifications(is_read)"
                 ]
+            },
+            {
+                "version": "006_create_file_management_tables",
+                "description": "Create tables used by the file management and local storage routes",
+                "commands": [
+                    """
+                    CREATE TABLE IF NOT EXISTS project_folders_enhanced (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_id VARCHAR(50) NOT NULL,
+                        folder_name VARCHAR(100) NOT NULL,
+                        folder_type VARCHAR(50) NOT NULL,
+                        parent_folder_id INTEGER,
+                        folder_path VARCHAR(500) NOT NULL,
+                        description TEXT,
+                        access_level VARCHAR(20) DEFAULT 'project',
+                        created_by INTEGER NOT NULL,
+                        created_at TIMESTAMP,
+                        updated_at TIMESTAMP,
+                        UNIQUE (project_id, folder_path)
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS project_files_enhanced (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_id VARCHAR(50) NOT NULL,
+                        folder_id INTEGER NOT NULL,
+                        file_name VARCHAR(255) NOT NULL,
+                        original_name VARCHAR(255) NOT NULL,
+                        file_path VARCHAR(500) NOT NULL,
+                        file_size BIGINT,
+                        file_type VARCHAR(50),
+                        mime_type VARCHAR(100),
+                        file_hash VARCHAR(64),
+                        version VARCHAR(20) DEFAULT '1.0',
+                        is_encrypted BOOLEAN DEFAULT FALSE,
+                        watermark_applied BOOLEAN DEFAULT FALSE,
+                        access_level VARCHAR(20) DEFAULT 'project',
+                        download_count INTEGER DEFAULT 0,
+                        last_accessed TIMESTAMP,
+                        metadata TEXT,
+                        created_by INTEGER NOT NULL,
+                        created_at TIMESTAMP,
+                        updated_at TIMESTAMP,
+                        FOREIGN KEY (folder_id) REFERENCES project_folders_enhanced(id)
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS file_versions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        file_id INTEGER NOT NULL,
+                        version VARCHAR(20) NOT NULL,
+                        file_path VARCHAR(500) NOT NULL,
+                        file_size BIGINT,
+                        file_hash VARCHAR(64),
+                        change_description TEXT,
+                        created_by INTEGER NOT NULL,
+                        created_at TIMESTAMP,
+                        FOREIGN KEY (file_id) REFERENCES project_files_enhanced(id)
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS file_permissions_enhanced (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        file_id INTEGER NOT NULL,
+                        user_id INTEGER,
+                        role VARCHAR(50),
+                        permission_type VARCHAR(20) NOT NULL,
+                        granted_by INTEGER NOT NULL,
+                        granted_at TIMESTAMP,
+                        expires_at TIMESTAMP,
+                        UNIQUE (file_id, user_id, role),
+                        FOREIGN KEY (file_id) REFERENCES project_files_enhanced(id)
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS file_access_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        file_id INTEGER NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        action VARCHAR(50) NOT NULL,
+                        ip_address VARCHAR(45),
+                        user_agent VARCHAR(500),
+                        success BOOLEAN DEFAULT TRUE,
+                        error_message TEXT,
+                        accessed_at TIMESTAMP
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS storage_usage (
+                        scope TEXT NOT NULL,
+                        file_type TEXT NOT NULL DEFAULT '',
+                        total_size BIGINT NOT NULL DEFAULT 0,
+                        file_count INTEGER NOT NULL DEFAULT 0,
+                        updated_at TEXT,
+                        PRIMARY KEY (scope, file_type)
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS storage_usage_state (
+                        name TEXT PRIMARY KEY,
+                        value TEXT
+                    )
+                    """,
+                    """
+                    CREATE TABLE IF NOT EXISTS file_blobs (
+                        blob_path TEXT PRIMARY KEY,
+                        sha256 TEXT NOT NULL,
+                        size BIGINT NOT NULL,
+                        ref_count INTEGER NOT NULL DEFAULT 0,
+                        created_at TEXT,
+                        updated_at TEXT
+                    )
+                    """,
+                    "CREATE INDEX IF NOT EXISTS idx_project_files_enhanced_project_created ON project_files_enhanced(project_id, created_at, id)",
+                    "CREATE INDEX IF NOT EXISTS idx_file_access_logs_user_action_date ON file_access_logs(user_id, action, accessed_at)"
+                ]
             }
         ]
         
@@ -206,7 +338,7 @@ class DatabaseMigration:
         """Rollback a specific migration (basic implementation)."""
         # This is a simplified rollback - in production, you'd want more sophisticated rollback scripts
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"DELETE FROM {self.migration_table} WHERE version = ?", (version,))
                 conn.commit()
@@ -218,7 +350,7 @@ class DatabaseMigration:
     
     def get_migration_status(self) -> List[Dict[str, Any]]:
         """Get status of all migrations."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
                 SELECT version, description, executed_at, success 
@@ -239,7 +371,7 @@ class DatabaseMigration:
 
 # Utility functions for common database operations
 def backup_database(db_path: str, backup_path: str = None) -> str:
-    """Create a backup of the database."""
+    """Create a backup of the database (SQLite file; use BackupManager for PostgreSQL)."""
     if backup_path is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"{db_path}.backup_{timestamp}"
@@ -254,9 +386,12 @@ def backup_database(db_path: str, backup_path: str = None) -> str:
         print(f"Backup failed: {str(e)}")
         raise
 
-def optimize_database(db_path: str):
+def optimize_database(db_path: str, database_url: Optional[str] = None):
     """Optimize database performance."""
-    with sqlite3.connect(db_path) as conn:
+    database_url = database_url or get_database_url(db_path)
+    with closing(open_connection(database_url, db_path)) as conn:
+        if is_postgres(database_url):
+            conn.autocommit = True  # VACUUM cannot run inside a transaction block
         cursor = conn.cursor()
         
         # Analyze tables for query optimization
@@ -266,7 +401,8 @@ def optimize_database(db_path: str):
         cursor.execute("VACUUM")
         
         # Update statistics
-        cursor.execute("PRAGMA optimize")
+        if not is_postgres(database_url):
+            cursor.execute("PRAGMA optimize")
         
         conn.commit()
         print("Database optimization completed")
@@ -1,53 +1,59 @@
 # optimization.py
 
+import os
+import sys
 import sqlite3
 import time
+from contextlib import closing
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import open_connection, get_database_url, is_postgres
+
 class DatabaseOptimizer:
     """Database optimization and performance monitoring system."""
     
-    def __init__(self, db_path: str = "./src/database/app.db"):
+    def __init__(self, db_path: str = "./src/database/app.db", database_url: Optional[str] = None):
         self.db_path = db_path
+        self.database_url = database_url or get_database_url(db_path)
+        self.postgres = is_postgres(self.database_url)
         self.performance_log = []
     
+    def _connect(self):
+        """Open a connection to the configured engine (SQLite file or PostgreSQL)."""
+        return closing(open_connection(self.database_url, self.db_path))
+    
     def analyze_database(self) -> Dict[str, Any]:
         """Analyze database structure and performance."""
         analysis_results = {}
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Get database size
-            cursor.execute("PRAGMA page_count")
-            page_count = cursor.fetchone()[0]
-            cursor.execute("PRAGMA page_size")
-            page_size = cursor.fetchone()[0]
+            page_count, page_size = self._page_stats(cursor)
             db_size = page_count * page_size
             
             # Get table information
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            tables = self._list_tables(cursor)
             
             table_info = {}
             for table in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
                 row_count = cursor.fetchone()[0]
                 
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
+                columns = self._table_columns(cursor, table)
                 
                 table_info[table] = {
                     "row_count": row_count,
                     "column_count": len(columns),
-                    "columns": [{"name": col[1], "type": col[2]} for col in columns]
+                    "columns": [{"name": col[0], "type": col[1]} for col in columns]
                 }
             
             # Get index information
-            cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type='index'")
-            indexes = cursor.fetchall()
+            indexes = self._list_indexes(cursor)
             
             analysis_results = {
                 "database_size": db_size,
@@ -62,6 +68,47 @@ class DatabaseOptimizer:
         
         return analysis_results
     
+    def _page_stats(self, cursor) -> tuple:
+        """(page count, page size) of the database."""
+        if self.postgres:
+            cursor.execute("SELECT pg_database_size(current_database()), current_setting('block_size')::int")
+            db_size, page_size = cursor.fetchone()
+            return db_size // page_size, page_size
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        return page_count, cursor.fetchone()[0]
+    
+    def _list_tables(self, cursor) -> List[str]:
+        if self.postgres:
+            cursor.execute("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = current_schema() AND table_type = 'BASE TABLE'
+            """)
+        else:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _table_columns(self, cursor, table: str) -> List[tuple]:
+        """(name, type) of each column of a table."""
+        if self.postgres:
+            cursor.execute("""
+                SELECT column_name, data_type FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ?
+                ORDER BY ordinal_position
+            """, (table,))
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [(col[1], col[2]) for col in cursor.fetchall()]
+    
+    def _list_indexes(self, cursor) -> List[tuple]:
+        """(index name, table name) of each index."""
+        if self.postgres:
+            cursor.execute("SELECT indexname, tablename FROM pg_indexes WHERE schemaname = current_schema()")
+        else:
+            cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type='index'")
+        return cursor.fetchall()
+    
     def optimize_database(self) -> Dict[str, Any]:
         """Perform comprehensive database optimization."""
         optimization_results = {
@@ -69,7 +116,9 @@ class DatabaseOptimizer:
             "operations": []
         }
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            if self.postgres:
+                conn.autocommit = True  # VACUUM cannot run inside a transaction block
             cursor = conn.cursor()
             
             # 1. Update table statistics
@@ -92,15 +141,17 @@ class DatabaseOptimizer:
                 "description": "Reclaimed unused space and defragmented database"
             })
             
-            # 3. Optimize query planner
-            start_time = time.time()
-            cursor.execute("PRAGMA optimize")
-            optimize_time = time.time() - start_time
-            optimization_results["operations"].append({
-                "operation": "PRAGMA optimize",
-                "duration": round(optimize_time, 3),
-                "description": "Optimized query planner statistics"
-            })
+            # 3. Optimize query planner (SQLite only; ANALYZE covers PostgreSQL)
+            optimize_time = 0
+            if not self.postgres:
+                start_time = time.time()
+                cursor.execute("PRAGMA optimize")
+                optimize_time = time.time() - start_time
+                optimization_results["operations"].append({
+                    "operation": "PRAGMA optimize",
+                    "duration": round(optimize_time, 3),
+                    "description": "Optimized query planner statistics"
+                })
             
             conn.commit()
         
@@ -144,17 +195,37 @@ class DatabaseOptimizer:
                 "sql": "CREATE INDEX IF NOT EXISTS idx_audit_log_user_action_date ON audit_log(user_id, action, created_at)",
                 "reason": "Optimize audit log queries"
             },
+            {
+                "table": "file_access_logs",
+                "index_name": "idx_file_access_logs_user_action_date",
+                "sql": "CREATE INDEX IF NOT EXISTS idx_file_access_logs_user_action_date ON file_access_logs(user_id, action, accessed_at)",
+                "reason": "Optimize file access log queries by user, action and date"
+            },
             {
                 "table": "notifications",
                 "index_name": "idx_notifications_user_read_date",
                 "sql": "CREATE INDEX IF NOT EXISTS idx_notifications_user_read_date ON notifications(user_id, is_read, created_at)",
                 "reason": "Optimize notification queries"
+            },
+            {
+                "table": "documents",
+                "index_name": "idx_documents_project_status_created",
+                "sql": "CREATE INDEX IF NOT EXISTS idx_documents_project_status_created ON documents(project_id, status, created_at, id)",
+                "reason": "Keyset pagination of document listings"
+            },
+            {
+                "table": "project_files_enhanced",
+                "index_name": "idx_project_files_enhanced_project_created",
+                "sql": "CREATE INDEX IF NOT EXISTS idx_project_files_enhanced_project_created ON project_files_enhanced(project_id, created_at, id)",
+                "reason": "Keyset pagination of project file listings"
             }
         ]
         
         created_indexes = []
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            if self.postgres:
+                conn.autocommit = True  # A failed index must not abort the others
             cursor = conn.cursor()
             
             for index_info in recommended_indexes:
@@ -182,11 +253,11 @@ class DatabaseOptimizer:
         """Monitor and log query performance."""
         start_time = time.time()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
-            # Enable query plan logging
-            cursor.execute("PRAGMA query_only = ON")
+            # Run the monitored query read-only
+            cursor.execute("SET TRANSACTION READ ONLY" if self.postgres else "PRAGMA query_only = ON")
             
             try:
                 # Execute query
@@ -199,16 +270,19 @@ class DatabaseOptimizer:
                 execution_time = time.time() - start_time
                 
                 # Get query plan
-                explain_query = f"EXPLAIN QUERY PLAN {query}"
-                cursor.execute(explain_query, params)
-                query_plan = cursor.fetchall()
+                if self.postgres:
+                    cursor.execute(f"EXPLAIN {query}", params)
+                    query_plan = [{"detail": row[0]} for row in cursor.fetchall()]
+                else:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                    query_plan = [{"id": row[0], "parent": row[1], "detail": row[3]} for row in cursor.fetchall()]
                 
                 performance_data = {
                     "query": query,
                     "params": params,
                     "execution_time": round(execution_time, 4),
                     "result_count": len(results),
-                    "query_plan": [{"id": row[0], "parent": row[1], "detail": row[3]} for row in query_plan],
+                    "query_plan": query_plan,
                     "timestamp": datetime.now().isoformat()
                 }
                 
@@ -225,7 +299,10 @@ class DatabaseOptimizer:
                     "timestamp": datetime.now().isoformat()
                 }
             finally:
-                cursor.execute("PRAGMA query_only = OFF")
+                if self.postgres:
+                    conn.rollback()
+                else:
+                    cursor.execute("PRAGMA query_only = OFF")
     
     def get_slow_queries(self, threshold_seconds: float = 0.1) -> List[Dict[str, Any]]:
         """Get queries that exceed the performance threshold."""
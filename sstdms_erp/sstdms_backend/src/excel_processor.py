@@ -5,12 +5,238 @@ Excel 파일 처리 유틸리티
 """
 
 import pandas as pd
+import numpy as np
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils.exceptions import InvalidFileException
 import os
+import zipfile
 from datetime import datetime, timedelta
 import json
+import time
+
+# 스트리밍 읽기 기본 청크 크기 (행)
+DEFAULT_CHUNK_SIZE = 1000
+
+# 도면 리스트 컬럼 너비 (template_columns 순서)
+COLUMN_WIDTHS = [5, 12, 25, 12, 12, 8, 12, 10, 5, 10, 12, 12, 20]
+
+# 내보내기용 공유 스타일 이름 (워크북당 한 번만 등록)
+STYLE_TITLE = 'sstdms_title'
+STYLE_INFO = 'sstdms_info'
+STYLE_HEADER = 'sstdms_header'
+STYLE_CELL = 'sstdms_cell'
+
+# 도면 리스트 컬럼 정의: (키, 종류, 기본값) - 엑셀 컬럼 순서와 동일
+# text: 문자열 변환, raw: 원본 값 유지
+DRAWING_LIST_FIELDS = [
+    ('no', 'text', ''),
+    ('common', 'text', ''),
+    ('dwg_name', 'text', ''),
+    ('type', 'text', ''),
+    ('start_date', 'raw', None),
+    ('duration_months', 'raw', 1),
+    ('finish_date', 'raw', None),
+    ('progress', 'raw', 0),
+    ('revision', 'text', 'A'),
+    ('status', 'text', 'DRAFT'),
+    ('issued_date', 'raw', None),
+    ('approved_by', 'text', ''),
+    ('remarks', 'text', '')
+]
+
+def _header_names(header, width):
+    """헤더 행을 pandas 와 같은 규칙의 컬럼명으로 변환 (빈 칸은 Unnamed, 중복은 .N)"""
+    names = []
+    seen = {}
+    for idx in range(width):
+        value = header[idx] if header and idx < len(header) else None
+        name = f'Unnamed: {idx}' if value is None or value == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def iter_excel_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None, header_row=0):
+    """엑셀 시트를 chunk_size 행 단위 DataFrame 으로 스트리밍 읽기
+    
+    openpyxl read_only 모드로 행을 순차적으로 읽으므로 시트 크기와 관계없이
+    메모리 사용량은 청크 크기에 비례합니다. 빈 행은 건너뛰지만 인덱스는 시트 전체
+    기준 행 번호 (header_row 다음 행 = 0, 건너뛴 행 포함) 입니다. 구형 .xls 파일은
+    pandas 로 읽어 분할합니다.
+    """
+    try:
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = pd.read_excel(source, sheet_name=sheet_name or 0, header=header_row)
+        if df.empty:
+            yield df
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+    
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        
+        header = None
+        for _ in range(header_row + 1):
+            header = next(rows, None)
+        if header is None:
+            return
+        
+        width = len(header)
+        columns = _header_names(header, width)
+        
+        buffer = []
+        positions = []  # 빈 행을 건너뛰어도 인덱스는 시트 행 번호와 맞춤
+        yielded = False
+        for position, row in enumerate(rows):
+            if row is None or all(value is None or value == '' for value in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            buffer.append(row)
+            positions.append(position)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns, dtype=object, index=positions)
+                buffer = []
+                positions = []
+                yielded = True
+        
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=columns, dtype=object, index=positions)
+    finally:
+        wb.close()
+
+def add_months(start_dates, months):
+    """날짜 배열에 개월 수를 달력 기준으로 더하기 (벡터 연산)
+    
+    정수 개월은 같은 일자로 이동하고 (그 달에 없는 일자는 말일로 맞춤),
+    소수 개월은 이동한 날짜부터 한 달 뒤까지의 실제 일수에 비례해 더합니다.
+    """
+    start = np.asarray(start_dates, dtype='datetime64[D]')
+    months = np.asarray(months, dtype=float)
+    whole = np.floor(months).astype(np.int64)
+    fraction = months - whole
+    
+    month_start = start.astype('datetime64[M]')
+    day_offset = (start - month_start.astype('datetime64[D]')).astype(np.int64)
+    
+    def shift(count):
+        target = month_start + count
+        days_in_month = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+        return target.astype('datetime64[D]') + np.minimum(day_offset, days_in_month - 1)
+    
+    anchor = shift(whole)
+    span = (shift(whole + 1) - anchor).astype(np.int64)
+    return anchor + np.rint(fraction * span).astype(np.int64)
+
+def frame_records(frame, columns, keys=None):
+    """DataFrame 컬럼을 JSON 응답용 dict 리스트로 변환 (to_dict('records') 보다 빠름)"""
+    keys = keys or columns
+    values = [frame[column].tolist() for column in columns]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+def _gantt_aggregate(result, column=None):
+    """간트 항목 집계 (column 이 없으면 전체 합계)"""
+    weighted = result['progress'] * result['duration_days']
+    frame = pd.DataFrame({
+        'key': result[column].fillna('').astype(str) if column else '',
+        'progress': result['progress'],
+        'weighted': weighted,
+        'duration_days': result['duration_days'],
+        'completed': result['progress'] >= 100,
+        'start': result['_start'],
+        'finish': result['_finish']
+    })
+    grouped = frame.groupby('key', sort=True).agg(
+        count=('progress', 'size'),
+        completed=('completed', 'sum'),
+        progress=('progress', 'mean'),
+        weighted=('weighted', 'sum'),
+        duration_days=('duration_days', 'sum'),
+        start=('start', 'min'),
+        finish=('finish', 'max')
+    )
+    weighted_progress = np.where(
+        grouped['duration_days'] > 0,
+        grouped['weighted'] / grouped['duration_days'].where(grouped['duration_days'] > 0, 1),
+        grouped['progress']
+    )
+    
+    aggregates = []
+    for key, count, completed, progress, weighted_value, start, finish in zip(
+            grouped.index, grouped['count'], grouped['completed'], grouped['progress'],
+            weighted_progress, grouped['start'], grouped['finish']):
+        item = {
+            'count': int(count),
+            'completed': int(completed),
+            'progress': round(float(progress), 1),
+            'weighted_progress': round(float(weighted_value), 1),
+            'start': start.strftime('%Y-%m-%d'),
+            'finish': finish.strftime('%Y-%m-%d')
+        }
+        if column:
+            item = {column: key, **item}
+        aggregates.append(item)
+    return aggregates
+
+def compute_gantt(frame, project_start_date=None, start_column='start_date',
+                  duration_column='duration_months', finish_column=None,
+                  group_columns=('common', 'type')):
+    """프로젝트 전체 간트차트 일정을 한 번의 벡터 연산으로 계산
+    
+    시작일이 없거나 잘못된 행은 project_start_date (기본: 오늘) 에서 시작합니다.
+    finish_column 값이 있는 행은 그 날짜를 종료일로 쓰고, 나머지는 시작일에
+    duration_column 개월 (기본 1개월) 을 달력 기준으로 더합니다.
+    
+    반환값: (start/finish/duration_days/progress 컬럼이 추가된 DataFrame,
+             {그룹 컬럼: 그룹별 집계 리스트, 'total': 전체 집계})
+    """
+    if project_start_date is None or project_start_date == '':
+        project_start_date = datetime.now()
+    project_start = pd.Timestamp(project_start_date).normalize()
+    
+    result = frame.copy()
+    missing = pd.Series([None] * len(result), index=result.index, dtype=object)
+    
+    def column_or_missing(column):
+        return result[column] if column and column in result else missing
+    
+    start = pd.to_datetime(column_or_missing(start_column), errors='coerce', format='ISO8601')
+    start = start.fillna(project_start).to_numpy(dtype='datetime64[D]')
+    
+    months = pd.to_numeric(column_or_missing(duration_column), errors='coerce').fillna(1.0)
+    finish = add_months(start, months.to_numpy())
+    if finish_column:
+        explicit = pd.to_datetime(column_or_missing(finish_column), errors='coerce', format='ISO8601')
+        finish = np.where(explicit.notna(), explicit.to_numpy(dtype='datetime64[D]'), finish)
+    
+    result['duration_months'] = months.to_numpy()
+    result['duration_days'] = (finish - start).astype(np.int64)
+    result['progress'] = pd.to_numeric(column_or_missing('progress'), errors='coerce').fillna(0.0).to_numpy()
+    result['start'] = np.datetime_as_string(start, unit='D')
+    result['finish'] = np.datetime_as_string(finish, unit='D')
+    result['_start'] = pd.to_datetime(start)
+    result['_finish'] = pd.to_datetime(finish)
+    
+    aggregates = {}
+    if len(result):
+        for column in group_columns:
+            aggregates[column] = _gantt_aggregate(result, column)
+        aggregates['total'] = _gantt_aggregate(result)[0]
+    else:
+        aggregates = {column: [] for column in group_columns}
+        aggregates['total'] = None
+    
+    return result.drop(columns=['_start', '_finish']), aggregates
 
 class ExcelProcessor:
     def __init__(self):
@@ -28,34 +254,80 @@ class ExcelProcessor:
             # 컬럼명 정리
             df.columns = df.columns.str.strip()
             
-            # 데이터 정리
-            drawing_list = []
-            for index, row in df.iterrows():
-                if pd.isna(row.iloc[0]) or row.iloc[0] == '':
-                    continue
-                    
-                drawing_data = {
-                    'no': str(row.iloc[0]) if not pd.isna(row.iloc[0]) else '',
-                    'common': str(row.iloc[1]) if len(row) > 1 and not pd.isna(row.iloc[1]) else '',
-                    'dwg_name': str(row.iloc[2]) if len(row) > 2 and not pd.isna(row.iloc[2]) else '',
-                    'type': str(row.iloc[3]) if len(row) > 3 and not pd.isna(row.iloc[3]) else '',
-                    'start_date': row.iloc[4] if len(row) > 4 and not pd.isna(row.iloc[4]) else None,
-                    'duration_months': row.iloc[5] if len(row) > 5 and not pd.isna(row.iloc[5]) else 1,
-                    'finish_date': row.iloc[6] if len(row) > 6 and not pd.isna(row.iloc[6]) else None,
-                    'progress': row.iloc[7] if len(row) > 7 and not pd.isna(row.iloc[7]) else 0,
-                    'revision': str(row.iloc[8]) if len(row) > 8 and not pd.isna(row.iloc[8]) else 'A',
-                    'status': str(row.iloc[9]) if len(row) > 9 and not pd.isna(row.iloc[9]) else 'DRAFT',
-                    'issued_date': row.iloc[10] if len(row) > 10 and not pd.isna(row.iloc[10]) else None,
-                    'approved_by': str(row.iloc[11]) if len(row) > 11 and not pd.isna(row.iloc[11]) else '',
-                    'remarks': str(row.iloc[12]) if len(row) > 12 and not pd.isna(row.iloc[12]) else ''
-                }
-                drawing_list.append(drawing_data)
-            
-            return drawing_list
+            return self.clean_drawing_dataframe(df)
             
         except Exception as e:
             raise Exception(f"엑셀 파일 읽기 실패: {str(e)}")
     
+    def iter_drawing_list_chunks(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """도면 리스트 엑셀 파일 스트리밍 읽기 (청크 단위 레코드 리스트 반환)
+        
+        셀 값은 엑셀 원본 타입 그대로입니다 (pandas 처럼 숫자 문자열을 변환하지 않음).
+        """
+        try:
+            for df in iter_excel_chunks(file_path, chunk_size):
+                df.columns = df.columns.str.strip()
+                records = self.clean_drawing_dataframe(df)
+                if records:
+                    yield records
+        except Exception as e:
+            raise Exception(f"엑셀 파일 읽기 실패: {str(e)}")
+    
+    def clean_drawing_dataframe(self, df):
+        """도면 리스트 DataFrame 정리 (컬럼 단위 벡터 연산)"""
+        if df.empty:
+            return []
+        
+        first = df.iloc[:, 0]
+        valid = first.notna().to_numpy() & (first.astype(object) != '').to_numpy()
+        df = df.loc[valid]
+        row_count = len(df)
+        if row_count == 0:
+            return []
+        
+        columns = []
+        for col_idx, (key, kind, default) in enumerate(DRAWING_LIST_FIELDS):
+            if col_idx >= df.shape[1]:
+                columns.append([default] * row_count)
+                continue
+            
+            series = df.iloc[:, col_idx].astype(object)
+            missing = series.isna().to_numpy()
+            if kind == 'text':
+                values = np.where(missing, default, series.astype(str).to_numpy())
+            else:
+                values = np.where(missing, default, series.to_numpy())
+            columns.append(values.tolist())
+        
+        keys = [key for key, _, _ in DRAWING_LIST_FIELDS]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+    
+    def _clean_drawing_rows_iterrows(self, df):
+        """도면 리스트 정리 (기존 행 단위 처리 - 벤치마크 비교용)"""
+        drawing_list = []
+        for index, row in df.iterrows():
+            if pd.isna(row.iloc[0]) or row.iloc[0] == '':
+                continue
+                
+            drawing_data = {
+                'no': str(row.iloc[0]) if not pd.isna(row.iloc[0]) else '',
+                'common': str(row.iloc[1]) if len(row) > 1 and not pd.isna(row.iloc[1]) else '',
+                'dwg_name': str(row.iloc[2]) if len(row) > 2 and not pd.isna(row.iloc[2]) else '',
+                'type': str(row.iloc[3]) if len(row) > 3 and not pd.isna(row.iloc[3]) else '',
+                'start_date': row.iloc[4] if len(row) > 4 and not pd.isna(row.iloc[4]) else None,
+                'duration_months': row.iloc[5] if len(row) > 5 and not pd.isna(row.iloc[5]) else 1,
+                'finish_date': row.iloc[6] if len(row) > 6 and not pd.isna(row.iloc[6]) else None,
+                'progress': row.iloc[7] if len(row) > 7 and not pd.isna(row.iloc[7]) else 0,
+                'revision': str(row.iloc[8]) if len(row) > 8 and not pd.isna(row.iloc[8]) else 'A',
+                'status': str(row.iloc[9]) if len(row) > 9 and not pd.isna(row.iloc[9]) else 'DRAFT',
+                'issued_date': row.iloc[10] if len(row) > 10 and not pd.isna(row.iloc[10]) else None,
+                'approved_by': str(row.iloc[11]) if len(row) > 11 and not pd.isna(row.iloc[11]) else '',
+                'remarks': str(row.iloc[12]) if len(row) > 12 and not pd.isna(row.iloc[12]) else ''
+            }
+            drawing_list.append(drawing_data)
+        
+        return drawing_list
+    
     def create_drawing_list_template(self, project_id, output_path):
         """도면 리스트 템플릿 생성"""
         try:
@@ -94,8 +366,7 @@ class ExcelProcessor:
                     ws.cell(row=row_idx, column=col_idx, value=value)
             
             # 컬럼 너비 조정
-            column_widths = [5, 12, 25, 12, 12, 8, 12, 10, 5, 10, 12, 12, 20]
-            for col, width in enumerate(column_widths, 1):
+            for col, width in enumerate(COLUMN_WIDTHS, 1):
                 ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
             
             wb.save(output_path)
@@ -169,8 +440,7 @@ class ExcelProcessor:
                     )
             
             # 컬럼 너비 조정
-            column_widths = [5, 12, 25, 12, 12, 8, 12, 10, 5, 10, 12, 12, 20]
-            for col, width in enumerate(column_widths, 1):
+            for col, width in enumerate(COLUMN_WIDTHS, 1):
                 ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
             
             wb.save(output_path)
@@ -179,44 +449,94 @@ class ExcelProcessor:
         except Exception as e:
             raise Exception(f"엑셀 내보내기 실패: {str(e)}")
     
+    def _register_export_styles(self, wb):
+        """내보내기용 named style 등록 (모든 셀이 같은 스타일 객체를 공유)"""
+        thin = Side(style='thin')
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        
+        title = NamedStyle(name=STYLE_TITLE)
+        title.font = Font(bold=True, size=14)
+        title.alignment = Alignment(horizontal='center')
+        
+        info = NamedStyle(name=STYLE_INFO)
+        info.alignment = Alignment(horizontal='center')
+        
+        header = NamedStyle(name=STYLE_HEADER)
+        header.font = Font(bold=True, color="FFFFFF")
+        header.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header.border = border
+        header.alignment = Alignment(horizontal='center', vertical='center')
+        
+        cell = NamedStyle(name=STYLE_CELL)
+        cell.border = border
+        
+        for style in (title, info, header, cell):
+            wb.add_named_style(style)
+    
+    def export_drawing_list_streaming(self, drawings, project_info, output):
+        """도면 리스트를 write-only 모드로 내보내기
+        
+        drawings 는 도면 dict 의 iterable(DB 커서 등)이며 한 행씩 기록하므로
+        메모리 사용량이 도면 수와 무관합니다. output 은 파일 경로 또는 파일 객체입니다.
+        레이아웃은 export_drawing_list 와 동일합니다.
+        """
+        try:
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet(f"{project_info.get('id', 'PROJECT')}_Drawing_List")
+            self._register_export_styles(wb)
+            
+            def styled(value, style):
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = style
+                return cell
+            
+            # 컬럼 너비는 행 기록 전에 설정
+            for col, width in enumerate(COLUMN_WIDTHS, 1):
+                ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
+            
+            # 프로젝트 정보 헤더
+            last_col = openpyxl.utils.get_column_letter(len(self.template_columns))
+            ws.merged_cells.add(f'A1:{last_col}1')
+            ws.merged_cells.add(f'A2:{last_col}2')
+            ws.append([styled(f"DRAWING LIST - {project_info.get('name', 'PROJECT')}", STYLE_TITLE)])
+            ws.append([styled(
+                f"Client: {project_info.get('client', '')} | Ship Type: {project_info.get('ship_type', '')} | Date: {datetime.now().strftime('%Y-%m-%d')}",
+                STYLE_INFO
+            )])
+            ws.append([])
+            
+            # 헤더 작성 (4행)
+            ws.append([styled(header, STYLE_HEADER) for header in self.template_columns])
+            
+            # 데이터 작성
+            keys = [key for key, _, _ in DRAWING_LIST_FIELDS]
+            for drawing in drawings:
+                ws.append([styled(drawing.get(key, ''), STYLE_CELL) for key in keys])
+            
+            wb.save(output)
+            return True
+            
+        except Exception as e:
+            raise Exception(f"엑셀 내보내기 실패: {str(e)}")
+    
     def create_gantt_data(self, drawing_data, project_start_date=None):
         """간트차트용 데이터 생성"""
+        return self.create_gantt_chart(drawing_data, project_start_date)['gantt_data']
+    
+    def create_gantt_chart(self, drawing_data, project_start_date=None):
+        """간트차트 항목과 분류(common)/타입별 집계 생성"""
         try:
-            if not project_start_date:
-                project_start_date = datetime.now()
-            elif isinstance(project_start_date, str):
-                project_start_date = datetime.strptime(project_start_date, '%Y-%m-%d')
-            
-            gantt_data = []
-            for drawing in drawing_data:
-                # 시작일 계산
-                if drawing.get('start_date'):
-                    if isinstance(drawing['start_date'], str):
-                        start_date = datetime.strptime(drawing['start_date'], '%Y-%m-%d')
-                    else:
-                        start_date = drawing['start_date']
-                else:
-                    start_date = project_start_date
-                
-                # 기간 계산
-                duration_months = float(drawing.get('duration_months', 1))
-                duration_days = int(duration_months * 30)  # 대략적인 계산
-                
-                # 종료일 계산
-                finish_date = start_date + timedelta(days=duration_days)
-                
-                gantt_item = {
-                    'common': drawing.get('common', ''),
-                    'dwg_name': drawing.get('dwg_name', ''),
-                    'type': drawing.get('type', 'BASIC'),
-                    'start': start_date.strftime('%Y-%m-%d'),
-                    'duration_months': duration_months,
-                    'finish': finish_date.strftime('%Y-%m-%d'),
-                    'progress': float(drawing.get('progress', 0)) if isinstance(drawing.get('progress'), (int, float)) else 0
-                }
-                gantt_data.append(gantt_item)
-            
-            return gantt_data
+            df = pd.DataFrame(list(drawing_data))
+            for column, default in (('common', ''), ('dwg_name', ''), ('type', 'BASIC')):
+                if column not in df:
+                    df[column] = default
+            
+            result, aggregates = compute_gantt(df, project_start_date)
+            gantt_data = frame_records(
+                result, ['common', 'dwg_name', 'type', 'start', 'duration_months', 'finish', 'progress']
+            )
+            
+            return {'gantt_data': gantt_data, 'aggregates': aggregates}
             
         except Exception as e:
             raise Exception(f"간트차트 데이터 생성 실패: {str(e)}")
@@ -226,3 +546,94 @@ def process_uploaded_excel(file_path):
     processor = ExcelProcessor()
     return processor.read_drawing_list(file_path)
 
+def benchmark_drawing_list_cleaning(rows=5000, repeat=3):
+    """행 단위(iterrows) 처리와 컬럼 단위 처리 성능 비교"""
+    processor = ExcelProcessor()
+    categories = ['GENERAL', 'HULL', 'MACHINERY', 'PIPING', 'ELECTRICAL']
+    types = ['BASIC', 'APPROVAL', 'PRODUCTION']
+    starts = pd.date_range('2024-01-01', periods=rows, freq='D')
+    
+    df = pd.DataFrame({
+        'NO': [str(i + 1) for i in range(rows)],
+        'COMMON': [categories[i % len(categories)] for i in range(rows)],
+        'DWG NAME': [f'DRAWING {i + 1}' for i in range(rows)],
+        'TYPE': [types[i % len(types)] for i in range(rows)],
+        'START': [starts[i] if i % 7 else None for i in range(rows)],
+        'MONTH': [(i % 6) + 0.5 if i % 5 else None for i in range(rows)],
+        'FINISH': [None] * rows,
+        'PROGRESS': [(i * 10) % 100 for i in range(rows)],
+        'REV': ['A' if i % 3 else None for i in range(rows)],
+        'STATUS': ['DRAFT'] * rows,
+        'ISSUED_DATE': [None] * rows,
+        'APPROVED_BY': ['Kim' if i % 2 else None for i in range(rows)],
+        'REMARKS': [None if i % 4 else 'Check' for i in range(rows)]
+    })
+    
+    def best_of(func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(df)
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+    
+    loop_time, loop_result = best_of(processor._clean_drawing_rows_iterrows)
+    columnar_time, columnar_result = best_of(processor.clean_drawing_dataframe)
+    
+    return {
+        'rows': rows,
+        'iterrows_seconds': round(loop_time, 4),
+        'columnar_seconds': round(columnar_time, 4),
+        'speedup': round(loop_time / columnar_time, 1) if columnar_time else None,
+        'identical': loop_result == columnar_result
+    }
+
+def benchmark_drawing_list_export(rows=20000):
+    """기존 내보내기와 write-only 내보내기 성능 비교 (시간, 최대 메모리)"""
+    import io
+    import tracemalloc
+    
+    processor = ExcelProcessor()
+    project_info = {'id': 'BENCH', 'name': 'Benchmark', 'client': 'Client', 'ship_type': 'Container Ship'}
+    
+    def make_drawings():
+        for i in range(rows):
+            yield {
+                'no': str(i + 1), 'common': 'HULL', 'dwg_name': f'DRAWING {i + 1}', 'type': 'BASIC',
+                'start_date': '2024-01-01', 'duration_months': 2.0, 'finish_date': '2024-03-01',
+                'progress': float(i % 100), 'revision': 'A', 'status': 'DRAFT', 'issued_date': None,
+                'approved_by': 'Kim', 'remarks': ''
+            }
+    
+    def measure(func):
+        # 시간과 메모리는 따로 측정 (tracemalloc 은 실행 속도를 크게 떨어뜨림)
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+    
+    legacy_time, legacy_peak = measure(
+        lambda: processor.export_drawing_list(list(make_drawings()), project_info, io.BytesIO())
+    )
+    streaming_time, streaming_peak = measure(
+        lambda: processor.export_drawing_list_streaming(make_drawings(), project_info, io.BytesIO())
+    )
+    
+    return {
+        'rows': rows,
+        'legacy_seconds': round(legacy_time, 3),
+        'streaming_seconds': round(streaming_time, 3),
+        'speedup': round(legacy_time / streaming_time, 1) if streaming_time else None,
+        'legacy_peak_mb': round(legacy_peak / (1024 * 1024), 1),
+        'streaming_peak_mb': round(streaming_peak / (1024 * 1024), 1)
+    }
+
+if __name__ == '__main__':
+    import sys
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(json.dumps(benchmark_drawing_list_cleaning(row_count), indent=2))
+    print(json.dumps(benchmark_drawing_list_export(row_count), indent=2))
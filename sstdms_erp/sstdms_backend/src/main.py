@@ -17,6 +17,8 @@ from routes.local_file_storage import local_storage_bp
 from routes.secure_auth import secure_auth_bp
 from routes.manual import manual_bp
 from routes.notification_api import notification_bp
+from utils.storage_usage import UsageReconciler, ensure_usage_tables
+from utils.database import get_database_url, engine_options, configure_engine, get_connection
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'sstdms_secret_key_2024'
@@ -39,11 +41,31 @@ app.register_blueprint(secure_auth_bp, url_prefix='/api')
 app.register_blueprint(manual_bp, url_prefix='/api')
 app.register_blueprint(notification_bp, url_prefix='/api')
 
-# 데이터베이스 설정
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# 데이터베이스 설정 (DATABASE_URL 이 있으면 PostgreSQL, 없으면 SQLite 파일)
+SQLITE_DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url(SQLITE_DATABASE_PATH)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
+# SQLite 연결에는 raw sqlite3 풀과 같은 WAL / busy_timeout 설정 적용
+with app.app_context():
+    configure_engine(db.engine)
+
+# 저장소 사용량 / blob 참조 테이블은 요청마다가 아니라 시작 시 한 번 생성 (라우트와 같은 연결 풀)
+_conn = get_connection()
+try:
+    ensure_usage_tables(_conn)
+finally:
+    _conn.close()
+
+# 저장소 사용량 카운터 백그라운드 재계산 (주기 초, 0 이면 사용 안 함)
+# 워커마다 시작하지만 임대를 잡은 한 프로세스만 재계산합니다
+STORAGE_USAGE_RECONCILE_INTERVAL = int(os.getenv('STORAGE_USAGE_RECONCILE_INTERVAL', '300'))
+usage_reconciler = UsageReconciler(interval=STORAGE_USAGE_RECONCILE_INTERVAL)
+if STORAGE_USAGE_RECONCILE_INTERVAL > 0:
+    usage_reconciler.start()
+
 # 업로드 폴더 생성
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
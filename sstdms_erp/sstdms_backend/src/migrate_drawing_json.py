@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+도면 리스트 JSON 마이그레이션 스크립트
+기존 {project_id}_drawings.json 파일을 drawing_list_entries 테이블로 옮깁니다.
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.user import db
+from models.document import Project
+from models.project_permission import ProjectPermission, ProjectFolder
+from models.drawing import DrawingListEntry
+from flask import Flask
+from utils.database import get_database_url, engine_options
+
+# Flask 앱 설정
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url(os.path.join(os.path.dirname(__file__), 'database', 'app.db'))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db.init_app(app)
+
+# routes/drawing.py 의 UPLOAD_FOLDER 와 동일
+DRAWING_UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'routes', 'uploads')
+JSON_SUFFIX = '_drawings.json'
+
+def migrate_drawing_json_files(upload_folder=DRAWING_UPLOAD_FOLDER, overwrite=False):
+    """JSON 도면 리스트를 데이터베이스로 이전 (완료된 파일은 .migrated 로 이름 변경)"""
+    results = []
+    if not os.path.isdir(upload_folder):
+        return results
+
+    for filename in sorted(os.listdir(upload_folder)):
+        if not filename.endswith(JSON_SUFFIX):
+            continue
+
+        project_id = filename[:-len(JSON_SUFFIX)]
+        json_path = os.path.join(upload_folder, filename)
+
+        if not overwrite and DrawingListEntry.query.filter_by(project_id=project_id).first():
+            print(f"이미 이전된 프로젝트: {project_id} - 건너뜀")
+            results.append({'project_id': project_id, 'status': 'skipped'})
+            continue
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+            count = DrawingListEntry.replace_project_drawings(project_id, records)
+            db.session.commit()
+            os.replace(json_path, json_path + '.migrated')
+
+            print(f"도면 리스트 이전: {project_id} ({count}건)")
+            results.append({'project_id': project_id, 'status': 'migrated', 'count': count})
+        except Exception as e:
+            db.session.rollback()
+            print(f"도면 리스트 이전 실패: {project_id} - {e}")
+            results.append({'project_id': project_id, 'status': 'failed', 'error': str(e)})
+
+    return results
+
+if __name__ == "__main__":
+    with app.app_context():
+        db.create_all()
+        results = migrate_drawing_json_files(overwrite='--overwrite' in sys.argv)
+        migrated = sum(1 for r in results if r['status'] == 'migrated')
+        print(f"\n총 {migrated}개 프로젝트의 도면 리스트가 이전되었습니다.")
@@ -62,6 +62,9 @@ class Document(db.Model):
     creator = db.relationship('User', backref='created_documents')
     folder = db.relationship('ProjectFolder', backref='documents')
     
+    # 문서 목록 keyset 페이지 조회 (프로젝트/상태별 등록일 순)
+    __table_args__ = (db.Index('idx_documents_project_status_created', 'project_id', 'status', 'created_at', 'id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -1,7 +1,5 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-
-db = SQLAlchemy()
+from models.user import db
+from datetime import datetime, date
 
 class Drawing(db.Model):
     __tablename__ = 'drawings'
@@ -43,3 +41,181 @@ class Drawing(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+def _to_text(value, default=''):
+    """엑셀/JSON 셀 값을 문자열로 정리"""
+    if value is None:
+        return default
+    text = str(value).strip()
+    return text if text and text.lower() != 'nan' else default
+
+def _to_number(value, default=0.0):
+    """숫자 셀 값 변환 ('50%' 같은 문자열 포함)"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return default if value != value else float(value)  # NaN 처리
+    try:
+        return float(str(value).strip().rstrip('%'))
+    except ValueError:
+        return default
+
+def _to_date_text(value):
+    """날짜 셀 값을 YYYY-MM-DD 문자열로 정리"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()
+    if not text or text.lower() in ('nan', 'nat', 'none'):
+        return None
+    # '2024-01-01 00:00:00' 형태는 날짜 부분만 사용
+    if len(text) >= 10 and text[4] == '-' and text[7] == '-':
+        return text[:10]
+    return text
+
+class DrawingListEntry(db.Model):
+    """엑셀 도면 리스트 항목 (프로젝트별, 도면 번호로 인덱싱)"""
+    __tablename__ = 'drawing_list_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.String(50), db.ForeignKey('projects.id'), nullable=False)
+    no = db.Column(db.String(100), nullable=False)
+    common = db.Column(db.String(100), default='')
+    dwg_name = db.Column(db.String(300), default='')
+    type = db.Column(db.String(50), default='')
+    start_date = db.Column(db.String(30))
+    duration_months = db.Column(db.Float, default=1)
+    finish_date = db.Column(db.String(30))
+    progress = db.Column(db.Float, default=0)
+    revision = db.Column(db.String(20), default='A')
+    status = db.Column(db.String(30), default='DRAFT')
+    issued_date = db.Column(db.String(30))
+    approved_by = db.Column(db.String(100), default='')
+    remarks = db.Column(db.Text, default='')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 프로젝트 + 도면 번호 복합 유니크 인덱스 (B-tree 조회)
+    __table_args__ = (db.UniqueConstraint('project_id', 'no', name='unique_project_drawing_no'),)
+    
+    @staticmethod
+    def record_to_columns(record):
+        """read_drawing_list 레코드를 컬럼 값으로 변환"""
+        return {
+            'no': _to_text(record.get('no')),
+            'common': _to_text(record.get('common')),
+            'dwg_name': _to_text(record.get('dwg_name')),
+            'type': _to_text(record.get('type')),
+            'start_date': _to_date_text(record.get('start_date')),
+            'duration_months': _to_number(record.get('duration_months'), 1.0),
+            'finish_date': _to_date_text(record.get('finish_date')),
+            'progress': _to_number(record.get('progress'), 0.0),
+            'revision': _to_text(record.get('revision'), 'A'),
+            'status': _to_text(record.get('status'), 'DRAFT'),
+            'issued_date': _to_date_text(record.get('issued_date')),
+            'approved_by': _to_text(record.get('approved_by')),
+            'remarks': _to_text(record.get('remarks'))
+        }
+    
+    @classmethod
+    def replace_project_drawings(cls, project_id, records):
+        """프로젝트 도면 리스트 전체 교체 (업로드 시)"""
+        return cls.replace_project_drawings_chunked(project_id, [records])
+    
+    @classmethod
+    def replace_project_drawings_chunked(cls, project_id, chunks):
+        """청크 단위로 도면 리스트 전체 교체 (스트리밍 업로드, 커밋은 호출자가 수행)"""
+        cls.query.filter_by(project_id=project_id).delete(synchronize_session=False)
+        for records in chunks:
+            cls.insert_drawings(project_id, records)
+        DrawingListVersion.bump(project_id)
+        return cls.query.filter_by(project_id=project_id).count()
+    
+    @classmethod
+    def insert_drawings(cls, project_id, records):
+        """도면 레코드 일괄 추가 (같은 도면 번호가 있으면 새 행으로 대체)"""
+        rows = {}
+        for record in records:
+            columns = cls.record_to_columns(record)
+            if not columns['no']:
+                continue
+            columns['project_id'] = project_id
+            rows[columns['no']] = columns  # 중복 번호는 마지막 행 기준
+        
+        if not rows:
+            return 0
+        
+        numbers = list(rows.keys())
+        for start in range(0, len(numbers), 500):  # SQL 변수 개수 제한 대비
+            cls.query.filter(
+                cls.project_id == project_id,
+                cls.no.in_(numbers[start:start + 500])
+            ).delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(cls, list(rows.values()))
+        return len(rows)
+    
+    @classmethod
+    def get_by_no(cls, project_id, no):
+        """도면 번호로 단일 항목 조회"""
+        return cls.query.filter_by(project_id=project_id, no=str(no)).first()
+    
+    @classmethod
+    def list_for_project(cls, project_id):
+        """프로젝트 도면 리스트 (업로드 순서)"""
+        return cls.query.filter_by(project_id=project_id).order_by(cls.id).all()
+    
+    @classmethod
+    def iter_for_project(cls, project_id, batch_size=1000):
+        """프로젝트 도면 리스트를 id 기준 배치로 순회 (내보내기용, dict 로 반환)"""
+        last_id = 0
+        while True:
+            batch = cls.query.filter(
+                cls.project_id == project_id,
+                cls.id > last_id
+            ).order_by(cls.id).limit(batch_size).all()
+            if not batch:
+                break
+            for entry in batch:
+                yield entry.to_dict()
+            last_id = batch[-1].id
+    
+    def to_dict(self):
+        return {
+            'no': self.no,
+            'common': self.common,
+            'dwg_name': self.dwg_name,
+            'type': self.type,
+            'start_date': self.start_date,
+            'duration_months': self.duration_months,
+            'finish_date': self.finish_date,
+            'progress': self.progress,
+            'revision': self.revision,
+            'status': self.status,
+            'issued_date': self.issued_date,
+            'approved_by': self.approved_by,
+            'remarks': self.remarks
+        }
+
+class DrawingListVersion(db.Model):
+    """프로젝트 도면 리스트 버전 (변경 시마다 증가, 캐시/ETag 키로 사용)"""
+    __tablename__ = 'drawing_list_versions'
+    
+    project_id = db.Column(db.String(50), db.ForeignKey('projects.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @classmethod
+    def bump(cls, project_id):
+        """버전 증가 (커밋은 호출자가 수행, 도면 변경과 같은 트랜잭션)"""
+        updated = cls.query.filter_by(project_id=project_id).update(
+            {cls.version: cls.version + 1, cls.updated_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(cls(project_id=project_id, version=1))
+        db.session.flush()
+    
+    @classmethod
+    def current(cls, project_id):
+        """현재 버전 (기록이 없으면 0)"""
+        return cls.query.with_entities(cls.version).filter_by(project_id=project_id).scalar() or 0
@@ -69,6 +69,9 @@ class ProjectFile(db.Model):
     permissions = db.relationship('FilePermission', backref='file', lazy=True)
     access_logs = db.relationship('FileAccessLog', backref='file', lazy=True)
     
+    # Keyset paging of project file listings (newest first)
+    __table_args__ = (db.Index('idx_project_files_enhanced_project_created', 'project_id', 'created_at', 'id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -163,6 +166,8 @@ class FileAccessLog(db.Model):
     error_message = db.Column(db.Text)
     accessed_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (db.Index('idx_file_access_logs_user_action_date', 'user_id', 'action', 'accessed_at'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -28,6 +28,17 @@ class ProjectPermission(db.Model):
             'granted_at': self.granted_at.isoformat() if self.granted_at else None
         }
 
+class PermissionVersion(db.Model):
+    """권한 버전 (한 행, 권한 부여/회수마다 증가) - 워커별 권한 캐시 무효화용
+    
+    utils.permissions 가 raw SQL 로 읽고 올리므로 여기서는 테이블만 정의합니다.
+    """
+    __tablename__ = 'permission_versions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class ProjectFolder(db.Model):
     __tablename__ = 'project_folders'
     
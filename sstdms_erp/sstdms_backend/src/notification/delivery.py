@@ -0,0 +1,363 @@
+# delivery.py
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChannelPolicy:
+    """Delivery limits of one provider channel.
+    
+    rate is in messages per second (a batch of n recipients takes n tokens);
+    burst is the bucket size. batch_window is how long a dispatcher waits for a
+    batch to fill, concurrency how many batches may be in flight at once.
+    """
+    rate: float
+    burst: Optional[float] = None
+    batch_size: int = 1
+    batch_window: float = 0.05
+    concurrency: int = 1
+    max_pending: int = 1000
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+def _env_policy(channel: str, **defaults) -> ChannelPolicy:
+    prefix = f"NOTIFICATION_{channel.upper()}_"
+    return ChannelPolicy(
+        rate=float(os.getenv(prefix + "RATE", defaults["rate"])),
+        burst=float(os.getenv(prefix + "BURST", defaults.get("burst") or defaults["rate"])),
+        batch_size=int(os.getenv(prefix + "BATCH_SIZE", defaults.get("batch_size", 1))),
+        batch_window=float(os.getenv(prefix + "BATCH_WINDOW", defaults.get("batch_window", 0.05))),
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", defaults.get("concurrency", 1))),
+        failure_threshold=int(os.getenv(prefix + "FAILURE_THRESHOLD", defaults.get("failure_threshold", 5))),
+        reset_timeout=float(os.getenv(prefix + "RESET_TIMEOUT", defaults.get("reset_timeout", 30)))
+    )
+
+# Provider defaults, overridable per channel (e.g. NOTIFICATION_EMAIL_RATE=20)
+EMAIL_POLICY = _env_policy("email", rate=10, batch_size=10, concurrency=2)
+FCM_POLICY = _env_policy("fcm", rate=500, burst=1000, batch_size=500)  # legacy API: 1000 tokens per request
+KAKAO_POLICY = _env_policy("kakao", rate=20, batch_size=5)  # friends message API: 5 receivers per request
+
+@dataclass
+class DeliveryResult:
+    """Outcome for one task of a batch (retryable failures go through backoff)."""
+    ok: bool
+    error: Optional[str] = None
+    retryable: bool = True
+
+class DeliveryError(Exception):
+    """The provider call failed as a whole; counts against the circuit breaker.
+    
+    completed holds the results (by task id) of tasks an earlier provider call
+    of the same batch already delivered; only the other tasks are unsent.
+    """
+    
+    def __init__(self, message: Optional[str] = None, completed: Optional[Dict[str, DeliveryResult]] = None):
+        super().__init__(message)
+        self.completed = completed or {}
+
+class ProviderThrottled(Exception):
+    """The provider rejected the call for rate limiting; the batch waits retry_after seconds.
+    
+    completed is as for DeliveryError (set by DeliveryChannel.deliver).
+    """
+    
+    def __init__(self, retry_after: float = 1.0, message: str = "throttled by provider"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.completed: Dict[str, DeliveryResult] = {}
+
+class PartialDelivery(Exception):
+    """Raised by an adapter whose batch takes several provider calls when a later call fails.
+    
+    results holds the outcome of the tasks already sent (by task id), error the
+    ProviderThrottled / DeliveryError of the failed call.
+    """
+    
+    def __init__(self, results: Dict[str, DeliveryResult], error: Exception):
+        super().__init__(str(error))
+        self.results = results
+        self.error = error
+
+class TokenBucket:
+    """Token bucket limiting messages per second (waiters are served in FIFO order)."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self, tokens: float = 1):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """Empty the bucket so nothing is sent for about `seconds` (after a provider 429)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+class SharedTokenBucket:
+    """TokenBucket kept in a store shared by several processes (see NotificationStore.take_tokens).
+    
+    reserve(tokens, rate, capacity, pause) takes the tokens from the shared
+    bucket and returns how long to wait before sending, so every process using
+    the store shares one rate limit. A pause is passed on with the next reservation.
+    """
+    
+    def __init__(self, reserve: Callable[..., Awaitable[float]], rate: float, capacity: Optional[float] = None):
+        self.reserve = reserve
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._pause = 0.0
+    
+    async def acquire(self, tokens: float = 1):
+        tokens = min(tokens, self.capacity)
+        pause, self._pause = self._pause, 0.0
+        wait = await self.reserve(tokens, self.rate, self.capacity, pause)
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Pause every process's sends for about `seconds` (applied by the next acquire)."""
+        self._pause = max(self._pause, seconds)
+
+class CircuitBreaker:
+    """Stops calling a provider after failure_threshold consecutive failed calls.
+    
+    After reset_timeout one trial call is let through (half-open); its success
+    (or a 429, which shows the provider is up) closes the circuit, its failure
+    opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+    
+    def retry_after(self) -> float:
+        """0 if a call may go through now, else seconds until it may be tried."""
+        if self.state == "closed":
+            return 0.0
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining > 0:
+            return remaining
+        if self._trial_in_flight:
+            return min(1.0, self.reset_timeout)
+        self.state = "half_open"
+        self._trial_in_flight = True
+        return 0.0
+    
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+def backoff_delay(retry_count: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: half of min(cap, base * 2^(n-1)) plus a random half.
+    
+    The jitter spreads retries of a failed batch out instead of retrying them together.
+    """
+    ceiling = min(cap, base * 2 ** max(retry_count - 1, 0))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+SendBatch = Callable[[List[Any]], Awaitable[List[DeliveryResult]]]
+
+class DeliveryChannel:
+    """A provider channel: batching buffer, token bucket and circuit breaker."""
+    
+    def __init__(self, name: str, send_batch: SendBatch, policy: ChannelPolicy):
+        self.name = name
+        self.send_batch = send_batch
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.batch_size = max(1, min(policy.batch_size, int(self.bucket.capacity)))
+        self._pending: Deque[Any] = deque()
+        self._changed = asyncio.Condition()
+        self.stats = {"batches": 0, "sent": 0, "failed": 0, "throttled": 0, "deferred": 0}
+    
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+    
+    async def submit(self, task: Any):
+        """Buffer a task for the next batch (waits while max_pending tasks are buffered)."""
+        async with self._changed:
+            while len(self._pending) >= self.policy.max_pending:
+                await self._changed.wait()
+            self._pending.append(task)
+            self._changed.notify_all()
+    
+    def requeue(self, batch: List[Any]):
+        """Put a throttled batch back at the front, in its original order."""
+        self._pending.extendleft(reversed(batch))
+    
+    async def next_batch(self) -> List[Any]:
+        """Wait for tasks, then up to batch_window for the batch to fill."""
+        async with self._changed:
+            while not self._pending:
+                await self._changed.wait()
+            deadline = time.monotonic() + self.policy.batch_window
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._changed.notify_all()
+            return batch
+    
+    async def deliver(self, batch: List[Any]) -> List[DeliveryResult]:
+        """Send one batch within the rate limit; raises ProviderThrottled / DeliveryError.
+        
+        The error's completed results cover tasks that were sent before it, so
+        only the rest of the batch is retried.
+        """
+        await self.bucket.acquire(len(batch))
+        completed: Dict[str, DeliveryResult] = {}
+        try:
+            try:
+                results = await self.send_batch(batch)
+            except PartialDelivery as e:
+                completed = e.results
+                raise e.error
+        except ProviderThrottled as e:
+            self.stats["throttled"] += 1
+            self.bucket.pause(e.retry_after)
+            # A 429 shows the provider is up: close the circuit (this also ends a half-open trial)
+            self.breaker.record_success()
+            e.completed = completed
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise DeliveryError(str(e), completed) from e
+        self.breaker.record_success()
+        self.stats["batches"] += 1
+        return results
+
+# --- Provider adapters (blocking clients run in a thread) ---
+
+def _group_by_payload(tasks: List[Any]) -> Dict[str, List[Any]]:
+    groups: Dict[str, List[Any]] = {}
+    for task in tasks:
+        key = json.dumps([task.title, task.message, task.data.get("payload")], sort_keys=True, default=str)
+        groups.setdefault(key, []).append(task)
+    return groups
+
+def _retry_after(value: Any, default: float = 1.0) -> float:
+    # Retry-After may also be an HTTP date; fall back to the default then
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+def email_channel(sender, from_address: str, policy: ChannelPolicy = EMAIL_POLICY) -> DeliveryChannel:
+    """EmailSender channel; task.data['email'] is the recipient, data['is_html'] the body type.
+    
+    A batch goes out concurrently over the sender's pooled SMTP sessions.
+    """
+    async def send_batch(tasks: List[Any]) -> List[DeliveryResult]:
+        sent = await asyncio.to_thread(sender.send_batch, from_address, [
+            {"receiver_email": task.data["email"], "subject": task.title, "body": task.message,
+             "is_html": task.data.get("is_html", False)}
+            for task in tasks
+        ])
+        results = [DeliveryResult(item["success"], None if item["success"] else item["message"],
+                                  not item["permanent"]) for item in sent]
+        if not any(result.ok or not result.retryable for result in results):
+            raise DeliveryError(results[0].error)  # server unreachable rather than bad addresses
+        return results
+    
+    return DeliveryChannel("email", send_batch, policy)
+
+# FCM per-token errors worth retrying; anything else (NotRegistered, InvalidRegistration, ...) is permanent
+FCM_RETRYABLE_ERRORS = {"Unavailable", "InternalServerError", "DeviceMessageRateExceeded"}
+
+def fcm_channel(service, policy: ChannelPolicy = FCM_POLICY) -> DeliveryChannel:
+    """PushNotificationService channel; task.data['device_token'] is the recipient.
+    
+    Tasks with the same title/message/payload go out as one multicast request.
+    """
+    async def send_batch(tasks: List[Any]) -> List[DeliveryResult]:
+        results: Dict[str, DeliveryResult] = {}
+        for group in _group_by_payload(tasks).values():
+            response = await asyncio.to_thread(
+                service.send_fcm_multicast, [task.data["device_token"] for task in group],
+                group[0].title, group[0].message, group[0].data.get("payload")
+            )
+            if response.get("status") == "error":
+                if response.get("http_status") == 429:
+                    error = ProviderThrottled(_retry_after(response.get("retry_after")), response.get("message"))
+                else:
+                    error = DeliveryError(response.get("message"))
+                # Earlier groups already went out; report them so they are not sent twice
+                raise PartialDelivery(results, error) if results else error
+            for task, result in zip(group, response.get("results", [])):
+                error = result.get("error")
+                results[task.id] = DeliveryResult(error is None, error, error in FCM_RETRYABLE_ERRORS)
+        return [results.get(task.id, DeliveryResult(False, "missing FCM result")) for task in tasks]
+    
+    return DeliveryChannel("fcm", send_batch, policy)
+
+KAKAO_RATE_LIMIT_CODES = {-10}  # API limit exceeded
+KAKAO_THROTTLE_PAUSE = 60.0  # Kakao sends no Retry-After; quotas are per minute
+
+def kakao_channel(api, policy: ChannelPolicy = KAKAO_POLICY) -> DeliveryChannel:
+    """KakaoBusinessAPI channel; task.data['kakao_uuid'] is the receiver (5 per request)."""
+    async def send_batch(tasks: List[Any]) -> List[DeliveryResult]:
+        results: Dict[str, DeliveryResult] = {}
+        for group in _group_by_payload(tasks).values():
+            for start in range(0, len(group), 5):
+                chunk = group[start:start + 5]
+                response = await asyncio.to_thread(
+                    api.send_text_messages, [task.data["kakao_uuid"] for task in chunk], chunk[0].message
+                )
+                if "successful_receiver_uuids" not in response:
+                    if response.get("code") in KAKAO_RATE_LIMIT_CODES:
+                        error = ProviderThrottled(KAKAO_THROTTLE_PAUSE, response.get("msg"))
+                    else:
+                        error = DeliveryError(response.get("msg") or str(response))
+                    raise PartialDelivery(results, error) if results else error
+                sent = set(response["successful_receiver_uuids"])
+                for task in chunk:
+                    ok = task.data["kakao_uuid"] in sent
+                    results[task.id] = DeliveryResult(ok, None if ok else "not delivered by Kakao")
+        return [results[task.id] for task in tasks]
+    
+    return DeliveryChannel("kakao", send_batch, policy)
@@ -2,6 +2,7 @@
 
 import requests
 import json
+import time
 from typing import Dict, Any, List
 
 class KakaoBusinessAPI:
@@ -17,6 +18,8 @@ class KakaoBusinessAPI:
         self.token_expires_at = 0
         self.auth_url = "https://kauth.kakao.com/oauth/token"
         self.message_send_url = "https://kapi.kakao.com/v2/api/talk/memo/default/send"
+        self.friends_message_send_url = "https://kapi.kakao.com/v1/api/talk/friends/message/default/send"
+        self.max_receivers_per_request = 5  # friends message API limit
         
     def _get_headers(self) -> Dict[str, str]:
         """Helper to get authorization headers."""
@@ -55,7 +58,7 @@ class KakaoBusinessAPI:
             print("Access token obtained successfully.")
             return True
         else:
-            print(f"Failed to get access token: {token_info.get("error_description", token_info)}")
+            print(f"Failed to get access token: {token_info.get('error_description', token_info)}")
             return False
 
     def refresh_access_token(self) -> bool:
@@ -82,7 +85,7 @@ class KakaoBusinessAPI:
             print("Access token refreshed successfully.")
             return True
         else:
-            print(f"Failed to refresh access token: {token_info.get("error_description", token_info)}")
+            print(f"Failed to refresh access token: {token_info.get('error_description', token_info)}")
             return False
 
     def send_text_message(self, receiver_uuid: str, text: str) -> Dict[str, Any]:
@@ -105,6 +108,33 @@ class KakaoBusinessAPI:
         response = requests.post(self.message_send_url, headers=headers, data=data)
         return response.json()
 
+    def send_text_messages(self, receiver_uuids: List[str], text: str) -> Dict[str, Any]:
+        """Sends one text message to up to 5 friends (receiver_uuids) in a single request.
+        
+        The response lists successful_receiver_uuids and failure_info; on an API
+        error it carries Kakao's error code and msg instead (code -10: rate limit).
+        """
+        if len(receiver_uuids) > self.max_receivers_per_request:
+            raise ValueError(f"At most {self.max_receivers_per_request} receivers per request")
+        template_object = {
+            "object_type": "text",
+            "text": text,
+            "link": {
+                "web_url": "https://developers.kakao.com",
+                "mobile_web_url": "https://developers.kakao.com"
+            },
+            "button_title": "자세히 보기"
+        }
+        
+        data = {
+            "receiver_uuids": json.dumps(receiver_uuids),
+            "template_object": json.dumps(template_object)
+        }
+        
+        headers = self._get_headers()
+        response = requests.post(self.friends_message_send_url, headers=headers, data=data)
+        return response.json()
+
     def send_custom_message(self, receiver_uuid: str, template_id: int, args: Dict[str, str]) -> Dict[str, Any]:
         """Sends a custom message using a predefined template."""
         data = {
@@ -190,6 +220,4 @@ if __name__ == "__main__":
     # else:
     #     print("Kakao authentication failed.")
 
-import time # Added for time.time() in _get_headers
-
 
@@ -10,8 +10,13 @@ logger = logging.getLogger(__name__)
 class PushNotificationService:
     """Service for sending push notifications to various platforms."""
     
-    def __init__(self, firebase_server_key: str = None, apns_cert_path: str = None):
+    # Legacy HTTP API limit on registration_ids per request
+    FCM_MAX_TOKENS_PER_REQUEST = 1000
+    
+    def __init__(self, firebase_server_key: str = None, apns_cert_path: str = None,
+                 fcm_url: str = "https://fcm.googleapis.com/fcm/send"):
         self.firebase_server_key = firebase_server_key
+        self.fcm_url = fcm_url
         self.apns_cert_path = apns_cert_path # For Apple Push Notification Service
         
         if not self.firebase_server_key:
@@ -24,7 +29,6 @@ class PushNotificationService:
             logger.error("FCM server key is not configured.")
             return {"status": "error", "message": "FCM not configured"}
 
-        fcm_url = "https://fcm.googleapis.com/fcm/send"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"key={self.firebase_server_key}"
@@ -40,7 +44,7 @@ class PushNotificationService:
         }
         
         try:
-            response = requests.post(fcm_url, headers=headers, data=json.dumps(payload))
+            response = requests.post(self.fcm_url, headers=headers, data=json.dumps(payload))
             response.raise_for_status() # Raise an exception for HTTP errors
             logger.info(f"FCM notification sent to {device_token}: {response.json()}")
             return response.json()
@@ -48,6 +52,51 @@ class PushNotificationService:
             logger.error(f"Error sending FCM notification: {e}")
             return {"status": "error", "message": str(e)}
 
+    def send_fcm_multicast(self, device_tokens: List[str], title: str, body: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Send one notification to up to 1000 devices in a single FCM request.
+        
+        On success "results" holds one entry per token, in order ({"message_id": ...}
+        or {"error": "NotRegistered"} etc.). On an HTTP error the returned dict has
+        "http_status" and, for 429/5xx responses, the server's "retry_after" seconds.
+        """
+        if not self.firebase_server_key:
+            logger.error("FCM server key is not configured.")
+            return {"status": "error", "message": "FCM not configured"}
+        if len(device_tokens) > self.FCM_MAX_TOKENS_PER_REQUEST:
+            raise ValueError(f"At most {self.FCM_MAX_TOKENS_PER_REQUEST} device tokens per request")
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"key={self.firebase_server_key}"
+        }
+        
+        payload = {
+            "registration_ids": device_tokens,
+            "notification": {
+                "title": title,
+                "body": body
+            },
+            "data": data or {}
+        }
+        
+        try:
+            response = requests.post(self.fcm_url, headers=headers, data=json.dumps(payload))
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"FCM multicast to {len(device_tokens)} devices: {result.get('success')} sent, {result.get('failure')} failed")
+            return result
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Error sending FCM multicast: {e}")
+            return {
+                "status": "error",
+                "message": str(e),
+                "http_status": e.response.status_code,
+                "retry_after": e.response.headers.get("Retry-After")
+            }
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error sending FCM multicast: {e}")
+            return {"status": "error", "message": str(e)}
+
     def send_apns_notification(self, device_token: str, title: str, body: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
         """Send a push notification via Apple Push Notification Service (APNS)."""
         # This is a placeholder. APNS requires more complex setup (certificates/tokens, HTTP/2).
@@ -1,14 +1,32 @@
 # queue_manager.py
 
 import asyncio
+import functools
+import heapq
+import itertools
 import json
 import logging
-from typing import Dict, Any, List, Optional, Callable
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Any, List, Optional, Callable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
+import sys
 import uuid
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from delivery import (DeliveryChannel, DeliveryError, ProviderThrottled, SharedTokenBucket, backoff_delay,
+                      email_channel)
+from queue_store import DEFAULT_QUEUE_DB, DEFAULT_QUEUE_URL, NotificationStore
+from utils.email_sender import EmailSender
+
 logger = logging.getLogger(__name__)
 
 class NotificationPriority(Enum):
@@ -40,6 +58,7 @@ class NotificationTask:
     retry_count: int = 0
     max_retries: int = 3
     last_error: Optional[str] = None
+    idempotency_key: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization."""
@@ -50,21 +69,83 @@ class NotificationTask:
         if self.scheduled_at:
             data['scheduled_at'] = self.scheduled_at.isoformat()
         return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NotificationTask":
+        """Inverse of to_dict (used to reload tasks from the queue store)."""
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            notification_type=data['notification_type'],
+            title=data['title'],
+            message=data['message'],
+            data=data.get('data') or {},
+            priority=NotificationPriority(data['priority']),
+            status=NotificationStatus(data['status']),
+            created_at=datetime.fromisoformat(data['created_at']),
+            scheduled_at=datetime.fromisoformat(data['scheduled_at']) if data.get('scheduled_at') else None,
+            retry_count=data.get('retry_count', 0),
+            max_retries=data.get('max_retries', 3),
+            last_error=data.get('last_error'),
+            idempotency_key=data.get('idempotency_key')
+        )
 
 class NotificationQueueManager:
-    """Manages notification queues with priority, retry logic, and scheduling."""
+    """Manages notification queues with priority, retry logic, and scheduling.
     
-    def __init__(self, max_workers: int = 5, retry_delay: int = 60):
-        self.queues: Dict[NotificationPriority, asyncio.Queue] = {
-            priority: asyncio.Queue() for priority in NotificationPriority
-        }
-        self.scheduled_tasks: List[NotificationTask] = []
+    Ready tasks live in one heap ordered by priority (FIFO within a priority) and
+    scheduled/retry tasks in a heap ordered by due time. Workers and the scheduler
+    sleep on conditions and are woken when there is work, instead of polling.
+    
+    With a store every task is persisted before it is queued and leased before it
+    is delivered, so pending, scheduled and retrying tasks survive a restart and
+    are delivered at least once. Completed/failed history is kept in bounded ring
+    buffers; older entries remain in the store until purged.
+    
+    In shared mode the store is the queue itself: any process can add
+    notifications, and each running manager (dispatcher) claims due tasks from
+    the store for its idle workers, so several processes and hosts can dispatch
+    from one queue (see run_dispatchers).
+    """
+    
+    def __init__(self, max_workers: int = 5, retry_delay: int = 60,
+                 store: Optional[NotificationStore] = None, history_size: int = 1000,
+                 sent_retention: float = 7 * 24 * 3600, failed_retention: float = 30 * 24 * 3600,
+                 shared: bool = False, poll_interval: float = 0.5, max_retry_delay: int = 3600):
+        if shared and not store:
+            raise ValueError("Shared queue mode requires a NotificationStore")
+        
+        # (-priority, sequence, task) and (scheduled_at, sequence, task)
+        self._ready: List[tuple] = []
+        self._scheduled: List[tuple] = []
+        self._ready_counts: Dict[NotificationPriority, int] = {priority: 0 for priority in NotificationPriority}
+        self._sequence = itertools.count()
+        self._lock = asyncio.Lock()
+        self._task_available = asyncio.Condition(self._lock)
+        self._schedule_changed = asyncio.Condition(self._lock)
+        self._slot_free = asyncio.Condition(self._lock)
+        self._busy = 0
         self.processing_tasks: Dict[str, NotificationTask] = {}
-        self.completed_tasks: List[NotificationTask] = []
-        self.failed_tasks: List[NotificationTask] = []
+        self.completed_tasks: Deque[NotificationTask] = deque(maxlen=history_size)
+        self.failed_tasks: Deque[NotificationTask] = deque(maxlen=history_size)
+        
+        # Durable store (all calls run on one executor thread, off the event loop)
+        self.store = store
+        self.lease_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.sent_retention = sent_retention
+        self.failed_retention = failed_retention
+        self.purge_interval = 3600
+        self._last_purge = 0.0
+        self._store_executor: Optional[ThreadPoolExecutor] = None
+        self._store_executor_pid = None
+        
+        # Shared mode: claim from the store; other processes' work is noticed within poll_interval
+        self.shared = shared
+        self.poll_interval = poll_interval
         
         self.max_workers = max_workers
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
         self.workers: List[asyncio.Task] = []
         self.scheduler_task: Optional[asyncio.Task] = None
         self.is_running = False
@@ -72,11 +153,31 @@ class NotificationQueueManager:
         # Notification handlers
         self.handlers: Dict[str, Callable] = {}
         
+        # Rate-limited provider channels (take precedence over handlers)
+        self.channels: Dict[str, DeliveryChannel] = {}
+        self.channel_tasks: List[asyncio.Task] = []
+        
     def register_handler(self, notification_type: str, handler: Callable):
         """Register a handler for a specific notification type."""
         self.handlers[notification_type] = handler
         logger.info(f"Registered handler for notification type: {notification_type}")
     
+    def register_channel(self, notification_type: str, channel: DeliveryChannel):
+        """Deliver a notification type through a rate-limited, batching provider channel.
+        
+        Workers hand the task to the channel; policy.concurrency dispatchers per
+        channel send batches within the provider's rate limit (see delivery.py).
+        With a store the channel's token bucket is kept in the store, so every
+        process delivering through it shares policy.rate instead of each using it.
+        """
+        if self.store:
+            channel.bucket = SharedTokenBucket(functools.partial(self._store_call, "take_tokens", channel.name),
+                                               channel.bucket.rate, channel.bucket.capacity)
+        self.channels[notification_type] = channel
+        if self.is_running:
+            self._start_channel(channel)
+        logger.info(f"Registered {channel.name} channel for notification type: {notification_type}")
+    
     async def add_notification(self, 
                              user_id: int,
                              notification_type: str,
@@ -84,8 +185,13 @@ class NotificationQueueManager:
                              message: str,
                              data: Dict[str, Any] = None,
                              priority: NotificationPriority = NotificationPriority.NORMAL,
-                             scheduled_at: Optional[datetime] = None) -> str:
-        """Add a notification to the queue."""
+                             scheduled_at: Optional[datetime] = None,
+                             idempotency_key: Optional[str] = None) -> str:
+        """Add a notification to the queue.
+        
+        With a store, a repeated idempotency_key returns the id of the task that
+        was already queued instead of queueing it again.
+        """
         
         task = NotificationTask(
             id=str(uuid.uuid4()),
@@ -97,28 +203,77 @@ class NotificationQueueManager:
             priority=priority,
             status=NotificationStatus.PENDING,
             created_at=datetime.now(),
-            scheduled_at=scheduled_at
+            scheduled_at=scheduled_at,
+            idempotency_key=idempotency_key
         )
         
+        if self.store:
+            existing = await self._store_call("enqueue", task.to_dict())
+            if existing:
+                logger.info(f"Duplicate notification ignored: {idempotency_key} -> {existing['id']}")
+                return existing["id"]
+        
+        if self.shared:
+            # Dispatchers claim it from the store; wake this process's claimer if it runs one
+            async with self._lock:
+                self._schedule_changed.notify()
+            logger.info(f"Notification stored for dispatch: {task.id} with priority {priority.name}")
+            return task.id
+        
         if scheduled_at and scheduled_at > datetime.now():
             # Schedule for later
-            self.scheduled_tasks.append(task)
+            await self._schedule(task)
             logger.info(f"Notification scheduled: {task.id} for {scheduled_at}")
         else:
-            # Add to appropriate priority queue
-            await self.queues[priority].put(task)
+            # Add to the ready heap
+            await self._enqueue(task)
             logger.info(f"Notification queued: {task.id} with priority {priority.name}")
         
         return task.id
     
-    async def process_notification(self, task: NotificationTask) -> bool:
-        """Process a single notification task."""
+    async def _store_call(self, method: str, *args):
+        """Run a NotificationStore method on the store thread."""
+        if self._store_executor is None or self._store_executor_pid != os.getpid():
+            # Created lazily so a forked worker process never reuses the parent's thread
+            self._store_executor = ThreadPoolExecutor(1, thread_name_prefix="notification-store")
+            self._store_executor_pid = os.getpid()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._store_executor, functools.partial(getattr(self.store, method), *args))
+    
+    async def _enqueue(self, task: NotificationTask):
+        """Push a task onto the ready heap and wake one worker."""
+        async with self._lock:
+            self._push_ready(task)
+            self._task_available.notify()
+    
+    def _push_ready(self, task: NotificationTask):
+        heapq.heappush(self._ready, (-task.priority.value, next(self._sequence), task))
+        self._ready_counts[task.priority] += 1
+    
+    async def _schedule(self, task: NotificationTask):
+        """Push a task onto the time heap; wake the scheduler if it is now the earliest."""
+        async with self._lock:
+            heapq.heappush(self._scheduled, (task.scheduled_at, next(self._sequence), task))
+            if self._scheduled[0][2] is task:
+                self._schedule_changed.notify()
+    
+    async def _begin(self, task: NotificationTask, leased: bool) -> bool:
+        """Lease the task (unless already claimed) and mark it processing."""
+        if self.store and not leased and not await self._store_call("lease", task.id, self.lease_owner):
+            # Already sent, or leased by another live process
+            logger.info(f"Notification {task.id} is not deliverable, skipping")
+            return False
+        task.status = NotificationStatus.PROCESSING
+        self.processing_tasks[task.id] = task
+        logger.info(f"Processing notification: {task.id}")
+        return True
+    
+    async def process_notification(self, task: NotificationTask, leased: bool = False) -> bool:
+        """Process a single notification task (leased: already claimed from the store)."""
+        if not await self._begin(task, leased):
+            return False
+        
         try:
-            task.status = NotificationStatus.PROCESSING
-            self.processing_tasks[task.id] = task
-            
-            logger.info(f"Processing notification: {task.id}")
-            
             # Get handler for notification type
             handler = self.handlers.get(task.notification_type)
             if not handler:
@@ -128,37 +283,139 @@ class NotificationQueueManager:
             result = await handler(task)
             
             if result:
-                task.status = NotificationStatus.SENT
-                self.completed_tasks.append(task)
-                logger.info(f"Notification sent successfully: {task.id}")
+                await self._complete(task)
                 return True
             else:
                 raise Exception("Handler returned False")
                 
         except Exception as e:
-            error_msg = str(e)
-            task.last_error = error_msg
-            task.retry_count += 1
-            
-            logger.error(f"Error processing notification {task.id}: {error_msg}")
-            
-            if task.retry_count < task.max_retries:
-                task.status = NotificationStatus.RETRY
-                # Schedule retry
-                retry_time = datetime.now() + timedelta(seconds=self.retry_delay * task.retry_count)
-                task.scheduled_at = retry_time
-                self.scheduled_tasks.append(task)
-                logger.info(f"Notification {task.id} scheduled for retry at {retry_time}")
-            else:
-                task.status = NotificationStatus.FAILED
-                self.failed_tasks.append(task)
-                logger.error(f"Notification {task.id} failed after {task.max_retries} retries")
-            
+            await self._handle_failure(task, str(e))
             return False
+    
+    async def _complete(self, task: NotificationTask):
+        task.status = NotificationStatus.SENT
+        self.processing_tasks.pop(task.id, None)
+        if self.store:
+            await self._store_call("ack", task.id)
+        self.completed_tasks.append(task)
+        logger.info(f"Notification sent successfully: {task.id}")
+    
+    def _retry_delay(self, retry_count: int) -> float:
+        """Exponential backoff with jitter, so a failed batch does not retry in lockstep."""
+        return backoff_delay(retry_count, self.retry_delay, self.max_retry_delay)
+    
+    async def _handle_failure(self, task: NotificationTask, error_msg: str, retryable: bool = True):
+        """Schedule a retry with backoff, or fail the task once retries are used up."""
+        task.last_error = error_msg
+        task.retry_count += 1
+        self.processing_tasks.pop(task.id, None)
+        
+        logger.error(f"Error processing notification {task.id}: {error_msg}")
+        
+        if retryable and task.retry_count < task.max_retries:
+            # Schedule retry
+            await self._defer(task, self._retry_delay(task.retry_count), error_msg)
+            logger.info(f"Notification {task.id} scheduled for retry at {task.scheduled_at}")
+        else:
+            task.status = NotificationStatus.FAILED
+            if self.store:
+                await self._store_call("fail", task.id, task.retry_count, error_msg)
+            self.failed_tasks.append(task)
+            logger.error(f"Notification {task.id} failed after {task.retry_count} attempts")
+    
+    async def _defer(self, task: NotificationTask, delay: float, reason: Optional[str]):
+        """Put the task back for a later attempt (retry_count is left to the caller)."""
+        task.status = NotificationStatus.RETRY
+        task.scheduled_at = datetime.now() + timedelta(seconds=delay)
+        self.processing_tasks.pop(task.id, None)
+        if self.store:
+            await self._store_call("reschedule", task.id, task.status.value, task.scheduled_at.isoformat(),
+                                   task.retry_count, reason)
+        if not self.shared:
+            await self._schedule(task)
+    
+    async def _submit_to_channel(self, task: NotificationTask, channel: DeliveryChannel, leased: bool):
+        """Hand a task to its channel (waits while the channel's buffer is full)."""
+        if await self._begin(task, leased):
+            await channel.submit(task)
+    
+    def _start_channel(self, channel: DeliveryChannel):
+        for _ in range(channel.policy.concurrency):
+            self.channel_tasks.append(asyncio.create_task(self.channel_dispatcher(channel)))
+    
+    async def _record_results(self, channel: DeliveryChannel, outcomes):
+        """Complete or retry/fail each (task, DeliveryResult) of a sent batch."""
+        for task, result in outcomes:
+            if result.ok:
+                channel.stats["sent"] += 1
+                await self._complete(task)
+            else:
+                channel.stats["failed"] += 1
+                await self._handle_failure(task, result.error, result.retryable)
+    
+    async def _record_completed(self, channel: DeliveryChannel, batch: List[NotificationTask],
+                                completed: Dict[str, Any]) -> List[NotificationTask]:
+        """Record the tasks a partly failed batch did send -> the unsent tasks."""
+        await self._record_results(channel, [(task, completed[task.id]) for task in batch if task.id in completed])
+        return [task for task in batch if task.id not in completed]
+    
+    async def _renew_leases(self, batch: List[NotificationTask]) -> List[NotificationTask]:
+        """Renew the leases of a batch about to be sent -> the tasks this process still owns.
+        
+        Tasks can wait in the channel buffer longer than the visibility timeout
+        (behind the rate limit or a provider pause); one whose lease expired and
+        went back to the queue is dropped here and delivered by whoever claims it.
+        """
+        renewed = set(await self._store_call("extend_lease", [task.id for task in batch], self.lease_owner))
+        for task in batch:
+            if task.id not in renewed:
+                self.processing_tasks.pop(task.id, None)
+                logger.info(f"Lease on notification {task.id} expired while buffered, skipping")
+        return [task for task in batch if task.id in renewed]
+    
+    async def channel_dispatcher(self, channel: DeliveryChannel):
+        """Send a channel's tasks in batches within its rate limit and circuit breaker."""
+        logger.info(f"{channel.name} dispatcher started")
         
-        finally:
-            if task.id in self.processing_tasks:
-                del self.processing_tasks[task.id]
+        while self.is_running:
+            try:
+                batch = await channel.next_batch()
+                
+                wait = channel.breaker.retry_after()
+                if wait:
+                    # Provider is down: park the batch until the circuit may close (not a failed attempt)
+                    channel.stats["deferred"] += len(batch)
+                    for task in batch:
+                        await self._defer(task, wait + random.uniform(0, wait / 2), f"{channel.name} circuit open")
+                    continue
+                
+                if self.store:
+                    batch = await self._renew_leases(batch)
+                    if not batch:
+                        continue
+                
+                try:
+                    results = await channel.deliver(batch)
+                except ProviderThrottled as e:
+                    # The bucket is paused for retry_after; the unsent tasks go first once it refills
+                    logger.warning(f"{channel.name} throttled, pausing {e.retry_after}s")
+                    channel.requeue(await self._record_completed(channel, batch, e.completed))
+                    continue
+                except DeliveryError as e:
+                    unsent = await self._record_completed(channel, batch, e.completed)
+                    channel.stats["failed"] += len(unsent)
+                    for task in unsent:
+                        await self._handle_failure(task, str(e))
+                    continue
+                
+                await self._record_results(channel, zip(batch, results))
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{channel.name} dispatcher error: {str(e)}")
+        
+        logger.info(f"{channel.name} dispatcher stopped")
     
     async def worker(self, worker_id: int):
         """Worker coroutine to process notifications."""
@@ -166,55 +423,160 @@ class NotificationQueueManager:
         
         while self.is_running:
             try:
-                # Check queues in priority order
-                task = None
-                for priority in sorted(NotificationPriority, key=lambda x: x.value, reverse=True):
-                    try:
-                        task = self.queues[priority].get_nowait()
+                # Sleep until a task is pushed, then take the highest priority one
+                async with self._lock:
+                    while self.is_running and not self._ready:
+                        await self._task_available.wait()
+                    if not self.is_running:
                         break
-                    except asyncio.QueueEmpty:
-                        continue
+                    _, _, task = heapq.heappop(self._ready)
+                    self._ready_counts[task.priority] -= 1
+                    self._busy += 1
                 
-                if task:
-                    await self.process_notification(task)
-                    self.queues[task.priority].task_done()
-                else:
-                    # No tasks available, wait a bit
-                    await asyncio.sleep(1)
-                    
+                try:
+                    channel = self.channels.get(task.notification_type)
+                    if channel:
+                        await self._submit_to_channel(task, channel, leased=self.shared)
+                    else:
+                        await self.process_notification(task, leased=self.shared)
+                finally:
+                    self._busy -= 1
+                    if self.shared:
+                        # Let the claimer fetch work for the free worker
+                        async with self._lock:
+                            self._slot_free.notify()
+                await self._maybe_purge()
+                
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Worker {worker_id} error: {str(e)}")
-                await asyncio.sleep(1)
         
         logger.info(f"Worker {worker_id} stopped")
     
     async def scheduler(self):
-        """Scheduler coroutine to handle scheduled notifications."""
+        """Scheduler coroutine to move due scheduled/retry notifications to the ready heap."""
         logger.info("Scheduler started")
         
+        async with self._lock:
+            while self.is_running:
+                try:
+                    current_time = datetime.now()
+                    ready_count = 0
+                    while self._scheduled and self._scheduled[0][0] <= current_time:
+                        _, _, task = heapq.heappop(self._scheduled)
+                        self._push_ready(task)
+                        ready_count += 1
+                        logger.debug(f"Scheduled notification moved to queue: {task.id}")
+                    if ready_count:
+                        self._task_available.notify(ready_count)
+                    
+                    # Sleep until the earliest task is due or an earlier one is scheduled
+                    if self._scheduled:
+                        timeout = (self._scheduled[0][0] - datetime.now()).total_seconds()
+                        if timeout > 0:
+                            try:
+                                await asyncio.wait_for(self._schedule_changed.wait(), timeout)
+                            except asyncio.TimeoutError:
+                                pass
+                    else:
+                        await self._schedule_changed.wait()
+                    
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Scheduler error: {str(e)}")
+        
+        logger.info("Scheduler stopped")
+    
+    async def claimer(self):
+        """Shared mode: claim due tasks from the store for idle workers.
+        
+        Claims at most as many tasks as there are idle workers, so nothing sits
+        leased in a local queue. When nothing is due it sleeps until the earliest
+        due time, a local add_notification, or poll_interval (for tasks added by
+        other processes), whichever comes first.
+        """
+        logger.info("Claimer started")
+        
         while self.is_running:
             try:
-                current_time = datetime.now()
-                ready_tasks = []
-                
-                # Find tasks ready to be processed
-                for task in self.scheduled_tasks[:]:
-                    if task.scheduled_at and task.scheduled_at <= current_time:
-                        ready_tasks.append(task)
-                        self.scheduled_tasks.remove(task)
+                async with self._lock:
+                    while self.is_running and self._busy + len(self._ready) >= self.max_workers:
+                        await self._slot_free.wait()
+                    capacity = self.max_workers - self._busy - len(self._ready)
+                if not self.is_running:
+                    break
                 
-                # Add ready tasks to appropriate queues
-                for task in ready_tasks:
-                    await self.queues[task.priority].put(task)
-                    logger.info(f"Scheduled notification moved to queue: {task.id}")
+                rows = await self._store_call("claim", self.lease_owner, capacity)
+                if rows:
+                    async with self._lock:
+                        for row in rows:
+                            self._push_ready(NotificationTask.from_dict(row))
+                        self._task_available.notify(len(rows))
+                    if len(rows) == capacity:
+                        continue
                 
-                await asyncio.sleep(10)  # Check every 10 seconds
+                next_due = await self._store_call("next_available_at")
+                timeout = self.poll_interval
+                if next_due is not None:
+                    timeout = min(max(next_due - time.time(), 0.001), self.poll_interval)
+                async with self._lock:
+                    try:
+                        await asyncio.wait_for(self._schedule_changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Scheduler error: {str(e)}")
-                await asyncio.sleep(10)
+                logger.error(f"Claimer error: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
         
-        logger.info("Scheduler stopped")
+        logger.info("Claimer stopped")
+    
+    async def _maybe_purge(self):
+        """Drop old sent/failed rows from the store (at most once per purge_interval)."""
+        if not self.store or time.monotonic() - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = time.monotonic()
+        purged = await self._store_call("purge", self.sent_retention, self.failed_retention)
+        if purged:
+            logger.info(f"Purged {purged} finished notifications from the queue store")
+    
+    async def recover(self) -> int:
+        """Reload undelivered tasks from the store -> number of tasks queued.
+        
+        Tasks leased by a process that died are delivered again once the lease
+        expires (at-least-once delivery).
+        """
+        if not self.store:
+            return 0
+        rows = await self._store_call("load_deliverable")
+        async with self._lock:
+            known = {entry[2].id for entry in self._ready} | {entry[2].id for entry in self._scheduled}
+            known.update(self.processing_tasks)
+            recovered = 0
+            for row in rows:
+                if row["id"] in known:
+                    continue
+                task = NotificationTask.from_dict(row)
+                due = task.scheduled_at
+                if row["status"] == NotificationStatus.PROCESSING.value:
+                    task.status = NotificationStatus.RETRY
+                    lease_expiry = datetime.fromtimestamp(row["lease_expires_at"] or 0)
+                    due = max(due, lease_expiry) if due else lease_expiry
+                if due and due > datetime.now():
+                    task.scheduled_at = due
+                    heapq.heappush(self._scheduled, (due, next(self._sequence), task))
+                else:
+                    self._push_ready(task)
+                recovered += 1
+            self._task_available.notify(recovered)
+            self._schedule_changed.notify()
+        if recovered:
+            logger.info(f"Recovered {recovered} notifications from the queue store")
+        return recovered
     
     async def start(self):
         """Start the queue manager."""
@@ -223,16 +585,22 @@ class NotificationQueueManager:
             return
         
         self.is_running = True
+        if not self.shared:
+            await self.recover()
+        await self._maybe_purge()
         
         # Start workers
         for i in range(self.max_workers):
             worker_task = asyncio.create_task(self.worker(i))
             self.workers.append(worker_task)
         
-        # Start scheduler
-        self.scheduler_task = asyncio.create_task(self.scheduler())
+        # Start scheduler (claimer in shared mode: the store keeps the schedule)
+        self.scheduler_task = asyncio.create_task(self.claimer() if self.shared else self.scheduler())
         
-        logger.info(f"Queue manager started with {self.max_workers} workers")
+        for channel in self.channels.values():
+            self._start_channel(channel)
+        
+        logger.info(f"Queue manager started with {self.max_workers} workers" + (" (shared queue)" if self.shared else ""))
     
     async def stop(self):
         """Stop the queue manager."""
@@ -242,18 +610,27 @@ class NotificationQueueManager:
         
         self.is_running = False
         
+        # Wake sleeping workers and the scheduler so they exit their loops
+        async with self._lock:
+            self._task_available.notify_all()
+            self._schedule_changed.notify_all()
+            self._slot_free.notify_all()
+        
         # Cancel workers
         for worker in self.workers:
             worker.cancel()
         
-        # Cancel scheduler
+        # Cancel scheduler and channel dispatchers (buffered tasks stay leased and are redelivered)
         if self.scheduler_task:
             self.scheduler_task.cancel()
+        for channel_task in self.channel_tasks:
+            channel_task.cancel()
         
         # Wait for all tasks to complete
-        await asyncio.gather(*self.workers, self.scheduler_task, return_exceptions=True)
+        await asyncio.gather(*self.workers, self.scheduler_task, *self.channel_tasks, return_exceptions=True)
         
         self.workers.clear()
+        self.channel_tasks.clear()
         self.scheduler_task = None
         
         logger.info("Queue manager stopped")
@@ -262,16 +639,22 @@ class NotificationQueueManager:
         """Get queue statistics."""
         stats = {
             "queues": {},
-            "scheduled_tasks": len(self.scheduled_tasks),
+            "scheduled_tasks": len(self._scheduled),
             "processing_tasks": len(self.processing_tasks),
             "completed_tasks": len(self.completed_tasks),
             "failed_tasks": len(self.failed_tasks),
             "is_running": self.is_running,
-            "workers": len(self.workers)
+            "workers": len(self.workers),
+            "persistent": self.store is not None,
+            "shared": self.shared,
+            "channels": {
+                notification_type: dict(channel.stats, pending=channel.pending, circuit=channel.breaker.state)
+                for notification_type, channel in self.channels.items()
+            }
         }
         
-        for priority, queue in self.queues.items():
-            stats["queues"][priority.name] = queue.qsize()
+        for priority, count in self._ready_counts.items():
+            stats["queues"][priority.name] = count
         
         return stats
     
@@ -279,8 +662,8 @@ class NotificationQueueManager:
         """Get task history."""
         all_tasks = (
             list(self.processing_tasks.values()) +
-            self.completed_tasks[-limit:] +
-            self.failed_tasks[-limit:]
+            list(itertools.islice(reversed(self.completed_tasks), limit)) +
+            list(itertools.islice(reversed(self.failed_tasks), limit))
         )
         
         # Sort by creation time
@@ -288,6 +671,12 @@ class NotificationQueueManager:
         
         return [task.to_dict() for task in all_tasks[:limit]]
     
+    async def get_tasks_by_key_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        """Stored tasks whose idempotency key starts with prefix (status of a multi-recipient job)."""
+        if not self.store:
+            return []
+        return await self._store_call("find_by_key_prefix", prefix)
+    
     async def retry_failed_task(self, task_id: str) -> bool:
         """Manually retry a failed task."""
         failed_task = None
@@ -296,6 +685,14 @@ class NotificationQueueManager:
                 failed_task = task
                 break
         
+        if failed_task:
+            self.failed_tasks.remove(failed_task)
+        elif self.store:
+            # Older failures have left the history ring buffer but are still stored
+            row = await self._store_call("get", task_id)
+            if row and row["status"] == NotificationStatus.FAILED.value:
+                failed_task = NotificationTask.from_dict(row)
+        
         if not failed_task:
             logger.warning(f"Failed task not found: {task_id}")
             return False
@@ -305,14 +702,25 @@ class NotificationQueueManager:
         failed_task.retry_count = 0
         failed_task.last_error = None
         
-        await self.queues[failed_task.priority].put(failed_task)
-        self.failed_tasks.remove(failed_task)
+        if self.store:
+            await self._store_call("reschedule", failed_task.id, failed_task.status.value, None, 0, None)
+        if self.shared:
+            # Dispatchers claim it from the store; wake this process's claimer if it runs one
+            async with self._lock:
+                self._schedule_changed.notify()
+        else:
+            await self._enqueue(failed_task)
         
         logger.info(f"Failed task {task_id} added back to queue")
         return True
 
-# Global queue manager instance
-notification_queue = NotificationQueueManager()
+# Global queue manager instance (persisted in NOTIFICATION_QUEUE_DB / NOTIFICATION_QUEUE_URL).
+# With NOTIFICATION_QUEUE_SHARED=1 every API process only stores notifications and
+# run_dispatchers() processes deliver them.
+notification_queue = NotificationQueueManager(
+    store=NotificationStore(),
+    shared=os.getenv("NOTIFICATION_QUEUE_SHARED", "0") == "1"
+)
 
 # Example handlers
 async def websocket_notification_handler(task: NotificationTask) -> bool:
@@ -337,8 +745,218 @@ async def email_notification_handler(task: NotificationTask) -> bool:
         logger.error(f"Email notification failed: {str(e)}")
         return False
 
+def smtp_email_channel() -> DeliveryChannel:
+    """Email channel over a pooled EmailSender for the SMTP_* settings (as in routes/notification_api.py)."""
+    smtp_user = os.getenv("SMTP_USER", "your_email@gmail.com")
+    sender = EmailSender(os.getenv("SMTP_SERVER", "smtp.gmail.com"), int(os.getenv("SMTP_PORT", 587)),
+                         smtp_user, os.getenv("SMTP_PASSWORD", "your_app_password"))
+    return email_channel(sender, smtp_user)
+
+def register_default_handlers(manager: NotificationQueueManager):
+    """Handlers registered by dispatcher processes (module level so spawned processes can import it).
+    
+    Email goes through the rate-limited SMTP channel; task.data['email'] is the recipient.
+    """
+    manager.register_handler("websocket", websocket_notification_handler)
+    manager.register_channel("email", smtp_email_channel())
+
+def _dispatcher_main(setup: Callable, workers: int, db_path: str, database_url: Optional[str]):
+    """One dispatcher process: run a shared-mode manager until SIGTERM / SIGINT."""
+    async def main():
+        manager = NotificationQueueManager(
+            max_workers=workers,
+            store=NotificationStore(db_path, database_url=database_url),
+            shared=True
+        )
+        setup(manager)
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop_event.set)
+        await manager.start()
+        await stop_event.wait()
+        # Tasks interrupted here keep their lease and are redelivered after it expires
+        await manager.stop()
+    
+    asyncio.run(main())
+
+def run_dispatchers(processes: Optional[int] = None, workers_per_process: int = 5,
+                    setup: Callable = register_default_handlers, db_path: str = DEFAULT_QUEUE_DB,
+                    database_url: Optional[str] = DEFAULT_QUEUE_URL, wait: bool = True) -> List[multiprocessing.Process]:
+    """Start shared-queue dispatcher processes (default: one per CPU core).
+    
+    Run it on every dispatcher host against the same store (a PostgreSQL
+    NOTIFICATION_QUEUE_URL for several hosts). setup registers the handlers and
+    must be a module-level function, because processes are spawned, not forked.
+    Channel rate limits (e.g. NOTIFICATION_EMAIL_RATE) are shared through the
+    store, so they apply to all dispatchers together, not to each one.
+    """
+    context = multiprocessing.get_context("spawn")
+    dispatchers = [
+        context.Process(target=_dispatcher_main, args=(setup, workers_per_process, db_path, database_url),
+                        name=f"notification-dispatcher-{i}")
+        for i in range(processes or os.cpu_count() or 1)
+    ]
+    for process in dispatchers:
+        process.start()
+    logger.info(f"Started {len(dispatchers)} notification dispatchers with {workers_per_process} workers each")
+    
+    if wait:
+        try:
+            for process in dispatchers:
+                process.join()
+        except KeyboardInterrupt:
+            for process in dispatchers:
+                process.terminate()
+            for process in dispatchers:
+                process.join()
+    return dispatchers
+
+async def benchmark_queue(tasks: int = 100_000, workers: int = 5,
+                          scheduled_fraction: float = 0.1, yield_every: int = 0,
+                          store: Optional[NotificationStore] = None) -> Dict[str, Any]:
+    """Throughput and enqueue-to-dispatch latency for `tasks` notifications.
+    
+    With yield_every=0 all tasks are queued before the workers run (backlog);
+    otherwise the producer yields every yield_every tasks (steady flow). Every
+    1/scheduled_fraction-th task is scheduled 50 ms ahead to exercise the time
+    heap; its latency is measured from the scheduled time. Pass a store to
+    include persistence (enqueue, lease and ack commits).
+    """
+    manager = NotificationQueueManager(max_workers=workers, store=store)
+    latencies: List[float] = []
+    finished = asyncio.Event()
+    
+    async def handler(task: NotificationTask) -> bool:
+        latencies.append(time.perf_counter() - task.data["due"])
+        if len(latencies) == tasks:
+            finished.set()
+        return True
+    
+    manager.register_handler("benchmark", handler)
+    priorities = list(NotificationPriority)
+    schedule_every = int(1 / scheduled_fraction) if scheduled_fraction else 0
+    
+    await manager.start()
+    started = time.perf_counter()
+    for i in range(tasks):
+        due, scheduled_at = time.perf_counter(), None
+        if schedule_every and i % schedule_every == 0:
+            due += 0.05
+            scheduled_at = datetime.now() + timedelta(seconds=0.05)
+        await manager.add_notification(
+            user_id=i, notification_type="benchmark", title="benchmark", message="",
+            data={"due": due}, priority=priorities[i % len(priorities)], scheduled_at=scheduled_at
+        )
+        if yield_every and i % yield_every == 0:
+            await asyncio.sleep(0)
+    enqueue_seconds = time.perf_counter() - started
+    await finished.wait()
+    total_seconds = time.perf_counter() - started
+    await manager.stop()
+    
+    latencies.sort()
+    return {
+        "tasks": tasks,
+        "workers": workers,
+        "mode": f"yield every {yield_every}" if yield_every else "backlog",
+        "persistent": store is not None,
+        "enqueue_seconds": round(enqueue_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "throughput_per_second": round(tasks / total_seconds),
+        "p50_latency_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_latency_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "max_latency_ms": round(latencies[-1] * 1000, 2)
+    }
+
+def _benchmark_dispatch_setup(manager: NotificationQueueManager):
+    """Dispatcher setup for benchmark_shared_dispatch: simulated I/O, one log line per delivery."""
+    delay = float(os.environ["NOTIFICATION_BENCHMARK_DELAY"])
+    log_path = os.environ["NOTIFICATION_BENCHMARK_LOG"]
+    
+    async def handler(task: NotificationTask) -> bool:
+        await asyncio.sleep(delay)
+        with open(log_path, "a") as f:
+            f.write(f"{task.id} {os.getpid()}\n")
+        return True
+    
+    manager.register_handler("benchmark", handler)
+
+def benchmark_shared_dispatch(tasks: int = 5000, process_counts: tuple = (1, 2, 4),
+                              workers_per_process: int = 5, handler_delay: float = 0.005) -> List[Dict[str, Any]]:
+    """Shared-queue throughput with several local dispatcher processes.
+    
+    The tasks all become due at the same moment once the dispatchers are up; the
+    report includes duplicate deliveries (should be 0) and the per-process split.
+    """
+    import tempfile
+    
+    results = []
+    for processes in process_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "queue.db")
+            log_path = os.path.join(directory, "deliveries.log")
+            store = NotificationStore(db_path, database_url=None)
+            due_at = datetime.now() + timedelta(seconds=3)
+            for i in range(tasks):
+                task = NotificationTask(
+                    id=str(uuid.uuid4()), user_id=i, notification_type="benchmark", title="benchmark",
+                    message="", data={}, priority=NotificationPriority.NORMAL,
+                    status=NotificationStatus.PENDING, created_at=datetime.now(), scheduled_at=due_at
+                )
+                store.enqueue(task.to_dict())
+            
+            os.environ["NOTIFICATION_BENCHMARK_DELAY"] = str(handler_delay)
+            os.environ["NOTIFICATION_BENCHMARK_LOG"] = log_path
+            dispatchers = run_dispatchers(processes, workers_per_process, _benchmark_dispatch_setup,
+                                          db_path, None, wait=False)
+            while store.counts().get("sent", 0) < tasks:
+                time.sleep(0.05)
+            elapsed = (datetime.now() - due_at).total_seconds()
+            for process in dispatchers:
+                process.terminate()
+            for process in dispatchers:
+                process.join()
+            store.close()
+            
+            with open(log_path) as f:
+                deliveries = [line.split() for line in f]
+            per_process: Dict[str, int] = {}
+            for _, pid in deliveries:
+                per_process[pid] = per_process.get(pid, 0) + 1
+            results.append({
+                "processes": processes,
+                "workers_per_process": workers_per_process,
+                "tasks": tasks,
+                "seconds": round(elapsed, 3),
+                "throughput_per_second": round(tasks / elapsed),
+                "duplicate_deliveries": len(deliveries) - len({task_id for task_id, _ in deliveries}),
+                "per_process": sorted(per_process.values(), reverse=True)
+            })
+    return results
+
 # Example usage
 if __name__ == "__main__":
+    if "--dispatch" in sys.argv:
+        # python queue_manager.py --dispatch [processes]
+        position = sys.argv.index("--dispatch") + 1
+        run_dispatchers(int(sys.argv[position]) if len(sys.argv) > position else None)
+        sys.exit(0)
+    
+    if "--benchmark-shared" in sys.argv:
+        print(json.dumps(benchmark_shared_dispatch(), indent=2))
+        sys.exit(0)
+    
+    if "--benchmark" in sys.argv:
+        print(json.dumps(asyncio.run(benchmark_queue()), indent=2))
+        print(json.dumps(asyncio.run(benchmark_queue(yield_every=100)), indent=2))
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            store = NotificationStore(os.path.join(directory, "benchmark_queue.db"))
+            print(json.dumps(asyncio.run(benchmark_queue(tasks=20_000, yield_every=100, store=store)), indent=2))
+            store.close()
+        sys.exit(0)
+    
     async def main():
         # Register handlers
         notification_queue.register_handler("websocket", websocket_notification_handler)
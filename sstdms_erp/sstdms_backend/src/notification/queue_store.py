@@ -0,0 +1,342 @@
+# queue_store.py
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import is_postgres, open_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_DB = os.getenv(
+    "NOTIFICATION_QUEUE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "notification_queue.db")
+)
+# A shared PostgreSQL database lets dispatchers on several hosts claim from one queue
+DEFAULT_QUEUE_URL = os.getenv("NOTIFICATION_QUEUE_URL") or None
+# Seconds a claimed task stays leased; unacknowledged tasks are delivered again after it
+VISIBILITY_TIMEOUT = float(os.getenv("NOTIFICATION_QUEUE_VISIBILITY_TIMEOUT", "300"))
+# NORMAL survives process crashes in WAL mode; FULL also survives power loss at the cost of an fsync per commit
+QUEUE_SYNCHRONOUS = os.getenv("NOTIFICATION_QUEUE_SYNCHRONOUS", "NORMAL")
+
+# Statuses a task can be delivered from (inlined as literals where the partial index must match)
+DELIVERABLE_STATUSES = ("pending", "retry")
+DELIVERABLE_SQL = ", ".join(f"'{status}'" for status in DELIVERABLE_STATUSES)
+
+QUEUE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS notification_queue (
+        id TEXT PRIMARY KEY,
+        idempotency_key TEXT UNIQUE,
+        user_id INTEGER NOT NULL,
+        notification_type TEXT NOT NULL,
+        title TEXT NOT NULL,
+        message TEXT NOT NULL,
+        data TEXT,
+        priority INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        scheduled_at TEXT,
+        retry_count INTEGER NOT NULL DEFAULT 0,
+        max_retries INTEGER NOT NULL DEFAULT 3,
+        last_error TEXT,
+        lease_owner TEXT,
+        lease_expires_at DOUBLE PRECISION,
+        available_at DOUBLE PRECISION,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+"""
+
+# Token buckets of the delivery channels, shared by every process using the store
+RATE_LIMIT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS notification_rate_limits (
+        channel TEXT PRIMARY KEY,
+        tokens DOUBLE PRECISION NOT NULL,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+"""
+
+# available_at is the due time of queued tasks and the lease expiry of processing ones
+QUEUE_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_notification_queue_status_updated ON notification_queue(status, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_notification_queue_status_available ON notification_queue(status, available_at)",
+    # Claim order: walked in priority order, so claiming never sorts the backlog
+    f"""CREATE INDEX IF NOT EXISTS idx_notification_queue_ready
+        ON notification_queue(priority DESC, available_at) WHERE status IN ({DELIVERABLE_SQL})"""
+]
+
+def _timestamp(value: Optional[str]) -> float:
+    """ISO scheduled_at -> epoch seconds (now if unscheduled)."""
+    return datetime.fromisoformat(value).timestamp() if value else time.time()
+
+class NotificationStore:
+    """SQLite (WAL) persistence for notification tasks.
+    
+    Every state change is committed before the queue manager acts on it, so a
+    restart can reload pending, scheduled and retrying tasks. Delivery is
+    at-least-once: a task is leased before its handler runs and only leaves the
+    deliverable set when acknowledged. If the process dies mid-delivery, the
+    lease expires and the task is delivered again.
+    
+    Several processes may share one store: claim() hands each deliverable task
+    to exactly one of them (SQLite write lock, or FOR UPDATE SKIP LOCKED row
+    locks on PostgreSQL when database_url is set). The channels' rate limits are
+    kept in the store too (take_tokens), so they hold for all processes together.
+    
+    The connection is opened lazily per process and must be used from one thread
+    at a time (the queue manager runs all store calls on a single executor thread).
+    """
+    
+    def __init__(self, db_path: str = DEFAULT_QUEUE_DB, visibility_timeout: float = VISIBILITY_TIMEOUT,
+                 database_url: Optional[str] = DEFAULT_QUEUE_URL):
+        self.db_path = db_path
+        self.database_url = database_url
+        self.postgres = bool(database_url) and is_postgres(database_url)
+        self.visibility_timeout = visibility_timeout
+        self._conn = None
+        self._pid = None
+    
+    @property
+    def conn(self):
+        # A connection inherited across fork must not be used by the child
+        if self._conn is None or self._pid != os.getpid():
+            if self.postgres:
+                conn = open_connection(self.database_url)
+            else:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(f"PRAGMA synchronous={QUEUE_SYNCHRONOUS}")
+                conn.execute("PRAGMA busy_timeout=30000")
+            with conn:
+                conn.execute(QUEUE_TABLE_SQL)
+                conn.execute(RATE_LIMIT_TABLE_SQL)
+            self._add_available_at(conn)
+            with conn:
+                for sql in QUEUE_INDEX_SQL:
+                    conn.execute(sql)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+    
+    def _add_available_at(self, conn):
+        # Queues created before available_at existed
+        try:
+            with conn:
+                conn.execute("ALTER TABLE notification_queue ADD COLUMN available_at DOUBLE PRECISION")
+                conn.execute("UPDATE notification_queue SET available_at = updated_at")
+        except sqlite3.OperationalError:
+            pass  # column already exists
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def enqueue(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert a task; returns None, or the existing task if its idempotency key was already used."""
+        with self.conn:
+            cursor = self.conn.execute("""
+                INSERT INTO notification_queue
+                (id, idempotency_key, user_id, notification_type, title, message, data, priority, status,
+                 created_at, scheduled_at, retry_count, max_retries, last_error, available_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO NOTHING
+            """, (
+                task["id"], task.get("idempotency_key"), task["user_id"], task["notification_type"],
+                task["title"], task["message"], json.dumps(task.get("data") or {}, default=str),
+                task["priority"], task["status"], task["created_at"], task.get("scheduled_at"),
+                task.get("retry_count", 0), task.get("max_retries", 3), task.get("last_error"),
+                _timestamp(task.get("scheduled_at")), time.time()
+            ))
+            if cursor.rowcount:
+                return None
+            row = self.conn.execute(
+                "SELECT * FROM notification_queue WHERE idempotency_key = ?", (task["idempotency_key"],)
+            ).fetchone()
+        return self._row_to_task(row)
+    
+    def lease(self, task_id: str, owner: str) -> bool:
+        """Take the delivery lease on a task (fails if it was acked or is leased by a live owner)."""
+        now = time.time()
+        expires_at = now + self.visibility_timeout
+        with self.conn:
+            cursor = self.conn.execute(f"""
+                UPDATE notification_queue
+                SET status = 'processing', lease_owner = ?, lease_expires_at = ?, available_at = ?, updated_at = ?
+                WHERE id = ? AND (status IN ({DELIVERABLE_SQL})
+                                  OR (status = 'processing' AND lease_expires_at <= ?))
+            """, (owner, expires_at, expires_at, now, task_id, now))
+        return cursor.rowcount == 1
+    
+    def claim(self, owner: str, limit: int) -> List[Dict[str, Any]]:
+        """Lease up to limit due tasks (highest priority first) for owner.
+        
+        Expired leases are first returned to the queue, then one UPDATE ...
+        RETURNING takes the tasks, so concurrent dispatchers never get the same
+        task: SQLite serializes it behind the write lock, and on PostgreSQL the
+        candidate rows are locked with FOR UPDATE SKIP LOCKED.
+        """
+        now = time.time()
+        expires_at = now + self.visibility_timeout
+        with self.conn:
+            self.conn.execute("""
+                UPDATE notification_queue
+                SET status = 'retry', lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE status = 'processing' AND available_at <= ?
+            """, (now, now))
+            rows = self.conn.execute(f"""
+                UPDATE notification_queue
+                SET status = 'processing', lease_owner = ?, lease_expires_at = ?, available_at = ?, updated_at = ?
+                WHERE id IN (
+                    SELECT id FROM notification_queue
+                    {'' if self.postgres else 'INDEXED BY idx_notification_queue_ready'}
+                    WHERE status IN ({DELIVERABLE_SQL}) AND available_at <= ?
+                    ORDER BY priority DESC, available_at
+                    LIMIT ?
+                    {'FOR UPDATE SKIP LOCKED' if self.postgres else ''}
+                )
+                RETURNING *
+            """, (owner, expires_at, expires_at, now, now, limit)).fetchall()
+        return [self._row_to_task(row) for row in rows]
+    
+    def extend_lease(self, task_ids: List[str], owner: str) -> List[str]:
+        """Renew owner's leases on task_ids -> the ids still leased by owner.
+        
+        A task whose lease expired and was returned to the queue (or claimed by
+        another dispatcher) is not renewed; its new owner delivers it.
+        """
+        if not task_ids:
+            return []
+        now = time.time()
+        expires_at = now + self.visibility_timeout
+        with self.conn:
+            rows = self.conn.execute(f"""
+                UPDATE notification_queue
+                SET lease_expires_at = ?, available_at = ?, updated_at = ?
+                WHERE id IN ({', '.join('?' * len(task_ids))}) AND status = 'processing' AND lease_owner = ?
+                RETURNING id
+            """, (expires_at, expires_at, now, *task_ids, owner)).fetchall()
+        return [row[0] for row in rows]
+    
+    def take_tokens(self, channel: str, tokens: float, rate: float, capacity: float, pause: float = 0.0) -> float:
+        """Reserve tokens from the channel's shared bucket -> seconds to wait before sending.
+        
+        The bucket may go into debt; each reservation waits until its share is
+        refilled, so all processes together send at most rate per second.
+        pause empties the bucket for that many seconds (after a provider 429).
+        The row is read and written under the write lock (FOR UPDATE on PostgreSQL).
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO notification_rate_limits (channel, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(channel) DO NOTHING
+            """, (channel, capacity, now))
+            row = self.conn.execute(
+                "SELECT tokens, updated_at FROM notification_rate_limits WHERE channel = ?"
+                + (" FOR UPDATE" if self.postgres else ""), (channel,)
+            ).fetchone()
+            available = min(capacity, row[0] + max(now - row[1], 0.0) * rate)
+            if pause:
+                available = min(available, 0.0) - pause * rate
+            available -= tokens
+            self.conn.execute("UPDATE notification_rate_limits SET tokens = ?, updated_at = ? WHERE channel = ?",
+                              (available, now, channel))
+        return max(-available, 0.0) / rate
+    
+    def next_available_at(self) -> Optional[float]:
+        """Earliest time a task becomes claimable (due time, or lease expiry), or None."""
+        statuses = DELIVERABLE_STATUSES + ("processing",)
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT MIN(due) FROM (" + " UNION ALL ".join(
+                    "SELECT MIN(available_at) AS due FROM notification_queue WHERE status = ?" for _ in statuses
+                ) + ") AS due_times",
+                statuses
+            ).fetchone()
+        return row[0]
+    
+    def ack(self, task_id: str):
+        """Mark a delivered task as sent."""
+        self._finish(task_id, "sent")
+    
+    def fail(self, task_id: str, retry_count: int, last_error: Optional[str]):
+        """Mark a task as permanently failed."""
+        self._finish(task_id, "failed", retry_count, last_error)
+    
+    def _finish(self, task_id: str, status: str, retry_count: Optional[int] = None, last_error: Optional[str] = None):
+        with self.conn:
+            self.conn.execute("""
+                UPDATE notification_queue
+                SET status = ?, retry_count = COALESCE(?, retry_count), last_error = COALESCE(?, last_error),
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE id = ?
+            """, (status, retry_count, last_error, time.time(), task_id))
+    
+    def reschedule(self, task_id: str, status: str, scheduled_at: Optional[str], retry_count: int,
+                   last_error: Optional[str]):
+        """Release the lease and make the task deliverable again (retry or manual requeue)."""
+        with self.conn:
+            self.conn.execute("""
+                UPDATE notification_queue
+                SET status = ?, scheduled_at = ?, retry_count = ?, last_error = ?,
+                    lease_owner = NULL, lease_expires_at = NULL, available_at = ?, updated_at = ?
+                WHERE id = ?
+            """, (status, scheduled_at, retry_count, last_error, _timestamp(scheduled_at), time.time(), task_id))
+    
+    def load_deliverable(self) -> List[Dict[str, Any]]:
+        """Tasks to reload on start: pending, retrying and processing.
+        
+        Processing tasks were leased by a process that may have died; they can be
+        leased again once lease_expires_at has passed.
+        """
+        with self.conn:
+            rows = self.conn.execute(f"""
+                SELECT * FROM notification_queue
+                WHERE status IN ({', '.join('?' * len(DELIVERABLE_STATUSES))}, 'processing')
+                ORDER BY created_at
+            """, DELIVERABLE_STATUSES).fetchall()
+        return [self._row_to_task(row) for row in rows]
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self.conn:
+            row = self.conn.execute("SELECT * FROM notification_queue WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_task(row) if row else None
+    
+    def find_by_key_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        """Tasks whose idempotency key starts with prefix (e.g. every task of one job), oldest first."""
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT * FROM notification_queue WHERE idempotency_key LIKE ? ESCAPE '\\' ORDER BY created_at",
+                (pattern,)
+            ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+    
+    def purge(self, sent_retention: float, failed_retention: float) -> int:
+        """Delete sent / failed tasks older than their retention (seconds) -> rows deleted."""
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.execute("""
+                DELETE FROM notification_queue
+                WHERE (status = 'sent' AND updated_at < ?) OR (status = 'failed' AND updated_at < ?)
+            """, (now - sent_retention, now - failed_retention))
+        return cursor.rowcount
+    
+    def counts(self) -> Dict[str, int]:
+        with self.conn:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM notification_queue GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+    
+    def _row_to_task(self, row) -> Dict[str, Any]:
+        task = dict(row)
+        task["data"] = json.loads(task["data"]) if task["data"] else {}
+        return task
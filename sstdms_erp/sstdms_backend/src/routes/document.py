@@ -4,6 +4,12 @@ from models.user import db, User
 from models.document import Project, Document, Schedule
 from models.project_permission import ProjectPermission, ProjectFolder
 from routes.user import login_required
+from utils.chunked_upload import ChunkedUploadManager, UploadError
+from utils.blob_store import BlobStore, BLOB_DIR_NAME
+from utils.storage_usage import record_usage, normalize_file_type
+from utils.pagination import PageRequest, PaginationError, keyset_query, stream_listing
+from utils.permissions import permission_resolver
+from utils.database import session_connection
 import os
 from datetime import datetime
 
@@ -12,54 +18,72 @@ document_bp = Blueprint('document', __name__)
 ALLOWED_EXTENSIONS = {'pdf', 'dwg', 'dxf', 'png', 'jpg', 'jpeg', 'tiff', 'xlsx', 'xls', 'csv', 'doc', 'docx'}
 UPLOAD_FOLDER = 'uploads'
 
+# 목록 API 정렬 필드 (sort 파라미터 -> 컬럼)
+PROJECT_SORT_FIELDS = {'created_at': Project.created_at, 'name': Project.name, 'id': Project.id}
+DOCUMENT_SORT_FIELDS = {
+    'created_at': Document.created_at, 'title': Document.title,
+    'file_size': db.func.coalesce(Document.file_size, 0), 'id': Document.id
+}
+
+# 대용량 파일 분할 업로드 세션 (uploads/.chunked)
+upload_manager = ChunkedUploadManager(os.path.join(UPLOAD_FOLDER, '.chunked'))
+
+# 문서 파일 저장소 (SHA-256 내용 주소, 같은 파일은 한 번만 저장)
+blob_store = BlobStore(os.path.join(UPLOAD_FOLDER, BLOB_DIR_NAME))
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def has_project_permission(user_id, project_id, permission_type='read'):
-    """프로젝트 권한 확인"""
-    user = User.query.get(user_id)
-    if user.role == 'admin':
-        return True
-    
-    permission = ProjectPermission.query.filter_by(
-        user_id=user_id,
-        project_id=project_id
-    ).first()
-    
-    if not permission:
-        return False
-    
-    if permission_type == 'read':
-        return permission.permission_type in ['read', 'write', 'delete', 'admin']
-    elif permission_type == 'write':
-        return permission.permission_type in ['write', 'delete', 'admin']
-    elif permission_type == 'delete':
-        return permission.permission_type in ['delete', 'admin']
-    elif permission_type == 'admin':
-        return permission.permission_type == 'admin'
-    
-    return False
+    """프로젝트 권한 확인 (요청/프로세스 단위로 캐시된 권한 맵 사용)"""
+    return permission_resolver.has_project_permission(
+        session_connection(db.session), user_id, project_id, permission_type
+    )
 
 @document_bp.route('/projects', methods=['GET'])
 @login_required
 def get_projects():
-    """프로젝트 목록 조회"""
+    """프로젝트 목록 조회
+    
+    필터: status, date_from/date_to (생성일)
+    정렬: sort=created_at|name|id, order=asc|desc
+    limit/cursor 를 주면 페이지 단위로 조회하고 next_cursor 를 함께 반환합니다.
+    """
     try:
         user_id = session['user_id']
         user = User.query.get(user_id)
+        page = PageRequest(request.args, PROJECT_SORT_FIELDS, 'created_at')
         
-        if user.role == 'admin':
-            projects = Project.query.all()
-        else:
+        query = Project.query
+        if user.role != 'admin':
             # 사용자에게 권한이 있는 프로젝트만 조회
-            project_permissions = ProjectPermission.query.filter_by(user_id=user_id).all()
-            project_ids = [p.project_id for p in project_permissions]
-            projects = Project.query.filter(Project.id.in_(project_ids)).all()
-        
-        return jsonify({
-            'projects': [project.to_dict() for project in projects]
-        }), 200
+            permitted = db.session.query(ProjectPermission.project_id).filter_by(user_id=user_id)
+            query = query.filter(Project.id.in_(permitted))
+        
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Project.status == status)
+        if page.date_from:
+            query = query.filter(Project.created_at >= page.date_from)
+        if page.date_until:
+            query = query.filter(Project.created_at < page.date_until)
+        
+        sort_column = PROJECT_SORT_FIELDS[page.sort]
+        
+        def fetch_batch(cursor, size):
+            rows = query.add_columns(sort_column)
+            return keyset_query(rows, page, sort_column, Project.id, cursor).limit(size).all()
+        
+        return stream_listing(
+            page, fetch_batch,
+            lambda row: (row[1], row[0].id),
+            lambda row: row[0].to_dict(),
+            key='projects',
+            on_close=db.session.remove
+        )
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'프로젝트 목록 조회 중 오류가 발생했습니다: {str(e)}'}), 500
 
@@ -104,6 +128,7 @@ def create_project():
         )
         db.session.add(permission)
         
+        permission_resolver.invalidate(user_id, session_connection(db.session))
         db.session.commit()
         
         return jsonify({
@@ -183,26 +208,55 @@ def create_folder(project_id):
 @document_bp.route('/projects/<project_id>/documents', methods=['GET'])
 @login_required
 def get_documents(project_id):
-    """프로젝트 문서 목록 조회"""
+    """프로젝트 문서 목록 조회
+    
+    필터: folder_id, type, status (기본 active), date_from/date_to (등록일)
+    정렬: sort=created_at|title|file_size|id, order=asc|desc
+    limit/cursor 를 주면 페이지 단위로 조회하고 next_cursor 를 함께 반환합니다.
+    """
     try:
         user_id = session['user_id']
         
         if not has_project_permission(user_id, project_id, 'read'):
             return jsonify({'error': '프로젝트에 대한 접근 권한이 없습니다.'}), 403
         
-        folder_id = request.args.get('folder_id', type=int)
+        page = PageRequest(request.args, DOCUMENT_SORT_FIELDS, 'created_at')
         
-        query = Document.query.filter_by(project_id=project_id, status='active')
+        query = Document.query.filter_by(
+            project_id=project_id,
+            status=request.args.get('status', 'active')
+        )
         
+        folder_id = request.args.get('folder_id', type=int)
         if folder_id:
             query = query.filter_by(folder_id=folder_id)
         
-        documents = query.all()
+        file_type = request.args.get('type')
+        if file_type:
+            query = query.filter(Document.file_type == normalize_file_type(file_type))
         
-        return jsonify({
-            'documents': [doc.to_dict() for doc in documents]
-        }), 200
+        if page.date_from:
+            query = query.filter(Document.created_at >= page.date_from)
+        if page.date_until:
+            query = query.filter(Document.created_at < page.date_until)
+        
+        sort_column = DOCUMENT_SORT_FIELDS[page.sort]
         
+        def fetch_batch(cursor, size):
+            # 정렬 값을 함께 조회해 다음 커서로 사용
+            rows = query.add_columns(sort_column)
+            return keyset_query(rows, page, sort_column, Document.id, cursor).limit(size).all()
+        
+        return stream_listing(
+            page, fetch_batch,
+            lambda row: (row[1], row[0].id),
+            lambda row: row[0].to_dict(),
+            key='documents',
+            on_close=db.session.remove
+        )
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'문서 목록 조회 중 오류가 발생했습니다: {str(e)}'}), 500
 
@@ -226,40 +280,170 @@ def upload_document(project_id):
         if not allowed_file(file.filename):
             return jsonify({'error': '허용되지 않는 파일 형식입니다.'}), 400
         
-        # 파일 저장
+        # 파일 저장 (해시하면서 기록, 이미 있는 내용이면 기존 blob 재사용)
         filename = secure_filename(file.filename)
-        upload_dir = os.path.join(UPLOAD_FOLDER, project_id)
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
+        blob_path, sha256, _, _ = blob_store.put_stream(file.stream)
         
         # 문서 정보 저장
-        document = Document(
-            title=request.form.get('title', filename),
-            description=request.form.get('description', ''),
-            file_path=file_path,
-            file_name=filename,
-            file_size=os.path.getsize(file_path),
-            file_type=filename.rsplit('.', 1)[1].lower(),
-            project_id=project_id,
-            folder_id=request.form.get('folder_id', type=int),
-            version=request.form.get('version', '1.0'),
-            created_by=user_id
+        document = create_document_record(project_id, user_id, filename, blob_path, sha256, {
+            'title': request.form.get('title', filename),
+            'description': request.form.get('description', ''),
+            'folder_id': request.form.get('folder_id', type=int),
+            'version': request.form.get('version', '1.0')
+        })
+        db.session.commit()
+        
+        return jsonify({
+            'message': '문서가 성공적으로 업로드되었습니다.',
+            'document': document.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'문서 업로드 중 오류가 발생했습니다: {str(e)}'}), 500
+
+def create_document_record(project_id, user_id, filename, blob_path, sha256, fields):
+    """저장된 blob 의 문서 정보 추가 (blob 참조도 같은 트랜잭션, 커밋은 호출자가 수행)"""
+    file_size = os.path.getsize(blob_path)
+    conn = session_connection(db.session)
+    blob_store.acquire(conn, blob_path, sha256, file_size)
+    record_usage(conn, project_id, filename, file_size)
+    document = Document(
+        title=fields.get('title') or filename,
+        description=fields.get('description', ''),
+        file_path=str(blob_path),
+        file_name=filename,
+        file_size=file_size,
+        file_type=filename.rsplit('.', 1)[1].lower(),
+        project_id=project_id,
+        folder_id=fields.get('folder_id'),
+        version=fields.get('version') or '1.0',
+        created_by=user_id
+    )
+    db.session.add(document)
+    return document
+
+def upload_error_response(error):
+    """분할 업로드 오류 응답"""
+    body = error.to_dict()
+    body['error'] = f'분할 업로드 오류: {error.message}'
+    return jsonify(body), error.status_code
+
+def get_upload_session(project_id, upload_id, user_id):
+    """현재 사용자/프로젝트의 분할 업로드 세션 조회"""
+    status = upload_manager.get_status(upload_id, user_id)
+    if status['metadata'].get('project_id') != project_id:
+        raise UploadError('Upload session not found', 404)
+    return status
+
+@document_bp.route('/projects/<project_id>/documents/uploads', methods=['POST'])
+@login_required
+def init_document_upload(project_id):
+    """대용량 문서 분할 업로드 시작 (init → 청크 PUT → complete)"""
+    try:
+        user_id = session['user_id']
+        
+        if not has_project_permission(user_id, project_id, 'write'):
+            return jsonify({'error': '문서 업로드 권한이 없습니다.'}), 403
+        
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename', ''))
+        if not filename:
+            return jsonify({'error': '파일이 선택되지 않았습니다.'}), 400
+        
+        if not allowed_file(filename):
+            return jsonify({'error': '허용되지 않는 파일 형식입니다.'}), 400
+        
+        status = upload_manager.init_upload(
+            filename, data.get('size'), user_id,
+            chunk_size=data.get('chunk_size'),
+            metadata={
+                'project_id': project_id,
+                'title': data.get('title', filename),
+                'description': data.get('description', ''),
+                'folder_id': data.get('folder_id'),
+                'version': data.get('version', '1.0')
+            }
+        )
+        return jsonify(status), 201
+        
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({'error': f'문서 업로드 중 오류가 발생했습니다: {str(e)}'}), 500
+
+@document_bp.route('/projects/<project_id>/documents/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_document_upload(project_id, upload_id):
+    """분할 업로드 상태 조회 (재개 시 누락 청크 확인)"""
+    try:
+        return jsonify(get_upload_session(project_id, upload_id, session['user_id'])), 200
+    except UploadError as e:
+        return upload_error_response(e)
+
+@document_bp.route('/projects/<project_id>/documents/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def put_document_chunk(project_id, upload_id, index):
+    """청크 업로드 (요청 본문 그대로, 병렬 전송/재전송 가능)"""
+    try:
+        user_id = session['user_id']
+        get_upload_session(project_id, upload_id, user_id)
+        result = upload_manager.write_chunk(
+            upload_id, index, request.stream, user_id,
+            expected_sha256=request.headers.get('X-Chunk-SHA256')
         )
+        return jsonify(result), 200
+    except UploadError as e:
+        return upload_error_response(e)
+
+@document_bp.route('/projects/<project_id>/documents/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_document_upload(project_id, upload_id):
+    """분할 업로드 완료 - 파일을 합쳐 문서로 등록"""
+    try:
+        user_id = session['user_id']
         
-        db.session.add(document)
+        if not has_project_permission(user_id, project_id, 'write'):
+            return jsonify({'error': '문서 업로드 권한이 없습니다.'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        status = get_upload_session(project_id, upload_id, user_id)
+        filename = status['filename']
+        staged_path = blob_store.staging_path(filename)
+        
+        upload = upload_manager.complete_upload(
+            upload_id, staged_path, user_id, expected_sha256=data.get('sha256')
+        )
+        blob_path, _ = blob_store.commit_staged(staged_path, upload['sha256'])
+        document = create_document_record(
+            project_id, user_id, filename, blob_path, upload['sha256'], status['metadata']
+        )
         db.session.commit()
         
         return jsonify({
             'message': '문서가 성공적으로 업로드되었습니다.',
-            'document': document.to_dict()
+            'document': document.to_dict(),
+            'sha256': upload['sha256']
         }), 201
         
+    except UploadError as e:
+        return upload_error_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'문서 업로드 중 오류가 발생했습니다: {str(e)}'}), 500
 
+@document_bp.route('/projects/<project_id>/documents/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_document_upload(project_id, upload_id):
+    """분할 업로드 취소"""
+    try:
+        user_id = session['user_id']
+        get_upload_session(project_id, upload_id, user_id)
+        upload_manager.abort_upload(upload_id, user_id)
+        return jsonify({'message': '업로드가 취소되었습니다.'}), 200
+    except UploadError as e:
+        return upload_error_response(e)
+
 @document_bp.route('/documents/<int:document_id>/download', methods=['GET'])
 @login_required
 def download_document(document_id):
@@ -283,6 +467,30 @@ def download_document(document_id):
     except Exception as e:
         return jsonify({'error': f'문서 다운로드 중 오류가 발생했습니다: {str(e)}'}), 500
 
+@document_bp.route('/documents/<int:document_id>', methods=['DELETE'])
+@login_required
+def delete_document(document_id):
+    """문서 삭제 (상태 변경 후 파일 blob 참조 해제)"""
+    try:
+        user_id = session['user_id']
+        document = Document.query.get_or_404(document_id)
+        
+        if not has_project_permission(user_id, document.project_id, 'delete'):
+            return jsonify({'error': '문서 삭제 권한이 없습니다.'}), 403
+        
+        if document.status != 'deleted':
+            document.status = 'deleted'
+            conn = session_connection(db.session)
+            blob_store.release(conn, document.file_path)
+            record_usage(conn, document.project_id, document.file_type, -(document.file_size or 0), -1)
+            db.session.commit()
+        
+        return jsonify({'message': '문서가 삭제되었습니다.'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'문서 삭제 중 오류가 발생했습니다: {str(e)}'}), 500
+
 @document_bp.route('/projects/<project_id>/schedules', methods=['GET'])
 @login_required
 def get_schedules(project_id):
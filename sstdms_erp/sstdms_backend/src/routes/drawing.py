@@ -1,10 +1,17 @@
-from flask import Blueprint, request, jsonify, session, send_file
+from flask import Blueprint, request, jsonify, session, send_file, Response
 from werkzeug.utils import secure_filename
 from models.user import db, User
+from models.drawing import DrawingListEntry, DrawingListVersion
 from routes.user import login_required
+from utils.pagination import PageRequest, PaginationError, keyset_query, stream_listing
 from excel_processor import ExcelProcessor, process_uploaded_excel
 import os
 import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
 from datetime import datetime
 
 drawing_bp = Blueprint('drawing', __name__)
@@ -13,31 +20,175 @@ drawing_bp = Blueprint('drawing', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
+# 엑셀 내보내기 설정
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_FORMAT_VERSION = 'drawing-list-export-v1'  # 내보내기 레이아웃 변경 시 올려서 캐시 무효화
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # 이 크기를 넘으면 버퍼가 임시 파일로 전환됨
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('DRAWING_EXPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# 간트/진행 요약 응답 캐시 상한 (직렬화된 JSON 바이트 기준)
+PAYLOAD_CACHE_MAX_BYTES = int(os.getenv('DRAWING_PAYLOAD_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# 도면 목록 정렬 필드 (sort 파라미터 -> 컬럼, keyset 비교를 위해 NULL 은 기본값으로)
+DRAWING_SORT_FIELDS = {
+    'id': DrawingListEntry.id,
+    'no': DrawingListEntry.no,
+    'start_date': db.func.coalesce(DrawingListEntry.start_date, ''),
+    'progress': db.func.coalesce(DrawingListEntry.progress, 0),
+    'status': db.func.coalesce(DrawingListEntry.status, '')
+}
+
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class LRUBytesCache:
+    """총 바이트 상한이 있는 LRU 캐시 (엑셀 내보내기, 간트 응답 공용)"""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4  # 큰 파일 하나가 캐시를 모두 밀어내지 않도록
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+    
+    def put(self, key, data):
+        if len(data) > self.max_entry_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return True
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+export_cache = LRUBytesCache(EXPORT_CACHE_MAX_BYTES)
+payload_cache = LRUBytesCache(PAYLOAD_CACHE_MAX_BYTES)
+
+def drawing_list_export_key(project_id, project_info):
+    """내보내기 캐시 키 / ETag (형식 버전, 도면 리스트 버전, 프로젝트 정보, 날짜)
+    
+    도면 행은 읽지 않으므로 업로드/리비전으로 버전이 바뀌기 전까지는 O(1) 입니다.
+    """
+    version = DrawingListVersion.current(project_id)
+    header = [EXPORT_FORMAT_VERSION, project_id, version, project_info, datetime.now().strftime('%Y-%m-%d')]
+    return hashlib.sha256(json.dumps(header, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def cached_project_payload(project_id, kind, params, build):
+    """도면 리스트 버전 기준으로 캐시된 JSON 응답 (ETag/If-None-Match 지원)
+    
+    캐시 키와 ETag 는 (프로젝트, 도면 리스트 버전, 응답 종류, 요청 파라미터) 로 정해지므로
+    업로드/리비전으로 버전이 바뀌기 전까지는 다시 계산하지 않습니다.
+    build() 는 응답 dict 를 반환하고, 데이터가 없으면 None 을 반환합니다.
+    """
+    version = DrawingListVersion.current(project_id)
+    key_source = json.dumps([project_id, version, kind, params], sort_keys=True, ensure_ascii=False)
+    etag = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:32]
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        data = payload_cache.get(etag)
+        if data is None:
+            payload = build()
+            if payload is None:
+                return jsonify({'error': '도면 데이터가 없습니다.'}), 404
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            payload_cache.put(etag, data)
+        response = Response(data, mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def send_workbook(write_workbook, cache_key, download_name):
+    """엑셀 파일을 메모리(또는 spool 임시 파일) 버퍼에 만들어 청크 단위로 전송
+    
+    같은 cache_key 로 이미 만든 파일은 다시 생성하지 않고 캐시에서 보냅니다.
+    """
+    if request.if_none_match.contains(cache_key):
+        response = Response(status=304)
+        response.set_etag(cache_key)
+        return response
+    
+    data = export_cache.get(cache_key)
+    if data is not None:
+        buffer = BytesIO(data)
+    else:
+        buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        write_workbook(buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+        if size <= export_cache.max_entry_bytes:
+            export_cache.put(cache_key, buffer.read())
+            buffer.seek(0)
+    
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=XLSX_MIMETYPE,
+        etag=cache_key,
+        conditional=True
+    )
+
 @drawing_bp.route('/drawings/<project_id>', methods=['GET'])
 @login_required
 def get_drawings(project_id):
-    """프로젝트 도면 목록 조회"""
+    """프로젝트 도면 목록 조회
+    
+    필터: type, status, date_from/date_to (시작일)
+    정렬: sort=id(업로드 순서)|no|start_date|progress|status, order=asc|desc
+    limit/cursor 를 주면 페이지 단위로 조회하고 next_cursor 를 함께 반환합니다.
+    """
     try:
-        # 데이터베이스에서 도면 목록 조회 (임시로 파일에서 읽기)
-        drawings_file = os.path.join(UPLOAD_FOLDER, f'{project_id}_drawings.json')
-        
-        if os.path.exists(drawings_file):
-            with open(drawings_file, 'r', encoding='utf-8') as f:
-                drawings = json.load(f)
-        else:
-            drawings = []
-        
-        return jsonify({
-            'drawings': drawings,
-            'total': len(drawings)
-        }), 200
+        page = PageRequest(request.args, DRAWING_SORT_FIELDS, 'id', default_order='asc')
+        
+        query = DrawingListEntry.query.filter_by(project_id=project_id)
+        if request.args.get('type'):
+            query = query.filter(DrawingListEntry.type == request.args['type'])
+        if request.args.get('status'):
+            query = query.filter(DrawingListEntry.status == request.args['status'])
+        # start_date 는 'YYYY-MM-DD' 문자열로 저장됨
+        if page.date_from:
+            query = query.filter(DrawingListEntry.start_date >= page.date_from.strftime('%Y-%m-%d'))
+        if page.date_until:
+            query = query.filter(DrawingListEntry.start_date < page.date_until.strftime('%Y-%m-%d'))
+        
+        sort_column = DRAWING_SORT_FIELDS[page.sort]
+        
+        def fetch_batch(cursor, size):
+            rows = query.add_columns(sort_column)
+            return keyset_query(rows, page, sort_column, DrawingListEntry.id, cursor).limit(size).all()
+        
+        return stream_listing(
+            page, fetch_batch,
+            lambda row: (row[1], row[0].id),
+            lambda row: row[0].to_dict(),
+            key='drawings',
+            count_key='total',
+            on_close=db.session.remove
+        )
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'도면 목록 조회 실패: {str(e)}'}), 500
 
@@ -62,12 +213,26 @@ def upload_drawing_list(project_id):
             
             # 엑셀 파일 처리
             processor = ExcelProcessor()
+            
+            # 스트리밍 모드: 청크 단위로 읽어 바로 데이터베이스에 저장
+            if request.args.get('stream', request.form.get('stream', 'false')).lower() == 'true':
+                total = DrawingListEntry.replace_project_drawings_chunked(
+                    project_id, processor.iter_drawing_list_chunks(file_path)
+                )
+                db.session.commit()
+                
+                return jsonify({
+                    'message': f'{total}개의 도면이 성공적으로 업로드되었습니다.',
+                    'total': total,
+                    'filename': filename
+                }), 200
+            
             drawings = processor.read_drawing_list(file_path)
             
-            # JSON 파일로 저장
-            drawings_file = os.path.join(UPLOAD_FOLDER, f'{project_id}_drawings.json')
-            with open(drawings_file, 'w', encoding='utf-8') as f:
-                json.dump(drawings, f, ensure_ascii=False, indent=2, default=str)
+            # 데이터베이스에 저장 (기존 도면 리스트 교체)
+            DrawingListEntry.replace_project_drawings(project_id, drawings)
+            db.session.commit()
+            drawings = [entry.to_dict() for entry in DrawingListEntry.list_for_project(project_id)]
             
             return jsonify({
                 'message': f'{len(drawings)}개의 도면이 성공적으로 업로드되었습니다.',
@@ -78,6 +243,7 @@ def upload_drawing_list(project_id):
             return jsonify({'error': '지원하지 않는 파일 형식입니다. (.xlsx, .xls 파일만 가능)'}), 400
             
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'파일 업로드 실패: {str(e)}'}), 500
 
 @drawing_bp.route('/drawings/<project_id>/export', methods=['GET'])
@@ -85,15 +251,6 @@ def upload_drawing_list(project_id):
 def export_drawing_list(project_id):
     """도면 리스트 엑셀 내보내기"""
     try:
-        # 도면 데이터 조회
-        drawings_file = os.path.join(UPLOAD_FOLDER, f'{project_id}_drawings.json')
-        
-        if not os.path.exists(drawings_file):
-            return jsonify({'error': '도면 데이터가 없습니다.'}), 404
-        
-        with open(drawings_file, 'r', encoding='utf-8') as f:
-            drawings = json.load(f)
-        
         # 프로젝트 정보 (임시)
         project_info = {
             'id': project_id,
@@ -102,19 +259,22 @@ def export_drawing_list(project_id):
             'ship_type': 'Container Ship'
         }
         
-        # 엑셀 파일 생성
+        # 도면 리스트 버전 기준 캐시 키 (프로젝트 인덱스로 행 존재 여부만 확인)
+        cache_key = drawing_list_export_key(project_id, project_info)
+        if not db.session.query(DrawingListEntry.id).filter_by(project_id=project_id).first():
+            return jsonify({'error': '도면 데이터가 없습니다.'}), 404
+        
+        # 엑셀 파일 생성 후 전송 (변경 없는 도면 리스트는 캐시에서 전송)
         processor = ExcelProcessor()
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_filename = f'{project_id}_drawing_list_{timestamp}.xlsx'
-        output_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        
-        processor.export_drawing_list(drawings, project_info, output_path)
         
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return send_workbook(
+            lambda output: processor.export_drawing_list_streaming(
+                DrawingListEntry.iter_for_project(project_id), project_info, output
+            ),
+            cache_key,
+            output_filename
         )
         
     except Exception as e:
@@ -127,15 +287,12 @@ def download_template(project_id):
     try:
         processor = ExcelProcessor()
         template_filename = f'{project_id}_drawing_template.xlsx'
-        template_path = os.path.join(UPLOAD_FOLDER, template_filename)
+        cache_key = hashlib.sha256(f'{EXPORT_FORMAT_VERSION}:template:{project_id}'.encode('utf-8')).hexdigest()
         
-        processor.create_drawing_list_template(project_id, template_path)
-        
-        return send_file(
-            template_path,
-            as_attachment=True,
-            download_name=template_filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return send_workbook(
+            lambda output: processor.create_drawing_list_template(project_id, output),
+            cache_key,
+            template_filename
         )
         
     except Exception as e:
@@ -146,28 +303,55 @@ def download_template(project_id):
 def get_gantt_data(project_id):
     """간트차트 데이터 조회"""
     try:
-        # 도면 데이터 조회
-        drawings_file = os.path.join(UPLOAD_FOLDER, f'{project_id}_drawings.json')
+        project_start_date = request.args.get('start_date', datetime.now().strftime('%Y-%m-%d'))
         
-        if not os.path.exists(drawings_file):
-            return jsonify({'error': '도면 데이터가 없습니다.'}), 404
+        def build():
+            # 도면 데이터 조회
+            drawings = [entry.to_dict() for entry in DrawingListEntry.list_for_project(project_id)]
+            if not drawings:
+                return None
+            
+            # 간트차트 데이터 생성
+            processor = ExcelProcessor()
+            gantt_chart = processor.create_gantt_chart(drawings, project_start_date)
+            
+            return {
+                'gantt_data': gantt_chart['gantt_data'],
+                'aggregates': gantt_chart['aggregates'],
+                'project_id': project_id,
+                'start_date': project_start_date
+            }
         
-        with open(drawings_file, 'r', encoding='utf-8') as f:
-            drawings = json.load(f)
+        return cached_project_payload(project_id, 'gantt', {'start_date': project_start_date}, build)
         
-        # 간트차트 데이터 생성
-        processor = ExcelProcessor()
+    except Exception as e:
+        return jsonify({'error': f'간트차트 데이터 생성 실패: {str(e)}'}), 500
+
+@drawing_bp.route('/drawings/<project_id>/summary', methods=['GET'])
+@login_required
+def get_progress_summary(project_id):
+    """도면 진행 요약 조회 (분류/타입별 집계, 대시보드용)"""
+    try:
         project_start_date = request.args.get('start_date', datetime.now().strftime('%Y-%m-%d'))
-        gantt_data = processor.create_gantt_data(drawings, project_start_date)
         
-        return jsonify({
-            'gantt_data': gantt_data,
-            'project_id': project_id,
-            'start_date': project_start_date
-        }), 200
+        def build():
+            drawings = [entry.to_dict() for entry in DrawingListEntry.list_for_project(project_id)]
+            if not drawings:
+                return None
+            
+            processor = ExcelProcessor()
+            gantt_chart = processor.create_gantt_chart(drawings, project_start_date)
+            
+            return {
+                'aggregates': gantt_chart['aggregates'],
+                'project_id': project_id,
+                'start_date': project_start_date
+            }
+        
+        return cached_project_payload(project_id, 'summary', {'start_date': project_start_date}, build)
         
     except Exception as e:
-        return jsonify({'error': f'간트차트 데이터 생성 실패: {str(e)}'}), 500
+        return jsonify({'error': f'진행 요약 조회 실패: {str(e)}'}), 500
 
 @drawing_bp.route('/drawings/<project_id>/<drawing_id>/revision', methods=['POST'])
 @login_required
@@ -182,40 +366,28 @@ def update_drawing_revision(project_id, drawing_id):
         if not new_revision:
             return jsonify({'error': '리비전 정보가 필요합니다.'}), 400
         
-        # 도면 데이터 조회
-        drawings_file = os.path.join(UPLOAD_FOLDER, f'{project_id}_drawings.json')
-        
-        if not os.path.exists(drawings_file):
-            return jsonify({'error': '도면 데이터가 없습니다.'}), 404
+        # 해당 도면 조회 (프로젝트 + 도면 번호 인덱스)
+        drawing = DrawingListEntry.get_by_no(project_id, drawing_id)
         
-        with open(drawings_file, 'r', encoding='utf-8') as f:
-            drawings = json.load(f)
-        
-        # 해당 도면 찾기 및 업데이트
-        drawing_found = False
-        for drawing in drawings:
-            if str(drawing.get('no')) == str(drawing_id):
-                drawing['revision'] = new_revision
-                drawing['status'] = status
-                drawing['remarks'] = remarks
-                drawing['issued_date'] = datetime.now().strftime('%Y-%m-%d')
-                drawing['approved_by'] = session.get('username', '')
-                drawing_found = True
-                break
-        
-        if not drawing_found:
+        if not drawing:
             return jsonify({'error': '도면을 찾을 수 없습니다.'}), 404
         
-        # 업데이트된 데이터 저장
-        with open(drawings_file, 'w', encoding='utf-8') as f:
-            json.dump(drawings, f, ensure_ascii=False, indent=2, default=str)
+        # 해당 행만 업데이트
+        drawing.revision = new_revision
+        drawing.status = status
+        drawing.remarks = remarks
+        drawing.issued_date = datetime.now().strftime('%Y-%m-%d')
+        drawing.approved_by = session.get('username', '')
+        DrawingListVersion.bump(project_id)
+        db.session.commit()
         
         return jsonify({
             'message': '도면 리비전이 성공적으로 업데이트되었습니다.',
-            'drawing': next(d for d in drawings if str(d.get('no')) == str(drawing_id))
+            'drawing': drawing.to_dict()
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'리비전 업데이트 실패: {str(e)}'}), 500
 
 @drawing_bp.route('/drawings/<project_id>/<drawing_id>/distribute', methods=['POST'])
@@ -1,31 +1,75 @@
 from flask import Blueprint, request, jsonify, session
 import sqlite3
+import pandas as pd
 from datetime import datetime
 import json
+from excel_processor import compute_gantt, frame_records
+from utils.pagination import PageRequest, PaginationError, keyset_sql, date_range_sql, stream_listing
+from utils.database import get_connection, SORT_KEY_SEPARATOR_SQL
 
 drawing_bp = Blueprint('drawing', __name__)
 
+# Sort parameter -> SQL expression; 'category' keeps the original category, dwg_no order
+DRAWING_SORT_FIELDS = {
+    'category': f"d.category || {SORT_KEY_SEPARATOR_SQL} || d.dwg_no",
+    'dwg_no': 'd.dwg_no',
+    'start_date': "COALESCE(CAST(d.start_date AS TEXT), '')",
+    'progress': 'COALESCE(d.progress, 0)',
+    'status': "COALESCE(d.status, '')",
+    'id': 'd.id'
+}
+
 def get_db_connection():
-    conn = sqlite3.connect('database/app.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection()
 
 @drawing_bp.route('/api/drawings/<project_id>', methods=['GET'])
 def get_project_drawings(project_id):
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
+    try:
+        page = PageRequest(request.args, DRAWING_SORT_FIELDS, 'category', default_order='asc')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filters = ['d.project_id = ?']
+    params = [project_id]
+    for field in ('category', 'type', 'status'):
+        if request.args.get(field):
+            filters.append(f'd.{field} = ?')
+            params.append(request.args[field])
+    
+    date_filters, date_params = date_range_sql(page, 'd.start_date')
+    filters += date_filters
+    params += date_params
+    
+    sort_expr = DRAWING_SORT_FIELDS[page.sort]
     conn = get_db_connection()
-    drawings = conn.execute('''
-        SELECT d.*, u.full_name as assigned_name
+    
+    def fetch_batch(cursor, size):
+        keyset, keyset_params, order_by = keyset_sql(page, sort_expr, 'd.id', cursor)
+        where = ' AND '.join(filters + ([keyset] if keyset else []))
+        return conn.execute(f'''
+            SELECT d.*, u.full_name as assigned_name, {sort_expr} AS sort_key
         FROM drawings d
         LEFT JOIN users u ON d.assigned_to = u.id
-        WHERE d.project_id = ?
-        ORDER BY d.category, d.dwg_no
-    ''', (project_id,)).fetchall()
-    conn.close()
-    
-    return jsonify([dict(drawing) for drawing in drawings])
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + keyset_params + [size]).fetchall()
+    
+    def serialize(row):
+        drawing = dict(row)
+        del drawing['sort_key']
+        return drawing
+    
+    return stream_listing(
+        page, fetch_batch,
+        lambda row: (row['sort_key'], row['id']),
+        serialize,
+        key='drawings' if page.paginated else None,
+        on_close=conn.close
+    )
 
 @drawing_bp.route('/api/drawings', methods=['POST'])
 def create_drawing():
@@ -142,19 +186,29 @@ def get_gantt_data(project_id):
     ''', (project_id,)).fetchall()
     conn.close()
     
-    gantt_data = []
-    for drawing in drawings:
-        gantt_data.append({
-            'id': drawing['id'],
-            'name': f"{drawing['dwg_no']} - {drawing['name']}",
-            'start': drawing['start_date'],
-            'end': drawing['end_date'],
-            'progress': drawing['progress'],
-            'category': drawing['category'],
-            'type': drawing['type'],
-            'status': drawing['status'],
-            'assigned_to': drawing['assigned_name'] or 'Unassigned'
-        })
-    
-    return jsonify(gantt_data)
+    columns = ['id', 'dwg_no', 'name', 'start_date', 'end_date', 'progress',
+               'category', 'type', 'status', 'assigned_name']
+    df = pd.DataFrame([tuple(drawing[column] for column in columns) for drawing in drawings], columns=columns)
+    
+    # 종료일은 저장된 end_date 사용 (없으면 시작일 + 1개월)
+    result, aggregates = compute_gantt(
+        df,
+        request.args.get('start_date'),
+        duration_column=None,
+        finish_column='end_date',
+        group_columns=('category', 'type')
+    )
+    
+    result['name'] = result['dwg_no'].astype(str) + ' - ' + result['name'].astype(str)
+    result['assigned_to'] = result['assigned_name'].fillna('Unassigned')
+    gantt_data = frame_records(
+        result,
+        ['id', 'name', 'start', 'finish', 'progress', 'category', 'type', 'status', 'assigned_to'],
+        ['id', 'name', 'start', 'end', 'progress', 'category', 'type', 'status', 'assigned_to']
+    )
+    
+    return jsonify({
+        'gantt_data': gantt_data,
+        'aggregates': aggregates
+    })
 
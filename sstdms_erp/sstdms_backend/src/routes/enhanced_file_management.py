@@ -1,18 +1,38 @@
 from flask import Blueprint, request, jsonify, session, send_file, abort
-import sqlite3
 import os
 import json
 from datetime import datetime
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from werkzeug.utils import secure_filename
 from utils.file_manager import EnhancedFileManager
+from utils.chunked_upload import ChunkedUploadManager, UploadError
+from utils.blob_store import BlobStore, BLOB_DIR_NAME, collect_unreferenced_blobs
+from utils.storage_usage import record_usage, normalize_file_type
+from utils.database import get_connection
+from utils.audit_log import access_log_filters, access_log_summary
+from utils.pagination import (
+    PageRequest, PaginationError, keyset_sql, date_range_sql, stream_listing
+)
 
 enhanced_file_bp = Blueprint('enhanced_file', __name__)
 file_manager = EnhancedFileManager()
+upload_manager = ChunkedUploadManager(file_manager.base_path / '.uploads')
+blob_store = BlobStore(file_manager.base_path / BLOB_DIR_NAME)
+
+# Sort parameter -> SQL expression for file listings (nullable columns coalesced for keyset paging)
+FILE_SORT_FIELDS = {
+    'created_at': 'pf.created_at',
+    'file_name': 'pf.original_name',
+    'file_size': 'COALESCE(pf.file_size, 0)',
+    'id': 'pf.id'
+}
+
+ACCESS_LOG_SORT_FIELDS = {
+    'accessed_at': 'l.accessed_at'
+}
 
 def get_db_connection():
-    conn = sqlite3.connect('database/app.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection()
 
 @enhanced_file_bp.route('/api/projects/<project_id>/folders/init', methods=['POST'])
 def initialize_project_folders(project_id):
@@ -34,9 +54,10 @@ def initialize_project_folders(project_id):
         # Create folder records in database
         for folder_info in created_folders:
             conn.execute('''
-                INSERT OR IGNORE INTO project_folders_enhanced 
+                INSERT INTO project_folders_enhanced 
                 (project_id, folder_name, folder_type, folder_path, created_by, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT DO NOTHING
             ''', (
                 project_id,
                 folder_info['name'],
@@ -112,106 +133,289 @@ def upload_file(project_id):
     try:
         # Secure filename
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{timestamp}_{filename}"
+        unique_filename, file_path = _new_project_file_path(filename)
         
-        # Create file path
-        project_path = file_manager.base_path / project_id / folder['folder_path']
-        project_path.mkdir(parents=True, exist_ok=True)
-        file_path = project_path / unique_filename
+        # Store file (hash, encryption and backup in one pass over the upload)
+        result = _register_project_file(
+            conn, project_id, folder_id, file.stream, file_path, filename, unique_filename,
+            access_level, encrypt_file, apply_watermark
+        )
+        conn.close()
         
-        # Save file
-        file.save(str(file_path))
+        return jsonify({'message': 'File uploaded successfully', **result}), 201
         
-        # Get file metadata
-        metadata = file_manager.get_file_metadata(file_path)
+    except Exception as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
+def _new_project_file_path(filename):
+    """Timestamped file name and blob staging path for a new project file"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_filename = f"{timestamp}_{filename}"
+    return unique_filename, blob_store.staging_path(filename)
+
+def _register_project_file(conn, project_id, folder_id, source, file_path, filename, unique_filename,
+                           access_level, encrypt_file, apply_watermark):
+    """Store an upload (stream or staged file path) as a blob, post-process it and record it
+    
+    The stored content goes into the content-addressed blob store: identical uploads
+    share one blob and the backup is a hard link to it, so neither costs extra disk.
+    """
+    extension = os.path.splitext(filename)[1]
+    
+    if apply_watermark and file_manager._get_mime_type(extension).startswith('image/'):
+        # Watermarking needs the decoded image: store plaintext, watermark, then encrypt
+        file_path, metadata, _ = file_manager.store_upload(source, file_path, backup=False)
+        watermarked_path = file_manager.apply_watermark(str(file_path))
+        if watermarked_path != str(file_path):
+            os.remove(str(file_path))  # Remove original
+            file_path = watermarked_path
+            unique_filename = unique_filename.replace('.', '_watermarked.')
+            metadata['hash'] = file_manager.get_file_hash(file_path)
+            metadata['size'] = os.path.getsize(file_path)
         
-        # Apply encryption if requested
         if encrypt_file:
             encrypted_path = file_manager.encrypt_file(str(file_path))
             os.remove(str(file_path))  # Remove original
             file_path = encrypted_path
             unique_filename += '.encrypted'
+    else:
+        # Hash, MIME sniffing and encryption in a single read
+        file_path, metadata, _ = file_manager.store_upload(source, file_path, encrypt=encrypt_file, backup=False)
+        if encrypt_file:
+            unique_filename += '.encrypted'
+    
+    # Encrypted blobs are keyed by the plaintext hash plus a suffix
+    file_path, _ = blob_store.commit_staged(file_path, metadata['hash'], '.encrypted' if encrypt_file else '')
+    backup_path = str(blob_store.link(file_path, file_manager._backup_path(unique_filename)))
+    blob_store.acquire(conn, file_path, metadata['hash'], os.path.getsize(file_path))
+    record_usage(conn, project_id, extension, metadata['size'])
+    
+    # Save file record to database
+    file_id = conn.execute('''
+        INSERT INTO project_files_enhanced 
+        (project_id, folder_id, file_name, original_name, file_path, file_size, 
+         file_type, mime_type, file_hash, is_encrypted, watermark_applied, 
+         access_level, metadata, created_by, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        RETURNING id
+    ''', (
+        project_id, folder_id, unique_filename, filename, str(file_path),
+        metadata['size'], os.path.splitext(filename)[1], metadata['mime_type'],
+        metadata['hash'], encrypt_file, apply_watermark, access_level,
+        json.dumps(metadata), session['user_id'], 
+        datetime.now().isoformat(), datetime.now().isoformat()
+    )).fetchone()[0]
+    conn.commit()
+    
+    # Log file upload
+    file_manager.log_file_access(
+        file_id, session['user_id'], 'upload',
+        request.remote_addr, request.headers.get('User-Agent')
+    )
+    
+    return {
+        'file_id': file_id,
+        'filename': unique_filename,
+        'size': metadata['size'],
+        'hash': metadata['hash'],
+        'backup_path': backup_path
+    }
+
+@enhanced_file_bp.route('/api/projects/<project_id>/files/uploads', methods=['POST'])
+def init_chunked_upload(project_id):
+    """Start a resumable chunked upload (for files larger than the request size limit)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename', ''))
+    folder_id = data.get('folder_id')
+    
+    if not filename:
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not folder_id:
+        return jsonify({'error': 'Folder ID required'}), 400
+    
+    conn = get_db_connection()
+    folder = conn.execute('''
+        SELECT id FROM project_folders_enhanced WHERE id = ? AND project_id = ?
+    ''', (folder_id, project_id)).fetchone()
+    conn.close()
+    
+    if not folder:
+        return jsonify({'error': 'Folder not found'}), 404
+    
+    try:
+        status = upload_manager.init_upload(
+            filename, data.get('size'), session['user_id'],
+            chunk_size=data.get('chunk_size'),
+            metadata={
+                'project_id': project_id,
+                'folder_id': folder_id,
+                'access_level': data.get('access_level', 'project'),
+                'encrypt': bool(data.get('encrypt', False)),
+                'watermark': bool(data.get('watermark', False))
+            }
+        )
+        return jsonify(status), 201
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status_code
+
+def _get_upload_session(project_id, upload_id):
+    """Upload session status for the current user, checked against the project"""
+    status = upload_manager.get_status(upload_id, session['user_id'])
+    if status['metadata'].get('project_id') != project_id:
+        raise UploadError('Upload session not found', 404)
+    return status
+
+@enhanced_file_bp.route('/api/projects/<project_id>/files/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(project_id, upload_id):
+    """Upload status: received and missing chunks (used to resume)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        return jsonify(_get_upload_session(project_id, upload_id))
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status_code
+
+@enhanced_file_bp.route('/api/projects/<project_id>/files/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(project_id, upload_id, index):
+    """Upload one chunk (raw request body); chunks may be sent in parallel and retried"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        _get_upload_session(project_id, upload_id)
+        result = upload_manager.write_chunk(
+            upload_id, index, request.stream, session['user_id'],
+            expected_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+        return jsonify(result)
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status_code
+
+@enhanced_file_bp.route('/api/projects/<project_id>/files/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(project_id, upload_id):
+    """Assemble the uploaded chunks and register the file like a regular upload"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    conn = get_db_connection()
+    
+    try:
+        status = _get_upload_session(project_id, upload_id)
+        options = status['metadata']
+        folder = conn.execute('''
+            SELECT * FROM project_folders_enhanced WHERE id = ? AND project_id = ?
+        ''', (options['folder_id'], project_id)).fetchone()
         
-        # Apply watermark if requested and file is an image
-        if apply_watermark and metadata['mime_type'].startswith('image/'):
-            watermarked_path = file_manager.apply_watermark(str(file_path))
-            if watermarked_path != str(file_path):
-                os.remove(str(file_path))  # Remove original
-                file_path = watermarked_path
-                unique_filename = unique_filename.replace('.', '_watermarked.')
-        
-        # Create backup
-        backup_path = file_manager.create_backup(file_path)
-        
-        # Save file record to database
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO project_files_enhanced 
-            (project_id, folder_id, file_name, original_name, file_path, file_size, 
-             file_type, mime_type, file_hash, is_encrypted, watermark_applied, 
-             access_level, metadata, created_by, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            project_id, folder_id, unique_filename, filename, str(file_path),
-            metadata['size'], os.path.splitext(filename)[1], metadata['mime_type'],
-            metadata['hash'], encrypt_file, apply_watermark, access_level,
-            json.dumps(metadata), session['user_id'], 
-            datetime.now().isoformat(), datetime.now().isoformat()
-        ))
-        
-        file_id = cursor.lastrowid
-        conn.commit()
+        if not folder:
+            conn.close()
+            return jsonify({'error': 'Folder not found'}), 404
         
-        # Log file upload
-        file_manager.log_file_access(
-            file_id, session['user_id'], 'upload',
-            request.remote_addr, request.headers.get('User-Agent')
+        filename = status['filename']
+        unique_filename, file_path = _new_project_file_path(filename)
+        staged_path = file_path.with_name(file_path.name + '.part')
+        upload_manager.complete_upload(
+            upload_id, staged_path, session['user_id'], expected_sha256=data.get('sha256')
         )
         
+        result = _register_project_file(
+            conn, project_id, options['folder_id'], staged_path, file_path, filename, unique_filename,
+            options['access_level'], options['encrypt'], options['watermark']
+        )
         conn.close()
         
-        return jsonify({
-            'message': 'File uploaded successfully',
-            'file_id': file_id,
-            'filename': unique_filename,
-            'size': metadata['size'],
-            'backup_path': backup_path
-        }), 201
+        return jsonify({'message': 'File uploaded successfully', **result}), 201
         
+    except UploadError as e:
+        conn.close()
+        return jsonify(e.to_dict()), e.status_code
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+@enhanced_file_bp.route('/api/projects/<project_id>/files/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(project_id, upload_id):
+    """Cancel an upload and discard received chunks"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        _get_upload_session(project_id, upload_id)
+        upload_manager.abort_upload(upload_id, session['user_id'])
+        return jsonify({'message': 'Upload cancelled'})
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status_code
+
 @enhanced_file_bp.route('/api/projects/<project_id>/files', methods=['GET'])
 def get_project_files(project_id):
-    """Get files for a project"""
+    """Get files for a project
+    
+    Filters: folder_id, type (extension), date_from/date_to (upload date).
+    Sorting: sort=created_at|file_name|file_size|id, order=asc|desc.
+    With limit/cursor the response is {'files', 'next_cursor', 'has_more'};
+    otherwise the full list is streamed as a bare array as before.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    folder_id = request.args.get('folder_id')
-    
-    conn = get_db_connection()
+    try:
+        page = PageRequest(request.args, FILE_SORT_FIELDS, 'created_at')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     
-    query = '''
-        SELECT pf.*, u.full_name as created_by_name, folder.folder_name
-        FROM project_files_enhanced pf
-        LEFT JOIN users u ON pf.created_by = u.id
-        LEFT JOIN project_folders_enhanced folder ON pf.folder_id = folder.id
-        WHERE pf.project_id = ?
-    '''
+    filters = ['pf.project_id = ?']
     params = [project_id]
     
+    folder_id = request.args.get('folder_id')
     if folder_id:
-        query += ' AND pf.folder_id = ?'
+        filters.append('pf.folder_id = ?')
         params.append(folder_id)
     
-    query += ' ORDER BY pf.created_at DESC'
+    file_type = request.args.get('type')
+    if file_type:
+        # file_type is stored as the extension ('.pdf'); accept 'pdf' or '.PDF'
+        filters.append('LOWER(pf.file_type) = ?')
+        params.append('.' + normalize_file_type(file_type))
     
-    files = conn.execute(query, params).fetchall()
-    conn.close()
+    date_filters, date_params = date_range_sql(page, 'pf.created_at')
+    filters += date_filters
+    params += date_params
     
-    return jsonify([dict(file) for file in files])
+    sort_expr = FILE_SORT_FIELDS[page.sort]
+    conn = get_db_connection()
+    
+    def fetch_batch(cursor, size):
+        keyset, keyset_params, order_by = keyset_sql(page, sort_expr, 'pf.id', cursor)
+        where = ' AND '.join(filters + ([keyset] if keyset else []))
+        return conn.execute(f'''
+            SELECT pf.*, u.full_name as created_by_name, folder.folder_name,
+                   {sort_expr} AS sort_key
+            FROM project_files_enhanced pf
+            LEFT JOIN users u ON pf.created_by = u.id
+            LEFT JOIN project_folders_enhanced folder ON pf.folder_id = folder.id
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + keyset_params + [size]).fetchall()
+    
+    def serialize(row):
+        file = dict(row)
+        del file['sort_key']
+        return file
+    
+    return stream_listing(
+        page, fetch_batch,
+        lambda row: (row['sort_key'], row['id']),
+        serialize,
+        key='files' if page.paginated else None,
+        on_close=conn.close
+    )
 
 @enhanced_file_bp.route('/api/files/<int:file_id>/download', methods=['GET'])
 def download_file(file_id):
@@ -236,11 +440,12 @@ def download_file(file_id):
     try:
         file_path = file_record['file_path']
         
-        # Decrypt if necessary
-        if file_record['is_encrypted']:
-            temp_path = file_manager.base_path / 'temp' / f"temp_{file_id}_{file_record['original_name']}"
-            temp_path.parent.mkdir(exist_ok=True)
-            file_path = file_manager.decrypt_file(file_record['file_path'], str(temp_path))
+        # Legacy Fernet files are converted once so that every download streams
+        if file_record['is_encrypted'] and file_manager.upgrade_encrypted_file(file_path):
+            file_manager.log_file_access(
+                file_id, session['user_id'], 'encryption_upgrade',
+                request.remote_addr, request.headers.get('User-Agent')
+            )
         
         # Update download count and last accessed
         conn.execute('''
@@ -258,12 +463,17 @@ def download_file(file_id):
         
         conn.close()
         
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=file_record['original_name']
-        )
+        if not file_record['is_encrypted']:
+            return send_file(
+                file_path,
+                as_attachment=True,
+                download_name=file_record['original_name']
+            )
+        
+        return send_decrypted_file(file_path, file_record)
         
+    except RequestedRangeNotSatisfiable:
+        raise
     except Exception as e:
         conn.close()
         file_manager.log_file_access(
@@ -273,6 +483,75 @@ def download_file(file_id):
         )
         return jsonify({'error': str(e)}), 500
 
+def send_decrypted_file(file_path, file_record):
+    """Stream an encrypted file, decrypting into the response body
+    
+    Only the chunks covering the requested bytes are decrypted, one at a time,
+    so memory stays bounded and no plaintext is written to disk. Range and
+    conditional requests are answered from the plaintext size.
+    """
+    source, size = file_manager.open_decrypted(file_path)
+    try:
+        response = send_file(
+            source,
+            mimetype=file_record['mime_type'] or None,
+            as_attachment=True,
+            download_name=file_record['original_name'],
+            etag=f"{file_record['id']}-{file_record['file_hash']}",
+            last_modified=os.path.getmtime(file_path),
+            conditional=False
+        )
+        response.content_length = size
+        return response.make_conditional(request, accept_ranges=True, complete_length=size)
+    except Exception:
+        source.close()
+        raise
+
+@enhanced_file_bp.route('/api/files/<int:file_id>', methods=['DELETE'])
+def delete_file(file_id):
+    """Delete a file record and release its blob"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    conn = get_db_connection()
+    file_record = conn.execute('''
+        SELECT * FROM project_files_enhanced WHERE id = ?
+    ''', (file_id,)).fetchone()
+    
+    if not file_record:
+        conn.close()
+        return jsonify({'error': 'File not found'}), 404
+    
+    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+    if user['role'] != 'admin' and file_record['created_by'] != session['user_id']:
+        conn.close()
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    try:
+        conn.execute('DELETE FROM file_permissions_enhanced WHERE file_id = ?', (file_id,))
+        conn.execute('DELETE FROM project_files_enhanced WHERE id = ?', (file_id,))
+        blob_store.release(conn, file_record['file_path'])
+        record_usage(conn, file_record['project_id'], file_record['file_type'], -(file_record['file_size'] or 0), -1)
+        conn.commit()
+        conn.close()
+        
+        # Browsable hard link created by local storage uploads
+        metadata = json.loads(file_record['metadata'] or '{}')
+        if metadata.get('storage_path') and os.path.exists(metadata['storage_path']):
+            os.remove(metadata['storage_path'])
+        
+        file_manager.log_file_access(
+            file_id, session['user_id'], 'delete',
+            request.remote_addr, request.headers.get('User-Agent')
+        )
+        
+        return jsonify({'message': 'File deleted successfully'})
+        
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
 @enhanced_file_bp.route('/api/files/<int:file_id>/versions', methods=['GET'])
 def get_file_versions(file_id):
     """Get version history of a file"""
@@ -291,28 +570,106 @@ def get_file_versions(file_id):
     
     return jsonify([dict(version) for version in versions])
 
-@enhanced_file_bp.route('/api/projects/<project_id>/storage', methods=['GET'])
-def get_storage_usage(project_id):
-    """Get storage usage for a project"""
+def _flush_audit_log_if_requested():
+    """With ?consistent=1, wait until entries queued by this worker are written"""
+    if request.args.get('consistent') in ('1', 'true'):
+        file_manager.audit_log.flush(timeout=5)
+
+@enhanced_file_bp.route('/api/files/access-logs', methods=['GET'])
+def get_file_access_logs():
+    """Query the file access audit log
+    
+    Filters: user_id, action, file_id, date_from/date_to (access time).
+    Always paged: {'logs', 'next_cursor', 'has_more'}, newest first by default.
+    Non-admin users only see their own entries.
+    
+    Entries are written in the background and appear within
+    AUDIT_LOG_FLUSH_INTERVAL seconds; ?consistent=1 first waits for this
+    worker's queued entries to be written.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    usage = file_manager.get_storage_usage(project_id)
+    try:
+        page = PageRequest(request.args, ACCESS_LOG_SORT_FIELDS, 'accessed_at')
+        user_id = request.args.get('user_id', type=int)
+        file_id = request.args.get('file_id', type=int)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    page.paginated = True
+    
+    _flush_audit_log_if_requested()
     
-    # Get file count by type
     conn = get_db_connection()
-    file_types = conn.execute('''
-        SELECT file_type, COUNT(*) as count, SUM(file_size) as total_size
-        FROM project_files_enhanced
-        WHERE project_id = ?
-        GROUP BY file_type
-        ORDER BY total_size DESC
-    ''', (project_id,)).fetchall()
-    conn.close()
+    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+    if user['role'] != 'admin':
+        if user_id is not None and user_id != session['user_id']:
+            conn.close()
+            return jsonify({'error': 'Permission denied'}), 403
+        user_id = session['user_id']
+    
+    filters, params = access_log_filters(
+        user_id, request.args.get('action'), file_id, page.date_from, page.date_until
+    )
+    
+    def fetch_batch(cursor, size):
+        keyset, keyset_params, order_by = keyset_sql(page, 'l.accessed_at', 'l.id', cursor)
+        clauses = filters + ([keyset] if keyset else [])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return conn.execute(f'''
+            SELECT l.*, u.full_name as user_name, pf.original_name as file_name
+            FROM file_access_logs l
+            LEFT JOIN users u ON l.user_id = u.id
+            LEFT JOIN project_files_enhanced pf ON l.file_id = pf.id
+            {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + keyset_params + [size]).fetchall()
+    
+    return stream_listing(
+        page, fetch_batch,
+        lambda row: (row['accessed_at'], row['id']),
+        dict,
+        key='logs',
+        on_close=conn.close
+    )
+
+@enhanced_file_bp.route('/api/files/access-logs/summary', methods=['GET'])
+def get_file_access_summary():
+    """Access counts per action for a user (user_id, date_from/date_to; ?consistent=1 as above)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
     
-    usage['file_types'] = [dict(ft) for ft in file_types]
+    try:
+        page = PageRequest(request.args, ACCESS_LOG_SORT_FIELDS, 'accessed_at')
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    user_id = request.args.get('user_id', type=int)
+    
+    _flush_audit_log_if_requested()
+    conn = get_db_connection()
+    try:
+        user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+        if user['role'] != 'admin':
+            if user_id is not None and user_id != session['user_id']:
+                return jsonify({'error': 'Permission denied'}), 403
+            user_id = session['user_id']
+        
+        return jsonify({
+            'user_id': user_id,
+            'actions': access_log_summary(conn, user_id, page.date_from, page.date_until)
+        })
+    finally:
+        conn.close()
+
+@enhanced_file_bp.route('/api/projects/<project_id>/storage', methods=['GET'])
+def get_storage_usage(project_id):
+    """Get storage usage for a project"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
     
-    return jsonify(usage)
+    # Maintained counters (including the per-type breakdown), no directory walk
+    return jsonify(file_manager.get_storage_usage(project_id))
 
 @enhanced_file_bp.route('/api/files/<int:file_id>/permissions', methods=['GET', 'POST'])
 def manage_file_permissions(file_id):
@@ -341,9 +698,12 @@ def manage_file_permissions(file_id):
         data = request.get_json()
         
         conn.execute('''
-            INSERT OR REPLACE INTO file_permissions_enhanced
+            INSERT INTO file_permissions_enhanced
             (file_id, user_id, role, permission_type, granted_by, granted_at, expires_at)
             VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id, user_id, role) DO UPDATE SET
+                permission_type = excluded.permission_type, granted_by = excluded.granted_by,
+                granted_at = excluded.granted_at, expires_at = excluded.expires_at
         ''', (
             file_id, data.get('user_id'), data.get('role'), data['permission_type'],
             session['user_id'], datetime.now().isoformat(), data.get('expires_at')
@@ -368,6 +728,13 @@ def cleanup_temp_files():
     
     max_age_hours = request.json.get('max_age_hours', 24)
     file_manager.cleanup_temp_files(max_age_hours)
+    upload_manager.cleanup_expired(max_age_hours)
+    blob_store.cleanup_staging(max_age_hours)
+    
+    # Blobs no longer referenced by any project file or document
+    conn = get_db_connection()
+    removed_blobs = collect_unreferenced_blobs(conn)
+    conn.close()
     
-    return jsonify({'message': 'Cleanup completed successfully'})
+    return jsonify({'message': 'Cleanup completed successfully', 'removed_blobs': removed_blobs})
 
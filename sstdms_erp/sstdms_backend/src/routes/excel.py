@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, session, send_file
 from models.user import db, User
 from models.document import Project, Document
-from models.project_permission import ProjectPermission
 from routes.user import login_required, admin_required
+from utils.permissions import permission_resolver
+from utils.database import session_connection
+from excel_processor import iter_excel_chunks
 import pandas as pd
 import os
 from datetime import datetime
@@ -64,15 +66,13 @@ def export_projects():
     """프로젝트 목록 엑셀 내보내기"""
     try:
         user_id = session['user_id']
-        user = User.query.get(user_id)
+        permission_map = permission_resolver.get_map(session_connection(db.session), user_id)
         
-        if user.role == 'admin':
+        if permission_map.is_admin:
             projects = Project.query.all()
         else:
             # 사용자에게 권한이 있는 프로젝트만 조회
-            project_permissions = ProjectPermission.query.filter_by(user_id=user_id).all()
-            project_ids = [p.project_id for p in project_permissions]
-            projects = Project.query.filter(Project.id.in_(project_ids)).all()
+            projects = Project.query.filter(Project.id.in_(permission_map.project_ids())).all()
         
         # 데이터 준비
         data = []
@@ -123,14 +123,8 @@ def export_documents(project_id):
         user_id = session['user_id']
         
         # 권한 확인
-        user = User.query.get(user_id)
-        if user.role != 'admin':
-            permission = ProjectPermission.query.filter_by(
-                user_id=user_id,
-                project_id=project_id
-            ).first()
-            if not permission:
-                return jsonify({'error': '프로젝트에 대한 접근 권한이 없습니다.'}), 403
+        if not permission_resolver.has_project_permission(session_connection(db.session), user_id, project_id):
+            return jsonify({'error': '프로젝트에 대한 접근 권한이 없습니다.'}), 403
         
         # 프로젝트 정보 조회
         project = Project.query.get_or_404(project_id)
@@ -177,6 +171,13 @@ def export_documents(project_id):
     except Exception as e:
         return jsonify({'error': f'문서 목록 내보내기 중 오류가 발생했습니다: {str(e)}'}), 500
 
+def _cell(row, column, default):
+    """선택 컬럼 값 (컬럼이 없거나 빈 칸이면 기본값)"""
+    value = row.get(column)
+    if value is None or value == '' or pd.isna(value):
+        return default
+    return value
+
 @excel_bp.route('/import/users', methods=['POST'])
 @admin_required
 def import_users():
@@ -192,51 +193,52 @@ def import_users():
         if not file.filename.endswith(('.xlsx', '.xls')):
             return jsonify({'error': '엑셀 파일만 업로드 가능합니다.'}), 400
         
-        # 엑셀 파일 읽기
-        df = pd.read_excel(file)
-        
-        # 필수 컬럼 확인
+        # 엑셀 파일 스트리밍 읽기 (청크 단위)
         required_columns = ['사용자명', '이메일', '성명', '비밀번호']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return jsonify({'error': f'필수 컬럼이 누락되었습니다: {", ".join(missing_columns)}'}), 400
         
         success_count = 0
         error_count = 0
         errors = []
         
-        for index, row in df.iterrows():
-            try:
-                # 중복 검사
-                if User.query.filter_by(username=row['사용자명']).first():
-                    errors.append(f"행 {index + 2}: 이미 존재하는 사용자명 '{row['사용자명']}'")
-                    error_count += 1
-                    continue
-                
-                if User.query.filter_by(email=row['이메일']).first():
-                    errors.append(f"행 {index + 2}: 이미 존재하는 이메일 '{row['이메일']}'")
+        for df in iter_excel_chunks(file):
+            # 필수 컬럼 확인
+            missing_columns = [col for col in required_columns if col not in df.columns]
+            if missing_columns:
+                db.session.rollback()
+                return jsonify({'error': f'필수 컬럼이 누락되었습니다: {", ".join(missing_columns)}'}), 400
+            
+            for index, row in df.iterrows():
+                try:
+                    # 중복 검사
+                    if User.query.filter_by(username=row['사용자명']).first():
+                        errors.append(f"행 {index + 2}: 이미 존재하는 사용자명 '{row['사용자명']}'")
+                        error_count += 1
+                        continue
+                    
+                    if User.query.filter_by(email=row['이메일']).first():
+                        errors.append(f"행 {index + 2}: 이미 존재하는 이메일 '{row['이메일']}'")
+                        error_count += 1
+                        continue
+                    
+                    # 새 사용자 생성
+                    user = User(
+                        username=row['사용자명'],
+                        email=row['이메일'],
+                        full_name=row['성명'],
+                        department=_cell(row, '부서', ''),
+                        position=_cell(row, '직급', ''),
+                        phone=_cell(row, '전화번호', ''),
+                        role=_cell(row, '역할', 'user'),
+                        language=_cell(row, '언어', 'ko')
+                    )
+                    user.set_password(row['비밀번호'])
+                    
+                    db.session.add(user)
+                    success_count += 1
+                    
+                except Exception as e:
+                    errors.append(f"행 {index + 2}: {str(e)}")
                     error_count += 1
-                    continue
-                
-                # 새 사용자 생성
-                user = User(
-                    username=row['사용자명'],
-                    email=row['이메일'],
-                    full_name=row['성명'],
-                    department=row.get('부서', ''),
-                    position=row.get('직급', ''),
-                    phone=row.get('전화번호', ''),
-                    role=row.get('역할', 'user'),
-                    language=row.get('언어', 'ko')
-                )
-                user.set_password(row['비밀번호'])
-                
-                db.session.add(user)
-                success_count += 1
-                
-            except Exception as e:
-                errors.append(f"행 {index + 2}: {str(e)}")
-                error_count += 1
         
         db.session.commit()
         
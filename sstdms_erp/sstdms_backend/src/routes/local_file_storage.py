@@ -1,18 +1,25 @@
 from flask import Blueprint, request, jsonify, session, send_file
-import sqlite3
 import os
 import json
-import shutil
+import bisect
+from stat import S_ISDIR
 from datetime import datetime
 from pathlib import Path
 from werkzeug.utils import secure_filename
+from utils.blob_store import BlobStore, BLOB_DIR_NAME
+from utils.storage_usage import record_usage, get_usage, reconcile_usage, normalize_file_type
+from utils.pagination import PageRequest, PaginationError, stream_listing
+from utils.permissions import permission_resolver
+from utils.database import get_connection
 
 local_storage_bp = Blueprint('local_storage', __name__)
 
 def get_db_connection():
-    conn = sqlite3.connect('database/app.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection()
+
+def has_project_access(conn, project_id):
+    """Check the current user's access to a project (cached permission map)"""
+    return permission_resolver.has_project_permission(conn, session['user_id'], project_id)
 
 # Default storage settings
 DEFAULT_STORAGE_CONFIG = {
@@ -48,38 +55,62 @@ def get_storage_configuration():
     
     conn = get_db_connection()
     user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    conn.close()
     
     if user['role'] != 'admin':
+        conn.close()
         return jsonify({'error': 'Only administrators can view storage configuration'}), 403
     
-    config = get_storage_config()
+    config = dict(get_storage_config())
     
-    # Add storage usage information
+    # Add storage usage information (maintained counters, no directory walk)
     try:
-        base_path = Path(config['base_path'])
-        if base_path.exists():
-            total_size = sum(f.stat().st_size for f in base_path.rglob('*') if f.is_file())
-            file_count = sum(1 for f in base_path.rglob('*') if f.is_file())
-            
-            config['usage'] = {
-                'total_size_bytes': total_size,
-                'total_size_mb': round(total_size / (1024 * 1024), 2),
-                'total_size_gb': round(total_size / (1024 * 1024 * 1024), 2),
-                'file_count': file_count
-            }
-        else:
-            config['usage'] = {
-                'total_size_bytes': 0,
-                'total_size_mb': 0,
-                'total_size_gb': 0,
-                'file_count': 0
-            }
+        usage = get_usage(conn)
+        config['usage'] = {
+            'total_size_bytes': usage['total_size'],
+            'total_size_mb': usage['total_size_mb'],
+            'total_size_gb': usage['total_size_gb'],
+            'file_count': usage['file_count'],
+            'file_types': usage['file_types'],
+            'stored_size_bytes': usage.get('stored_size', usage['total_size'])
+        }
     except Exception as e:
         config['usage'] = {'error': str(e)}
+    finally:
+        conn.close()
     
     return jsonify(config)
 
+@local_storage_bp.route('/api/storage/usage/reconcile', methods=['POST'])
+def reconcile_storage_usage():
+    """Recompute usage counters from the file tables (one batch, or a full pass)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    conn = get_db_connection()
+    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+    
+    if user['role'] != 'admin':
+        conn.close()
+        return jsonify({'error': 'Only administrators can reconcile storage usage'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        totals = {'projects': 0, 'corrected': 0}
+        restart = bool(data.get('full'))
+        while True:
+            result = reconcile_usage(conn, restart=restart)
+            restart = False
+            totals['projects'] += result['projects']
+            totals['corrected'] += result['corrected']
+            if result['completed_pass'] or not data.get('full'):
+                break
+        totals['completed_pass'] = result['completed_pass']
+        return jsonify(totals)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 @local_storage_bp.route('/api/storage/config', methods=['POST'])
 def update_storage_configuration():
     """Update storage configuration"""
@@ -228,21 +259,12 @@ def initialize_project_storage(project_id):
     
     # Check if user has access to this project
     conn = get_db_connection()
-    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if user['role'] != 'admin':
-        # Check project permission
-        permission = conn.execute('''
-            SELECT permission_type FROM project_permissions 
-            WHERE project_id = ? AND user_id = ?
-        ''', (project_id, session['user_id'])).fetchone()
-        
-        if not permission:
-            conn.close()
-            return jsonify({'error': 'No permission for this project'}), 403
-    
+    has_access = has_project_access(conn, project_id)
     conn.close()
     
+    if not has_access:
+        return jsonify({'error': 'No permission for this project'}), 403
+    
     try:
         config = get_storage_config()
         base_path = Path(config['base_path'])
@@ -299,17 +321,9 @@ def upload_file_to_project(project_id):
     
     # Check project access
     conn = get_db_connection()
-    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if user['role'] != 'admin':
-        permission = conn.execute('''
-            SELECT permission_type FROM project_permissions 
-            WHERE project_id = ? AND user_id = ?
-        ''', (project_id, session['user_id'])).fetchone()
-        
-        if not permission:
-            conn.close()
-            return jsonify({'error': 'No permission for this project'}), 403
+    if not has_project_access(conn, project_id):
+        conn.close()
+        return jsonify({'error': 'No permission for this project'}), 403
     
     try:
         config = get_storage_config()
@@ -329,40 +343,49 @@ def upload_file_to_project(project_id):
         unique_filename = f"{timestamp}_{filename}"
         file_path = upload_path / unique_filename
         
-        # Save file
-        file.save(str(file_path))
-        
-        # Get file info
-        file_stat = file_path.stat()
-        
-        # Create backup if enabled
-        backup_path = None
-        if config.get('auto_backup', True):
-            backup_dir = base_path / project_id / 'backups'
-            backup_dir.mkdir(exist_ok=True)
-            backup_path = backup_dir / unique_filename
-            shutil.copy2(file_path, backup_path)
-        
-        # Record in database
-        conn.execute('''
-            INSERT INTO project_files_enhanced 
-            (project_id, folder_id, file_name, original_name, file_path, file_size, 
-             file_type, created_by, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            project_id, 0, unique_filename, filename, str(file_path),
-            file_stat.st_size, os.path.splitext(filename)[1],
-            session['user_id'], datetime.now().isoformat(), datetime.now().isoformat()
-        ))
-        
-        conn.commit()
+        # Store the content once in the blob store; the project folder and the
+        # backup get hard links to it, so duplicates and backups cost no extra disk
+        blob_store = BlobStore(base_path / BLOB_DIR_NAME)
+        blob_path, file_hash, file_size, _ = blob_store.put_stream(file.stream)
+        links = []
+        try:
+            links.append(blob_store.link(blob_path, file_path))
+            
+            backup_path = None
+            if config.get('auto_backup', True):
+                backup_dir = base_path / project_id / 'backups'
+                backup_path = blob_store.link(blob_path, backup_dir / unique_filename)
+                links.append(backup_path)
+            
+            # Record in database (the blob reference is committed with the file row)
+            blob_store.acquire(conn, blob_path, file_hash, file_size)
+            record_usage(conn, project_id, filename, file_size)
+            conn.execute('''
+                INSERT INTO project_files_enhanced 
+                (project_id, folder_id, file_name, original_name, file_path, file_size, 
+                 file_type, file_hash, metadata, created_by, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                project_id, 0, unique_filename, filename, str(blob_path),
+                file_size, os.path.splitext(filename)[1], file_hash,
+                json.dumps({'storage_path': str(file_path)}),
+                session['user_id'], datetime.now().isoformat(), datetime.now().isoformat()
+            ))
+            
+            conn.commit()
+        except Exception:
+            # Drop the links and leave the blob to the unreferenced-blob GC
+            conn.rollback()
+            blob_store.abandon(conn, blob_path, file_hash, file_size, links)
+            raise
         conn.close()
         
         return jsonify({
             'message': 'File uploaded successfully',
             'filename': unique_filename,
             'path': str(file_path),
-            'size': file_stat.st_size,
+            'size': file_size,
+            'hash': file_hash,
             'backup_path': str(backup_path) if backup_path else None
         })
         
@@ -381,20 +404,12 @@ def list_project_files(project_id):
     
     # Check project access
     conn = get_db_connection()
-    user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if user['role'] != 'admin':
-        permission = conn.execute('''
-            SELECT permission_type FROM project_permissions 
-            WHERE project_id = ? AND user_id = ?
-        ''', (project_id, session['user_id'])).fetchone()
-        
-        if not permission:
-            conn.close()
-            return jsonify({'error': 'No permission for this project'}), 403
-    
+    has_access = has_project_access(conn, project_id)
     conn.close()
     
+    if not has_access:
+        return jsonify({'error': 'No permission for this project'}), 403
+    
     try:
         config = get_storage_config()
         base_path = Path(config['base_path'])
@@ -407,41 +422,93 @@ def list_project_files(project_id):
         else:
             list_path = base_path / project_id
         
+        page = PageRequest(request.args, ('name',), 'name', default_order='asc')
+        
         if not list_path.exists():
             return jsonify({'files': [], 'folders': []})
         
-        files = []
+        # Only names and entry types are read up front (no stat per entry);
+        # files are stat()ed when they are written to the response.
+        file_names = []
         folders = []
+        file_type = request.args.get('type')
+        extension = '.' + normalize_file_type(file_type) if file_type else None
+        
+        with os.scandir(list_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if page.cursor is None:
+                            folders.append(_storage_item_info(Path(entry.path), entry.stat(), base_path))
+                    elif extension is None or os.path.splitext(entry.name)[1].lower() == extension:
+                        file_names.append(entry.name)
+                except (PermissionError, OSError):
+                    continue
+        
+        folders.sort(key=lambda item: item['name'])
+        file_names.sort()
+        
+        def fetch_batch(cursor, size):
+            # names are unique within a directory, so the cursor name alone positions the page
+            if page.descending:
+                end = bisect.bisect_left(file_names, cursor[0]) if cursor else len(file_names)
+                names = reversed(file_names[:end])
+            else:
+                start = bisect.bisect_right(file_names, cursor[0]) if cursor else 0
+                names = file_names[start:]
+            
+            batch = []
+            for name in names:
+                try:
+                    stat = (list_path / name).stat()
+                except (PermissionError, OSError):
+                    continue
+                if not _in_date_range(stat.st_mtime, page):
+                    continue
+                batch.append(_storage_item_info(list_path / name, stat, base_path))
+                if len(batch) == size:
+                    break
+            return batch
+        
+        return stream_listing(
+            page, fetch_batch,
+            lambda item_info: (item_info['name'], None),
+            lambda item_info: item_info,
+            key='files',
+            envelope={
+                'current_path': str(list_path.relative_to(base_path)),
+                'folders': folders
+            }
+        )
         
-        for item in sorted(list_path.iterdir()):
-            try:
-                stat = item.stat()
-                item_info = {
-                    'name': item.name,
-                    'path': str(item.relative_to(base_path)),
-                    'size': stat.st_size,
-                    'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                }
-                
-                if item.is_dir():
-                    item_info['type'] = 'directory'
-                    folders.append(item_info)
-                else:
-                    item_info['type'] = 'file'
-                    item_info['extension'] = item.suffix.lower()
-                    files.append(item_info)
-            except (PermissionError, OSError):
-                continue
-        
-        return jsonify({
-            'current_path': str(list_path.relative_to(base_path)),
-            'files': files,
-            'folders': folders
-        })
-        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _storage_item_info(path, stat, base_path):
+    """Describe one storage entry from its stat result"""
+    item_info = {
+        'name': path.name,
+        'path': str(path.relative_to(base_path)),
+        'size': stat.st_size,
+        'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if S_ISDIR(stat.st_mode):
+        item_info['type'] = 'directory'
+    else:
+        item_info['type'] = 'file'
+        item_info['extension'] = path.suffix.lower()
+    return item_info
+
+def _in_date_range(mtime, page):
+    modified = datetime.fromtimestamp(mtime)
+    if page.date_from and modified < page.date_from:
+        return False
+    if page.date_until and modified >= page.date_until:
+        return False
+    return True
+
 @local_storage_bp.route('/api/storage/download', methods=['POST'])
 def download_file():
     """Download a file from storage"""
@@ -466,20 +533,12 @@ def download_file():
         project_id = file_path.split('/')[0]
         
         conn = get_db_connection()
-        user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-        
-        if user['role'] != 'admin':
-            permission = conn.execute('''
-                SELECT permission_type FROM project_permissions 
-                WHERE project_id = ? AND user_id = ?
-            ''', (project_id, session['user_id'])).fetchone()
-            
-            if not permission:
-                conn.close()
-                return jsonify({'error': 'No permission for this project'}), 403
-        
+        has_access = has_project_access(conn, project_id)
         conn.close()
         
+        if not has_access:
+            return jsonify({'error': 'No permission for this project'}), 403
+        
         return send_file(
             str(full_path),
             as_attachment=True,
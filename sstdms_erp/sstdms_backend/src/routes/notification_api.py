@@ -1,6 +1,14 @@
 from flask import Blueprint, request, jsonify
 from utils.email_sender import EmailSender
+import asyncio
 import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'notification'))
+from queue_manager import notification_queue, register_default_handlers
 
 notification_bp = Blueprint('notification', __name__)
 
@@ -12,6 +20,66 @@ SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', 'your_app_password')
 
 email_sender = EmailSender(SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD)
 
+# 배포 알림은 notification_queue 에 수신자별 이메일 작업으로 넣고, 큐의 이메일 채널이
+# 발송 속도 제한 / 재시도를 맡습니다. 작업 상태는 큐 저장소에서 계산합니다.
+DEPLOYMENT_KEY_PREFIX = 'deployment:'
+DEPLOYMENT_WAIT_TIMEOUT = float(os.getenv('DEPLOYMENT_WAIT_TIMEOUT', '300'))  # 초, wait=true 요청의 최대 대기
+DEPLOYMENT_POLL_INTERVAL = 1.0
+_UNFINISHED_STATUSES = ('pending', 'retry', 'processing')
+
+_queue_loop = None
+_queue_loop_lock = threading.Lock()
+_job_watchers = set()  # 관리자 메일 대기 중인 작업 감시 (태스크 참조 유지)
+
+def _run_on_queue(coro):
+    """notification_queue 의 이벤트 루프 (백그라운드 스레드) 에서 코루틴 실행 -> 결과
+
+    루프는 처음 사용할 때 시작합니다. NOTIFICATION_QUEUE_SHARED=1 이면 이 프로세스는
+    작업을 저장만 하고 발송은 dispatcher 프로세스 (queue_manager.py --dispatch) 가 합니다.
+    """
+    global _queue_loop
+    with _queue_loop_lock:
+        if _queue_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='notification-queue', daemon=True).start()
+            if not notification_queue.shared:
+                register_default_handlers(notification_queue)
+                asyncio.run_coroutine_threadsafe(notification_queue.start(), loop).result()
+            _queue_loop = loop
+    return asyncio.run_coroutine_threadsafe(coro, _queue_loop).result()
+
+def _job_key(job_id, suffix):
+    return f"{DEPLOYMENT_KEY_PREFIX}{job_id}:{suffix}"
+
+async def _deployment_job(job_id):
+    """큐 저장소의 작업 행으로 배포 알림 작업 상태 계산 (없으면 None)"""
+    rows = await notification_queue.get_tasks_by_key_prefix(_job_key(job_id, ''))
+    recipients = [row for row in rows if not row['idempotency_key'].endswith(':admin')]
+    if not recipients:
+        return None
+    admin = next((row for row in rows if row['idempotency_key'].endswith(':admin')), None)
+    
+    unfinished = sum(1 for row in recipients if row['status'] in _UNFINISHED_STATUSES)
+    return {
+        'job_id': job_id,
+        'status': 'sending' if unfinished else 'completed',
+        'recipient_count': len(recipients),
+        'created_at': recipients[0]['created_at'],
+        'pending_count': unfinished,
+        'success_count': sum(1 for row in recipients if row['status'] == 'sent'),
+        'failed_recipients': [
+            {'email': row['data'].get('email'), 'error': row['last_error']}
+            for row in recipients if row['status'] == 'failed'
+        ],
+        'admin_notification': (None if admin is None or admin['status'] in _UNFINISHED_STATUSES
+                               else admin['status'] == 'sent'),
+        'results': [
+            {'email': row['data'].get('email'), 'status': row['status'], 'error': row['last_error']}
+            for row in recipients
+        ],
+        'deployment': recipients[0]['data'].get('deployment', {})
+    }
+
 @notification_bp.route('/send_deployment_notification', methods=['POST'])
 def send_deployment_notification():
     """도면 배포 시 관련자들에게 알림 이메일 발송"""
@@ -28,6 +96,8 @@ def send_deployment_notification():
         drawing_name = data['drawing_name']
         deployed_by = data['deployed_by']
         recipients = data['recipients']  # 이메일 주소 리스트
+        if not isinstance(recipients, list) or not recipients:
+            return jsonify({'error': 'recipients must be a non-empty list of email addresses'}), 400
         admin_email = data.get('admin_email', 'admin@seastar.com')
         
         # 이메일 제목 및 내용 생성
@@ -63,27 +133,69 @@ def send_deployment_notification():
         </html>
         """
         
-        # 수신자들에게 이메일 발송
-        success_count = 0
-        failed_recipients = []
+        # 수신자별 이메일 작업으로 큐에 추가 (같은 job_id 로 다시 요청해도 수신자당 한 통)
+        job_id = str(data.get('job_id') or uuid.uuid4())
+        deployment = {
+            'job_id': job_id,
+            'project_name': project_name,
+            'drawing_name': drawing_name,
+            'deployed_by': deployed_by,
+            'deployment_time': data.get('deployment_time', '현재 시간'),
+            'admin_email': admin_email
+        }
+        _run_on_queue(_enqueue_deployment_job(job_id, subject, html_body, recipients, deployment))
         
-        for recipient in recipients:
-            success, message = email_sender.send_email(
-                sender_email=SMTP_USER,
-                receiver_email=recipient,
-                subject=subject,
-                body=html_body,
-                is_html=True
-            )
-            
-            if success:
-                success_count += 1
-            else:
-                failed_recipients.append({'email': recipient, 'error': message})
+        if data.get('wait'):
+            job = _wait_for_deployment_job(job_id)
+            if job['status'] == 'completed':
+                return jsonify({
+                    'success': True,
+                    'message': f"알림 발송 완료: {job['success_count']}명 성공, {len(job['failed_recipients'])}명 실패",
+                    'job_id': job_id,
+                    'success_count': job['success_count'],
+                    'failed_recipients': job['failed_recipients'],
+                    'admin_notification': job['admin_notification']
+                }), 200
         
-        # 관리자에게도 알림 발송
-        admin_subject = f"[SSTDMS 관리자] {project_name} - {drawing_name} 도면 배포 완료"
-        admin_body = f"""
+        return jsonify({
+            'success': True,
+            'message': f'알림 발송이 접수되었습니다: {len(recipients)}명',
+            'job_id': job_id,
+            'status_url': f'/api/deployment_notifications/{job_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'알림 발송 중 오류 발생: {str(e)}'}), 500
+
+async def _enqueue_deployment_job(job_id, subject, html_body, recipients, deployment):
+    """수신자마다 이메일 작업 하나 (멱등 키: deployment:<job_id>:to:<email>), 완료 감시 시작"""
+    for recipient in dict.fromkeys(recipients):
+        await notification_queue.add_notification(
+            user_id=0,
+            notification_type='email',
+            title=subject,
+            message=html_body,
+            data={'email': recipient, 'is_html': True, 'deployment': deployment},
+            idempotency_key=_job_key(job_id, f'to:{recipient}')
+        )
+    watcher = asyncio.get_running_loop().create_task(_send_admin_summary_when_done(job_id))
+    _job_watchers.add(watcher)
+    watcher.add_done_callback(_job_watchers.discard)
+
+async def _send_admin_summary_when_done(job_id):
+    """수신자 발송이 모두 끝나면 관리자 결과 메일을 큐에 추가 (멱등 키로 한 번만)"""
+    while True:
+        job = await _deployment_job(job_id)
+        if job is None or job['status'] == 'completed':
+            break
+        await asyncio.sleep(DEPLOYMENT_POLL_INTERVAL)
+    if job and job['admin_notification'] is None:
+        await _enqueue_admin_summary(job)
+
+async def _enqueue_admin_summary(job):
+    deployment = job['deployment']
+    admin_subject = f"[SSTDMS 관리자] {deployment['project_name']} - {deployment['drawing_name']} 도면 배포 완료"
+    admin_body = f"""
         <html>
         <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
             <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
@@ -91,12 +203,12 @@ def send_deployment_notification():
                 
                 <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
                     <h3 style="margin-top: 0; color: #495057;">배포 완료 정보</h3>
-                    <p><strong>📋 프로젝트명:</strong> {project_name}</p>
-                    <p><strong>📐 도면명:</strong> {drawing_name}</p>
-                    <p><strong>👤 배포자:</strong> {deployed_by}</p>
-                    <p><strong>📅 배포일시:</strong> {data.get('deployment_time', '현재 시간')}</p>
-                    <p><strong>📧 알림 발송 성공:</strong> {success_count}명</p>
-                    <p><strong>📧 알림 발송 실패:</strong> {len(failed_recipients)}명</p>
+                    <p><strong>📋 프로젝트명:</strong> {deployment['project_name']}</p>
+                    <p><strong>📐 도면명:</strong> {deployment['drawing_name']}</p>
+                    <p><strong>👤 배포자:</strong> {deployment['deployed_by']}</p>
+                    <p><strong>📅 배포일시:</strong> {deployment['deployment_time']}</p>
+                    <p><strong>📧 알림 발송 성공:</strong> {job['success_count']}명</p>
+                    <p><strong>📧 알림 발송 실패:</strong> {len(job['failed_recipients'])}명</p>
                 </div>
                 
                 <p>도면 배포가 완료되었습니다. 시스템을 확인해 주세요.</p>
@@ -104,25 +216,34 @@ def send_deployment_notification():
         </body>
         </html>
         """
-        
-        admin_success, admin_message = email_sender.send_email(
-            sender_email=SMTP_USER,
-            receiver_email=admin_email,
-            subject=admin_subject,
-            body=admin_body,
-            is_html=True
-        )
-        
-        return jsonify({
-            'success': True,
-            'message': f'알림 발송 완료: {success_count}명 성공, {len(failed_recipients)}명 실패',
-            'success_count': success_count,
-            'failed_recipients': failed_recipients,
-            'admin_notification': admin_success
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': f'알림 발송 중 오류 발생: {str(e)}'}), 500
+    await notification_queue.add_notification(
+        user_id=0,
+        notification_type='email',
+        title=admin_subject,
+        message=admin_body,
+        data={'email': deployment['admin_email'], 'is_html': True},
+        idempotency_key=_job_key(job['job_id'], 'admin')
+    )
+
+def _wait_for_deployment_job(job_id):
+    """wait=true: 작업이 끝나고 관리자 메일까지 처리될 때까지 (최대 DEPLOYMENT_WAIT_TIMEOUT 초) 대기"""
+    deadline = time.monotonic() + DEPLOYMENT_WAIT_TIMEOUT
+    while True:
+        job = _run_on_queue(_deployment_job(job_id))
+        if (job['status'] == 'completed' and job['admin_notification'] is not None) or time.monotonic() >= deadline:
+            return job
+        time.sleep(DEPLOYMENT_POLL_INTERVAL)
+
+@notification_bp.route('/deployment_notifications/<job_id>', methods=['GET'])
+def get_deployment_notification(job_id):
+    """배포 알림 작업 상태 / 수신자별 결과 조회"""
+    job = _run_on_queue(_deployment_job(job_id))
+    if not job:
+        return jsonify({'error': 'Deployment notification job not found'}), 404
+    if job['status'] == 'completed' and job['admin_notification'] is None:
+        # 감시하던 프로세스가 재시작된 경우에도 관리자 메일은 한 번 발송
+        _run_on_queue(_enqueue_admin_summary(job))
+    return jsonify(job), 200
 
 @notification_bp.route('/test_email', methods=['POST'])
 def test_email():
@@ -3,22 +3,16 @@ from models.user import db, User
 from models.document import Project
 from models.project_permission import ProjectPermission, ProjectFolder, FolderPermission
 from routes.user import login_required, admin_required
+from utils.permissions import permission_resolver
+from utils.database import session_connection
 
 project_permission_bp = Blueprint('project_permission', __name__)
 
 def has_project_admin_permission(user_id, project_id):
     """프로젝트 관리자 권한 확인"""
-    user = User.query.get(user_id)
-    if user.role == 'admin':
-        return True
-    
-    permission = ProjectPermission.query.filter_by(
-        user_id=user_id,
-        project_id=project_id,
-        permission_type='admin'
-    ).first()
-    
-    return permission is not None
+    return permission_resolver.has_project_permission(
+        session_connection(db.session), user_id, project_id, 'admin'
+    )
 
 @project_permission_bp.route('/projects/<project_id>/permissions', methods=['GET'])
 @login_required
@@ -102,6 +96,7 @@ def grant_project_permission(project_id):
             )
             db.session.add(permission)
         
+        permission_resolver.invalidate(target_user.id, session_connection(db.session))
         db.session.commit()
         
         return jsonify({
@@ -140,6 +135,7 @@ def revoke_project_permission(project_id, permission_id):
             return jsonify({'error': '자신의 관리자 권한은 회수할 수 없습니다.'}), 400
         
         db.session.delete(permission)
+        permission_resolver.invalidate(permission.user_id, session_connection(db.session))
         db.session.commit()
         
         return jsonify({'message': '권한이 성공적으로 회수되었습니다.'}), 200
@@ -1,14 +1,13 @@
 from flask import Blueprint, request, jsonify, session
-import sqlite3
 from datetime import datetime
 from werkzeug.security import generate_password_hash
+from utils.permissions import permission_resolver
+from utils.database import get_connection
 
 simplified_user_bp = Blueprint('simplified_user', __name__)
 
 def get_db_connection():
-    conn = sqlite3.connect('database/app.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection()
 
 @simplified_user_bp.route('/api/users/simplified', methods=['GET'])
 def get_all_users():
@@ -95,6 +94,7 @@ def set_project_permissions(project_id):
                     datetime.now().isoformat()
                 ))
         
+        permission_resolver.invalidate(conn=conn)  # every user's access to this project may have changed
         conn.commit()
         conn.close()
         
@@ -269,27 +269,44 @@ def check_project_access(project_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     conn = get_db_connection()
-    current_user = conn.execute('SELECT role FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if current_user['role'] == 'admin':
-        # Admin has access to all projects
-        has_access = True
-        permission_type = 'admin'
-    else:
-        # Check if user has permission for this project
-        permission = conn.execute('''
-            SELECT permission_type FROM project_permissions 
-            WHERE project_id = ? AND user_id = ?
-        ''', (project_id, session['user_id'])).fetchone()
-        
-        has_access = permission is not None
-        permission_type = permission['permission_type'] if permission else None
-    
+    permission_map = permission_resolver.get_map(conn, session['user_id'])
     conn.close()
     
+    permission_type = permission_map.permission_type(project_id)
+    
     return jsonify({
-        'has_access': has_access,
+        'has_access': permission_type is not None,
         'permission_type': permission_type,
-        'user_role': current_user['role']
+        'user_role': permission_map.role
     })
 
+@simplified_user_bp.route('/api/users/check-project-access', methods=['POST'])
+def check_projects_access():
+    """Check the current user's access to many projects and folders in one call
+    
+    Body: {"project_ids": [...], "folder_ids": [...], "permission_type": "read"}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    permission_type = data.get('permission_type', 'read')
+    if not isinstance(data.get('project_ids', []), list) or not isinstance(data.get('folder_ids', []), list):
+        return jsonify({'error': 'project_ids and folder_ids must be lists'}), 400
+    
+    conn = get_db_connection()
+    try:
+        permission_map = permission_resolver.get_map(conn, session['user_id'])
+        folders = permission_resolver.check_folders(
+            conn, session['user_id'], data.get('folder_ids', []), permission_type
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'user_role': permission_map.role,
+        'projects': permission_map.check_projects(data.get('project_ids', []), permission_type),
+        'folders': {str(folder_id): allowed for folder_id, allowed in folders.items()}
+    })
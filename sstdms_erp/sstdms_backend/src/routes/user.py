@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from models.user import db, User
 from functools import wraps
+from utils.permissions import permission_resolver
+from utils.database import session_connection
 
 user_bp = Blueprint('user', __name__)
 
@@ -192,6 +194,7 @@ def update_user(user_id):
         if 'password' in data and data['password']:
             user.set_password(data['password'])
         
+        permission_resolver.invalidate(user_id, session_connection(db.session))  # 역할이 바뀌었을 수 있음
         db.session.commit()
         
         return jsonify({
@@ -215,6 +218,7 @@ def delete_user(user_id):
             return jsonify({'error': '관리자 계정은 삭제할 수 없습니다.'}), 400
         
         db.session.delete(user)
+        permission_resolver.invalidate(user_id, session_connection(db.session))
         db.session.commit()
         
         return jsonify({'message': '사용자가 성공적으로 삭제되었습니다.'}), 200
@@ -0,0 +1,234 @@
+import os
+import queue
+import atexit
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from utils.database import get_connection, release_thread_connections
+
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv('AUDIT_LOG_QUEUE_SIZE', '10000'))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '500'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '0.5'))  # 초, 묶음을 모으는 최대 대기
+
+INSERT_ACCESS_LOG_SQL = '''
+    INSERT INTO file_access_logs
+    (file_id, user_id, action, ip_address, user_agent, success, error_message, accessed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 사용자/작업/기간 조회용 (audit_log 의 idx_audit_log_user_action_date 와 같은 구성)
+ACCESS_LOG_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_file_access_logs_user_action_date
+    ON file_access_logs(user_id, action, accessed_at)
+'''
+
+class _Marker:
+    """큐에 넣는 flush / 종료 요청 (앞선 기록이 모두 커밋되면 done 설정)"""
+    
+    def __init__(self, stop=False):
+        self.stop = stop
+        self.done = threading.Event()
+
+class AuditLogWriter:
+    """file_access_logs 비동기 일괄 기록기
+    
+    요청 스레드는 행을 메모리 큐에 넣기만 하고, 백그라운드 스레드가 최대
+    batch_size 행 또는 flush_interval 초 동안 모은 행을 한 트랜잭션으로 기록합니다.
+    큐가 가득 차면 기록을 버리지 않고 호출 스레드에서 바로 기록하며, 프로세스
+    종료 시 남은 행을 모두 기록합니다.
+    """
+    
+    def __init__(self, db_path=None, max_queue=AUDIT_LOG_QUEUE_SIZE, batch_size=AUDIT_LOG_BATCH_SIZE,
+                 flush_interval=AUDIT_LOG_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._index_ready = False
+        self.stats = {'written': 0, 'batches': 0, 'overflow': 0, 'failed': 0}
+    
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+    
+    def log(self, file_id, user_id, action, ip_address=None, user_agent=None, success=True, error_message=None):
+        """접근 기록 추가 (시각은 호출 시점, 기록은 백그라운드에서)"""
+        row = (file_id, user_id, action, ip_address, user_agent, success, error_message,
+               datetime.now().isoformat())
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats['overflow'] += 1
+            self._write([row])
+    
+    def flush(self, timeout=None):
+        """지금까지 넣은 기록이 커밋될 때까지 대기 -> 완료 여부"""
+        if not (self._thread and self._thread.is_alive()):
+            self._drain()
+            return True
+        marker = _Marker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+    
+    def stop(self, timeout=None):
+        """남은 기록을 모두 쓰고 백그라운드 스레드 종료"""
+        thread = self._thread
+        if thread and thread.is_alive():
+            marker = _Marker(stop=True)
+            self._queue.put(marker)
+            thread.join(timeout)
+        self._drain()
+    
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Marker):
+                item.done.set()
+            else:
+                rows.append(item)
+        for start in range(0, len(rows), self.batch_size):
+            self._write(rows[start:start + self.batch_size])
+    
+    def _run(self):
+        try:
+            while True:
+                batch, markers = [], []
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if isinstance(item, _Marker):
+                        markers.append(item)
+                        break  # flush / 종료 요청은 모은 만큼 바로 기록
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                
+                if batch:
+                    self._write(batch)
+                for marker in markers:
+                    marker.done.set()
+                if any(marker.stop for marker in markers):
+                    return
+        finally:
+            release_thread_connections(self.db_path)
+    
+    def _write(self, rows):
+        conn = get_connection(self.db_path)
+        try:
+            if not self._index_ready:
+                ensure_access_log_index(conn)
+                self._index_ready = True
+            conn.executemany(INSERT_ACCESS_LOG_SQL, rows)
+            conn.commit()
+            self.stats['written'] += len(rows)
+            self.stats['batches'] += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.stats['failed'] += len(rows)
+            print(f"Audit log write failed ({len(rows)} rows): {e}")
+        finally:
+            conn.close()
+
+def ensure_access_log_index(conn):
+    try:
+        conn.execute(ACCESS_LOG_INDEX_SQL)
+    except sqlite3.OperationalError:
+        pass  # file_access_logs 테이블이 아직 없음
+
+def access_log_filters(user_id=None, action=None, file_id=None, date_from=None, date_until=None):
+    """접근 기록 조회 조건 -> (조건 목록, params)
+    
+    accessed_at 은 기록기가 항상 ISO 형식으로 저장하므로 함수 없이 비교해
+    (user_id, action, accessed_at) 인덱스 범위 조회가 되도록 합니다.
+    """
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append('l.user_id = ?')
+        params.append(user_id)
+    if action:
+        clauses.append('l.action = ?')
+        params.append(action)
+    if file_id is not None:
+        clauses.append('l.file_id = ?')
+        params.append(file_id)
+    if date_from:
+        clauses.append('l.accessed_at >= ?')
+        params.append(date_from.isoformat())
+    if date_until:
+        clauses.append('l.accessed_at < ?')
+        params.append(date_until.isoformat())
+    return clauses, params
+
+def access_log_summary(conn, user_id=None, date_from=None, date_until=None):
+    """작업별 접근 횟수 / 실패 횟수 / 마지막 시각"""
+    clauses, params = access_log_filters(user_id, date_from=date_from, date_until=date_until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = conn.execute(f'''
+        SELECT l.action, COUNT(*), SUM(CASE WHEN l.success THEN 0 ELSE 1 END), MAX(l.accessed_at)
+        FROM file_access_logs l
+        {where}
+        GROUP BY l.action
+        ORDER BY COUNT(*) DESC
+    ''', params).fetchall()
+    return [
+        {'action': row[0], 'count': row[1], 'failed': row[2], 'last_accessed_at': row[3]}
+        for row in rows
+    ]
+
+def benchmark_audit_log(db_path, events=20000, threads=8):
+    """요청 스레드 기준 기록 비용 비교 (행마다 커밋 vs 비동기 일괄 기록)"""
+    def run(log):
+        def worker(count):
+            for i in range(count):
+                log(i, 1, 'download', '127.0.0.1', 'benchmark')
+        workers = [threading.Thread(target=worker, args=(events // threads,)) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started
+    
+    def log_sync(*args):
+        conn = get_connection(db_path)
+        try:
+            conn.execute(INSERT_ACCESS_LOG_SQL, args + (True, None, datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    writer = AuditLogWriter(db_path)
+    sync_seconds = run(log_sync)
+    async_seconds = run(writer.log)
+    flush_started = time.perf_counter()
+    writer.stop()
+    return {
+        'events': events,
+        'sync_seconds': round(sync_seconds, 3),
+        'async_enqueue_seconds': round(async_seconds, 3),
+        'async_flush_seconds': round(time.perf_counter() - flush_started, 3),
+        'batches': writer.stats['batches'],
+        'overflow': writer.stats['overflow']
+    }
+
+if __name__ == '__main__':
+    import sys
+    print(benchmark_audit_log(sys.argv[1] if len(sys.argv) > 1 else 'database/app.db'))
@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+BLOB_DIR_NAME = '.blobs'
+STREAM_BLOCK_SIZE = 1024 * 1024
+BLOB_MODE = 0o444  # blob 과 하드 링크는 읽기 전용
+GC_GRACE_SECONDS = 3600  # 참조 0 이 된 blob 을 지우기 전 대기 시간 (동시 업로드 보호)
+
+# 시작 시 storage_usage.ensure_usage_tables 가 생성 (마이그레이션 006 에도 포함)
+BLOB_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS file_blobs (
+        blob_path TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        size BIGINT NOT NULL,
+        ref_count INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT,
+        updated_at TEXT
+    )
+'''
+
+class BlobStore:
+    """SHA-256 내용 주소 기반 파일 저장소 (참조 카운트)
+    
+    파일은 <root>/ab/cd/<sha256>[suffix] 에 한 번만 저장되고, 문서 테이블의
+    file_path 는 이 blob 경로를 가리킵니다. 같은 내용을 다시 올리면 기존 blob 을
+    재사용하므로 디스크를 추가로 쓰지 않습니다. 참조 수는 file_blobs 테이블에
+    두며, 호출자의 DB 연결로 갱신하므로 문서 행과 같은 트랜잭션으로 커밋됩니다.
+    blob 은 불변이므로 백업은 복사 대신 하드 링크로 만듭니다. 하드 링크는 blob 과
+    같은 inode 이므로 blob 을 읽기 전용으로 두어, 수정하려면 파일을 교체하게 합니다.
+    """
+    
+    def __init__(self, root):
+        self.root = Path(root)
+        self.staging_dir = self.root / 'tmp'
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+    
+    def blob_path(self, digest, suffix=''):
+        """내용 해시의 blob 경로 (앞 4자리로 두 단계 디렉터리 분산)"""
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+    
+    def staging_path(self, name='upload.part'):
+        """blob 과 같은 파일시스템의 임시 경로 (확장자 유지, commit_staged 로 옮김)"""
+        return self.staging_dir / f"{uuid.uuid4().hex}_{name}"
+    
+    def commit_staged(self, staged_path, digest, suffix=''):
+        """임시 파일을 blob 으로 등록 -> (blob_path, created)
+        
+        같은 blob 이 이미 있으면 임시 파일을 버리고 기존 blob 을 사용합니다.
+        """
+        target = self.blob_path(digest, suffix)
+        if target.exists():
+            os.remove(staged_path)
+            os.utime(target)  # GC 유예 시간 갱신
+            return target, False
+        
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged_path, target)
+        os.chmod(target, BLOB_MODE)  # 링크를 통한 제자리 수정 방지
+        return target, True
+    
+    def put_stream(self, source, suffix=''):
+        """스트림을 해시하며 저장 -> (blob_path, sha256, size, created)"""
+        staged_path = self.staging_path()
+        hash_sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with open(staged_path, 'wb') as output:
+                for block in iter(lambda: source.read(STREAM_BLOCK_SIZE), b''):
+                    hash_sha256.update(block)
+                    output.write(block)
+                    size += len(block)
+        except Exception:
+            if staged_path.exists():
+                os.remove(staged_path)
+            raise
+        
+        digest = hash_sha256.hexdigest()
+        path, created = self.commit_staged(staged_path, digest, suffix)
+        return path, digest, size, created
+    
+    def link(self, blob_path, link_path):
+        """blob 을 다른 위치에 노출 (하드 링크, 지원하지 않는 파일시스템은 복사)"""
+        link_path = Path(link_path)
+        link_path.parent.mkdir(parents=True, exist_ok=True)
+        staged_link = link_path.with_name(f".{uuid.uuid4().hex}.link")
+        try:
+            os.link(blob_path, staged_link)
+        except OSError:
+            shutil.copy2(blob_path, staged_link)
+        os.replace(staged_link, link_path)  # 같은 이름이 있으면 교체
+        return link_path
+    
+    def cleanup_staging(self, max_age_hours=24):
+        """중단된 업로드가 남긴 오래된 임시 파일 삭제"""
+        cutoff = time.time() - max_age_hours * 3600
+        for staged_path in self.staging_dir.iterdir():
+            try:
+                if staged_path.is_file() and staged_path.stat().st_mtime < cutoff:
+                    staged_path.unlink()
+            except OSError:
+                pass
+    
+    def acquire(self, conn, blob_path, digest, size):
+        """blob 참조 추가 (커밋은 호출자가 수행)"""
+        now = datetime.now().isoformat()
+        conn.execute('''
+            INSERT INTO file_blobs (blob_path, sha256, size, ref_count, created_at, updated_at)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(blob_path) DO UPDATE SET
+                ref_count = file_blobs.ref_count + 1, updated_at = excluded.updated_at
+        ''', (str(blob_path), digest, size, now, now))
+    
+    def abandon(self, conn, blob_path, digest, size, links=()):
+        """실패한 업로드 정리: 만든 링크를 지우고 blob 을 GC 대상으로 등록
+        
+        참조 0 행만 추가하므로(이미 있으면 그대로) 그 사이 다른 업로드가 같은
+        blob 을 재사용해도 collect_unreferenced_blobs 가 유예 시간 뒤 참조 수를
+        확인하고 지웁니다.
+        """
+        for link_path in links:
+            try:
+                os.remove(link_path)
+            except FileNotFoundError:
+                pass
+        
+        now = datetime.now().isoformat()
+        conn.execute('''
+            INSERT INTO file_blobs (blob_path, sha256, size, ref_count, created_at, updated_at)
+            VALUES (?, ?, ?, 0, ?, ?)
+            ON CONFLICT(blob_path) DO NOTHING
+        ''', (str(blob_path), digest, size, now, now))
+        conn.commit()
+    
+    def release(self, conn, blob_path):
+        """blob 참조 해제 (커밋은 호출자가 수행, 파일은 collect_unreferenced_blobs 가 삭제)"""
+        conn.execute('''
+            UPDATE file_blobs SET ref_count = ref_count - 1, updated_at = ?
+            WHERE blob_path = ? AND ref_count > 0
+        ''', (datetime.now().isoformat(), str(blob_path)))
+
+def collect_unreferenced_blobs(conn, grace_seconds=GC_GRACE_SECONDS):
+    """참조가 없는 blob 삭제 (유예 시간 안에 재사용된 blob 은 유지) -> 삭제 개수
+    
+    중복 업로드는 기존 blob 의 수정 시각을 갱신한 뒤 참조를 추가하므로, 수정 시각이
+    유예 시간보다 오래된 blob 만 지웁니다.
+    """
+    cutoff = time.time() - grace_seconds
+    rows = conn.execute('SELECT blob_path FROM file_blobs WHERE ref_count <= 0').fetchall()
+    
+    removed = 0
+    for (blob_path,) in rows:
+        try:
+            if os.path.getmtime(blob_path) >= cutoff:
+                continue
+        except FileNotFoundError:
+            pass
+        
+        deleted = conn.execute(
+            'DELETE FROM file_blobs WHERE blob_path = ? AND ref_count <= 0', (blob_path,)
+        ).rowcount
+        conn.commit()
+        if deleted and os.path.exists(blob_path):
+            os.remove(blob_path)
+            removed += 1
+    return removed
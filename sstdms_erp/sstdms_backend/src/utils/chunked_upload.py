@@ -0,0 +1,301 @@
+import os
+import re
+import json
+import math
+import uuid
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024    # 8MB
+MIN_CHUNK_SIZE = 256 * 1024             # 256KB
+MAX_CHUNK_SIZE = 64 * 1024 * 1024       # MAX_CONTENT_LENGTH(100MB) 보다 작게 유지
+STREAM_BLOCK_SIZE = 1024 * 1024         # 요청 본문을 읽는 단위
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024 * 1024  # 20GB
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+class UploadError(Exception):
+    """청크 업로드 오류 (HTTP 상태 코드 포함)"""
+    
+    def __init__(self, message, status_code=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or {}
+    
+    def to_dict(self):
+        return {'error': self.message, **self.details}
+
+class ChunkedUploadManager:
+    """재개 가능한 청크 업로드 (init / put-chunk / complete)
+    
+    업로드 세션마다 전체 크기로 미리 할당한 data.part 파일을 두고, 각 청크는
+    자기 오프셋에 바로 기록되므로 여러 청크를 동시에 올릴 수 있습니다.
+    청크의 SHA-256 은 수신하면서 계산해 chunks/<index> 에 기록하며, 이 파일이
+    있는 청크만 완료된 것으로 봅니다. 순서대로 도착한 청크는 전체 파일 해시에도
+    바로 반영되어 complete 시 파일을 다시 읽지 않습니다.
+    세션 상태는 디스크에 있으므로 연결이 끊기거나 서버가 재시작되어도 이어서 올릴 수 있습니다.
+    """
+    
+    def __init__(self, base_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.base_path = Path(base_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        # upload_id -> {'hasher', 'next_index', 'busy'} (프로세스 내 전체 파일 해시 진행 상태)
+        self._file_hashes = {}
+    
+    def _session_dir(self, upload_id):
+        if not upload_id or not _UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadError('Invalid upload id', 400)
+        return self.base_path / upload_id
+    
+    def _load_manifest(self, upload_id, user_id=None):
+        manifest_path = self._session_dir(upload_id) / 'manifest.json'
+        if not manifest_path.exists():
+            raise UploadError('Upload session not found', 404)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if user_id is not None and manifest['user_id'] != user_id:
+            raise UploadError('Upload session belongs to another user', 403)
+        return manifest
+    
+    def _chunk_length(self, manifest, index):
+        if index == manifest['chunk_count'] - 1:
+            return manifest['total_size'] - index * manifest['chunk_size']
+        return manifest['chunk_size']
+    
+    def _received_chunks(self, upload_id):
+        chunk_dir = self._session_dir(upload_id) / 'chunks'
+        if not chunk_dir.exists():
+            return set()
+        return {int(name) for name in os.listdir(chunk_dir) if name.isdigit()}
+    
+    def init_upload(self, filename, total_size, user_id, chunk_size=None, metadata=None):
+        """업로드 세션 생성"""
+        try:
+            total_size = int(total_size)
+        except (TypeError, ValueError):
+            raise UploadError('File size required', 400)
+        if total_size < 0 or total_size > MAX_UPLOAD_SIZE:
+            raise UploadError('Invalid file size', 400)
+        
+        chunk_size = int(chunk_size or self.chunk_size)
+        chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        
+        upload_id = uuid.uuid4().hex
+        session_dir = self._session_dir(upload_id)
+        (session_dir / 'chunks').mkdir(parents=True)
+        
+        # 전체 크기로 미리 할당 (청크는 각자의 오프셋에 기록)
+        with open(session_dir / 'data.part', 'wb') as f:
+            f.truncate(total_size)
+        
+        manifest = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_size': total_size,
+            'chunk_size': chunk_size,
+            'chunk_count': max(1, math.ceil(total_size / chunk_size)),
+            'user_id': user_id,
+            'metadata': metadata or {},
+            'created_at': datetime.now().isoformat()
+        }
+        with open(session_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        
+        with self._lock:
+            self._file_hashes[upload_id] = {'hasher': hashlib.sha256(), 'next_index': 0, 'busy': False}
+        
+        return self.get_status(upload_id)
+    
+    def get_status(self, upload_id, user_id=None):
+        """세션 상태 (재개 시 누락된 청크 확인용)"""
+        manifest = self._load_manifest(upload_id, user_id)
+        received = self._received_chunks(upload_id)
+        missing = [index for index in range(manifest['chunk_count']) if index not in received]
+        return {
+            'upload_id': upload_id,
+            'filename': manifest['filename'],
+            'total_size': manifest['total_size'],
+            'chunk_size': manifest['chunk_size'],
+            'chunk_count': manifest['chunk_count'],
+            'received_chunks': sorted(received),
+            'missing_chunks': missing,
+            'metadata': manifest['metadata'],
+            'created_at': manifest['created_at']
+        }
+    
+    def _claim_file_hash(self, upload_id, index):
+        """이 청크가 전체 파일 해시의 다음 순서이면 스트리밍 중 해시를 갱신하도록 점유"""
+        with self._lock:
+            state = self._file_hashes.get(upload_id)
+            if state and not state['busy'] and state['next_index'] == index:
+                state['busy'] = True
+                return state
+        return None
+    
+    def _advance_file_hash(self, upload_id, manifest, received=None):
+        """이미 디스크에 있는 다음 순서 청크들을 전체 파일 해시에 반영"""
+        with self._lock:
+            state = self._file_hashes.get(upload_id)
+            if not state or state['busy']:
+                return
+            state['busy'] = True
+        
+        try:
+            received = received if received is not None else self._received_chunks(upload_id)
+            data_path = self._session_dir(upload_id) / 'data.part'
+            with open(data_path, 'rb') as f:
+                while True:
+                    index = state['next_index']
+                    if index >= manifest['chunk_count']:
+                        break
+                    if index not in received:
+                        # 처리 중 새로 도착한 청크 확인
+                        received = self._received_chunks(upload_id)
+                        if index not in received:
+                            break
+                    f.seek(index * manifest['chunk_size'])
+                    remaining = self._chunk_length(manifest, index)
+                    while remaining:
+                        block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                        if not block:
+                            raise IOError('Unexpected end of upload data')
+                        state['hasher'].update(block)
+                        remaining -= len(block)
+                    state['next_index'] += 1
+        except Exception:
+            with self._lock:
+                self._file_hashes.pop(upload_id, None)
+            raise
+        finally:
+            with self._lock:
+                state['busy'] = False
+    
+    def write_chunk(self, upload_id, index, stream, user_id=None, expected_sha256=None):
+        """청크 하나를 스트림에서 읽어 자기 오프셋에 기록"""
+        manifest = self._load_manifest(upload_id, user_id)
+        if index < 0 or index >= manifest['chunk_count']:
+            raise UploadError('Chunk index out of range', 400)
+        if expected_sha256:
+            expected_sha256 = expected_sha256.strip().lower()
+            if not _SHA256_PATTERN.match(expected_sha256):
+                raise UploadError('Invalid chunk checksum', 400)
+        
+        expected_length = self._chunk_length(manifest, index)
+        chunk_hasher = hashlib.sha256()
+        file_hash = self._claim_file_hash(upload_id, index)
+        written = 0
+        
+        try:
+            data_path = self._session_dir(upload_id) / 'data.part'
+            with open(data_path, 'r+b') as f:
+                f.seek(index * manifest['chunk_size'])
+                while True:
+                    block = stream.read(STREAM_BLOCK_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > expected_length:
+                        raise UploadError('Chunk is larger than expected', 400,
+                                          {'expected_size': expected_length})
+                    f.write(block)
+                    chunk_hasher.update(block)
+                    if file_hash:
+                        file_hash['hasher'].update(block)
+            
+            if written != expected_length:
+                raise UploadError('Incomplete chunk', 400,
+                                  {'expected_size': expected_length, 'received_size': written})
+            
+            chunk_sha256 = chunk_hasher.hexdigest()
+            if expected_sha256 and chunk_sha256 != expected_sha256:
+                raise UploadError('Chunk checksum mismatch', 422, {'sha256': chunk_sha256})
+            
+            # 완료 표시는 원자적으로 기록 (표시 파일이 있는 청크만 수신 완료)
+            marker = self._session_dir(upload_id) / 'chunks' / str(index)
+            if not file_hash and marker.exists() and marker.read_text() != chunk_sha256:
+                # 이미 해시에 반영된 청크가 다른 내용으로 다시 올라옴
+                with self._lock:
+                    self._file_hashes.pop(upload_id, None)
+            temp_marker = marker.with_name(f'{index}.{uuid.uuid4().hex}.tmp')
+            with open(temp_marker, 'w') as f:
+                f.write(chunk_sha256)
+            os.replace(temp_marker, marker)
+        except Exception:
+            if file_hash:
+                # 부분적으로 반영된 해시는 되돌릴 수 없으므로 complete 시 다시 계산
+                with self._lock:
+                    self._file_hashes.pop(upload_id, None)
+            raise
+        
+        if file_hash:
+            with self._lock:
+                file_hash['next_index'] = index + 1
+                file_hash['busy'] = False
+        self._advance_file_hash(upload_id, manifest)
+        
+        return {'index': index, 'size': written, 'sha256': chunk_sha256}
+    
+    def complete_upload(self, upload_id, destination_path, user_id=None, expected_sha256=None):
+        """모든 청크 수신 확인 후 파일을 destination_path 로 이동"""
+        manifest = self._load_manifest(upload_id, user_id)
+        received = self._received_chunks(upload_id)
+        missing = [index for index in range(manifest['chunk_count']) if index not in received]
+        if missing:
+            raise UploadError('Upload is incomplete', 409, {'missing_chunks': missing})
+        
+        # 순서대로 받은 부분은 이미 해시됨, 나머지만 읽어서 반영 (재시작 후에는 처음부터)
+        with self._lock:
+            if upload_id not in self._file_hashes:
+                self._file_hashes[upload_id] = {'hasher': hashlib.sha256(), 'next_index': 0, 'busy': False}
+        self._advance_file_hash(upload_id, manifest, received)
+        with self._lock:
+            state = self._file_hashes.get(upload_id)
+        if not state or state['next_index'] < manifest['chunk_count']:
+            raise UploadError('Upload is still being processed', 409)
+        file_sha256 = state['hasher'].hexdigest()
+        
+        if expected_sha256 and file_sha256 != expected_sha256.strip().lower():
+            raise UploadError('File checksum mismatch', 422, {'sha256': file_sha256})
+        
+        destination_path = Path(destination_path)
+        destination_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(self._session_dir(upload_id) / 'data.part'), str(destination_path))
+        self.abort_upload(upload_id)
+        
+        return {
+            'path': str(destination_path),
+            'filename': manifest['filename'],
+            'size': manifest['total_size'],
+            'sha256': file_sha256,
+            'metadata': manifest['metadata']
+        }
+    
+    def abort_upload(self, upload_id, user_id=None):
+        """세션과 임시 데이터 삭제"""
+        if user_id is not None:
+            self._load_manifest(upload_id, user_id)
+        with self._lock:
+            self._file_hashes.pop(upload_id, None)
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+    
+    def cleanup_expired(self, max_age_hours=24):
+        """오래된 미완료 세션 정리 (마지막 청크 수신 시각 기준)"""
+        cutoff_time = datetime.now().timestamp() - (max_age_hours * 3600)
+        removed = 0
+        for session_dir in self.base_path.iterdir():
+            if not session_dir.is_dir() or not _UPLOAD_ID_PATTERN.match(session_dir.name):
+                continue
+            try:
+                if (session_dir / 'data.part').stat().st_mtime < cutoff_time:
+                    self.abort_upload(session_dir.name)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
@@ -1,15 +1,56 @@
+import os
+import atexit
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '4'))  # 동시에 열어 둘 SMTP 세션 수 (= 일괄 발송 동시성)
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))  # 서버의 세션당 발송 제한 대비
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '60'))  # 초, 서버가 끊기 전에 유휴 세션 정리
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', '1') == '1'
+
+class _Session:
+    """풀에 보관하는 로그인된 SMTP 세션"""
+
+    __slots__ = ('smtp', 'sent', 'last_used')
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
 class EmailSender:
-    def __init__(self, smtp_server, smtp_port, smtp_user, smtp_password):
+    """SMTP 이메일 발송기 (로그인된 세션을 풀에 두고 재사용)
+
+    메일마다 연결 / STARTTLS / 로그인을 반복하지 않고, 최대 pool_size 개의
+    세션을 열어 두고 여러 통을 보냅니다. 세션은 max_messages_per_connection 통을
+    보냈거나 idle_timeout 초 동안 쓰이지 않으면 새로 엽니다. 재사용한 세션이
+    서버에서 끊겨 있었으면 새 세션으로 한 번 더 보냅니다.
+    """
+
+    def __init__(self, smtp_server, smtp_port, smtp_user, smtp_password, pool_size=SMTP_POOL_SIZE,
+                 use_tls=SMTP_USE_TLS, max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 idle_timeout=SMTP_IDLE_TIMEOUT, timeout=SMTP_TIMEOUT):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.smtp_user = smtp_user
         self.smtp_password = smtp_password
+        self.pool_size = pool_size
+        self.use_tls = use_tls
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # 마지막에 쓴 세션부터 재사용 (LIFO)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._executor = None
+        self.stats = {'connections': 0, 'reconnects': 0, 'sent': 0, 'failed': 0}
 
-    def send_email(self, sender_email, receiver_email, subject, body, is_html=False):
+    def _build_message(self, sender_email, receiver_email, subject, body, is_html=False):
         msg = MIMEMultipart()
         msg["From"] = sender_email
         msg["To"] = receiver_email
@@ -19,15 +60,130 @@ class EmailSender:
             msg.attach(MIMEText(body, "html", "utf-8"))
         else:
             msg.attach(MIMEText(body, "plain", "utf-8"))
+        return msg
+
+    def send_email(self, sender_email, receiver_email, subject, body, is_html=False):
+        success, message, _ = self._deliver(self._build_message(sender_email, receiver_email, subject, body, is_html))
+        return success, message
+
+    def send_batch(self, sender_email, messages):
+        """여러 통을 풀의 세션들로 동시에 발송 -> 수신자별 결과 목록 (입력 순서)
 
+        messages 는 receiver_email, subject, body, is_html(선택) 키를 가진 dict 목록입니다.
+        결과의 permanent 는 수신자 거부 등 다시 보내도 실패할 5xx 응답인지 여부입니다.
+        """
+        def send(item):
+            msg = self._build_message(sender_email, item['receiver_email'], item['subject'], item['body'],
+                                      item.get('is_html', False))
+            success, message, permanent = self._deliver(msg)
+            return {'email': item['receiver_email'], 'success': success, 'message': message, 'permanent': permanent}
+
+        return list(self._get_executor().map(send, messages))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix='smtp-sender')
+                atexit.register(self.close)
+            return self._executor
+
+    def _deliver(self, msg):
+        """풀의 세션으로 한 통 발송 -> (성공 여부, 메시지, 영구 실패 여부)"""
+        with self._slots:
+            try:
+                session, reused = self._checkout()
+                while True:
+                    try:
+                        session.smtp.send_message(msg)
+                        break
+                    except (smtplib.SMTPServerDisconnected, ConnectionError):
+                        self._discard(session)
+                        if not reused:
+                            raise
+                        # 유휴 중 서버가 끊은 세션: 새 세션으로 한 번 더
+                        self.stats['reconnects'] += 1
+                        session, reused = self._connect(), False
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                        # 서버가 거부한 메일 (sendmail 이 RSET 하므로 421 이 아니면 세션은 계속 사용)
+                        if getattr(e, 'smtp_code', None) == 421:
+                            self._discard(session)
+                        else:
+                            self._checkin(session)
+                        raise
+                    except Exception:
+                        self._discard(session)
+                        raise
+                session.sent += 1
+                self._checkin(session)
+                self.stats['sent'] += 1
+                return True, "Email sent successfully!", False
+            except Exception as e:
+                self.stats['failed'] += 1
+                return False, f"Failed to send email: {e}", _is_permanent(e)
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.smtp_user and self.smtp_password:
+                smtp.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            smtp.close()
+            raise
+        self.stats['connections'] += 1
+        return _Session(smtp)
+
+    def _checkout(self):
+        """유휴 세션 (없거나 오래됐으면 새 연결) -> (세션, 재사용 여부)"""
+        expired = []
+        session = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if time.monotonic() - candidate.last_used < self.idle_timeout:
+                    session = candidate
+                    break
+                expired.append(candidate)
+        for stale in expired:
+            self._discard(stale)
+        if session:
+            return session, True
+        return self._connect(), False
+
+    def _checkin(self, session):
+        if session.sent >= self.max_messages_per_connection:
+            self._discard(session, quit=True)
+            return
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(session)
+
+    def _discard(self, session, quit=False):
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            return True, "Email sent successfully!"
-        except Exception as e:
-            return False, f"Failed to send email: {e}"
+            if quit:
+                session.smtp.quit()
+            else:
+                session.smtp.close()
+        except Exception:
+            session.smtp.close()
+
+    def close(self):
+        """발송 스레드 정리 후 유휴 세션 종료 (QUIT)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._discard(session, quit=True)
+
+def _is_permanent(error):
+    # 5xx 응답은 다시 보내도 같은 결과 (수신자 없음 등), 연결 오류 / 4xx 는 일시적
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
 
 # Example Usage (for testing purposes, replace with actual credentials)
 if __name__ == "__main__":
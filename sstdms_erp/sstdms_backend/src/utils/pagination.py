@@ -0,0 +1,192 @@
+import json
+import base64
+from datetime import datetime, date, timedelta
+from flask import Response, current_app, stream_with_context
+from utils.database import sql_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500  # 페이지 없이 전체를 요청해도 이 단위로 나눠 조회
+
+class PaginationError(ValueError):
+    """잘못된 목록 조회 파라미터 (400)"""
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise PaginationError('Invalid cursor')
+    return value
+
+def encode_cursor(sort_value, row_id):
+    """마지막 행의 (정렬 값, id) -> URL 에 넣을 수 있는 커서 문자열"""
+    raw = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    return _decode_value(sort_value), row_id
+
+class PageRequest:
+    """목록 API 공통 파라미터 (limit, cursor, sort, order, date_from, date_to)
+    
+    limit 이나 cursor 가 있으면 페이지 단위로, 없으면 기존처럼 전체 목록을
+    반환합니다 (어느 쪽이든 STREAM_BATCH_SIZE 단위 keyset 조회로 스트리밍).
+    """
+    
+    def __init__(self, args, sort_fields, default_sort, default_order='desc'):
+        self.sort = args.get('sort', default_sort)
+        if self.sort not in sort_fields:
+            raise PaginationError(f"Invalid sort field: {self.sort} (allowed: {', '.join(sort_fields)})")
+        self.order = args.get('order', default_order).lower()
+        if self.order not in ('asc', 'desc'):
+            raise PaginationError('order must be asc or desc')
+        
+        try:
+            limit = args.get('limit', type=int) if 'limit' in args else None
+        except (TypeError, ValueError):
+            limit = None
+        if 'limit' in args and limit is None:
+            raise PaginationError('limit must be an integer')
+        
+        self.paginated = limit is not None or bool(args.get('cursor'))
+        self.limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        self.cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+        # date_from 이상, date_until 미만 (날짜만 주면 date_to 당일 포함)
+        self.date_from = _parse_date(args.get('date_from'), 'date_from')
+        self.date_until = _parse_date(args.get('date_to'), 'date_to', end=True)
+    
+    @property
+    def descending(self):
+        return self.order == 'desc'
+
+def _parse_date(value, name, end=False):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'{name} must be an ISO date (YYYY-MM-DD)')
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def date_range_sql(page, column):
+    """raw SQL 용 날짜 범위 조건 -> (조건 목록, params)
+    
+    TEXT 로 저장된 시각은 'T' / 공백 구분 형식이 섞여 있으므로 sql_datetime() 으로 맞춰 비교합니다.
+    """
+    clauses, params = [], []
+    if page.date_from:
+        clauses.append(f"{sql_datetime(column)} >= ?")
+        params.append(page.date_from.strftime('%Y-%m-%d %H:%M:%S'))
+    if page.date_until:
+        clauses.append(f"{sql_datetime(column)} < ?")
+        params.append(page.date_until.strftime('%Y-%m-%d %H:%M:%S'))
+    return clauses, params
+
+def keyset_sql(page, sort_expr, id_expr, cursor):
+    """raw SQL 용 keyset 조건/정렬 -> (where 절 또는 '', params, order by 절)"""
+    op = '<' if page.descending else '>'
+    direction = 'DESC' if page.descending else 'ASC'
+    order_by = f"{sort_expr} {direction}, {id_expr} {direction}"
+    if cursor is None:
+        return '', [], order_by
+    sort_value, row_id = cursor
+    where = f"({sort_expr} {op} ? OR ({sort_expr} = ? AND {id_expr} {op} ?))"
+    return where, [sort_value, sort_value, row_id], order_by
+
+def keyset_query(query, page, sort_expr, id_column, cursor):
+    """SQLAlchemy 쿼리에 keyset 조건/정렬 적용"""
+    from sqlalchemy import and_, or_
+    
+    if cursor is not None:
+        sort_value, row_id = cursor
+        if page.descending:
+            query = query.filter(or_(sort_expr < sort_value, and_(sort_expr == sort_value, id_column < row_id)))
+        else:
+            query = query.filter(or_(sort_expr > sort_value, and_(sort_expr == sort_value, id_column > row_id)))
+    if page.descending:
+        return query.order_by(sort_expr.desc(), id_column.desc())
+    return query.order_by(sort_expr.asc(), id_column.asc())
+
+def stream_listing(page, fetch_batch, cursor_of, serialize, key=None, envelope=None, count_key=None,
+                   on_close=None):
+    """목록을 JSON 으로 스트리밍
+    
+    fetch_batch(cursor, n) 는 정렬 순서로 cursor 다음 행을 최대 n 개 반환하고,
+    cursor_of(row) 는 그 행의 (정렬 값, id) 를 반환합니다. 페이지 요청이면 한 행을
+    더 읽어 다음 페이지 여부를 판단하고, 배열 뒤에 next_cursor / has_more 를 씁니다.
+    key 가 없으면 (페이지 없는 기존 형식) 배열만 반환합니다. count_key 를 주면 전체
+    목록 요청일 때 그 이름으로 행 수를 덧붙입니다 (기존 'total' 필드 호환).
+    
+    첫 묶음은 호출 시점에 조회하므로 쿼리 오류는 라우트의 예외 처리로 전달됩니다.
+    응답이 끝나면 on_close 가 호출됩니다 (DB 연결/세션 정리).
+    """
+    dumps = current_app.json.dumps
+    state = {'cursor': page.cursor, 'remaining': page.limit if page.paginated else None,
+             'has_more': False, 'done': False}
+    
+    def next_batch():
+        remaining = state['remaining']
+        # 페이지의 마지막 묶음은 배치 크기를 넘더라도 한 행을 더 읽어 다음 페이지 여부 판단
+        size = remaining + 1 if remaining is not None and remaining <= STREAM_BATCH_SIZE else STREAM_BATCH_SIZE
+        rows = fetch_batch(state['cursor'], size)
+        if remaining is not None:
+            if len(rows) > remaining:
+                rows = rows[:remaining]
+                state['has_more'] = True
+            state['remaining'] = remaining - len(rows)
+        if rows:
+            state['cursor'] = cursor_of(rows[-1])
+        state['done'] = state['has_more'] or len(rows) < size or state['remaining'] == 0
+        return rows
+    
+    try:
+        rows = next_batch()
+    except Exception:
+        if on_close:
+            on_close()
+        raise
+    
+    def generate():
+        try:
+            if key:
+                head = dumps(envelope or {})[:-1]
+                yield f"{head}{', ' if len(head) > 1 else ''}\"{key}\": ["
+            else:
+                yield '['
+            
+            batch, count = rows, 0
+            while True:
+                for row in batch:
+                    yield (', ' if count else '') + dumps(serialize(row))
+                    count += 1
+                if state['done']:
+                    break
+                batch = next_batch()
+            
+            if key:
+                next_cursor = encode_cursor(*state['cursor']) if state['has_more'] else None
+                trailer = f", \"{count_key}\": {count}" if count_key and not page.paginated else ''
+                yield f"], \"next_cursor\": {dumps(next_cursor)}, \"has_more\": {dumps(state['has_more'])}{trailer}}}"
+            else:
+                yield ']'
+        finally:
+            if on_close:
+                on_close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from datetime import datetime
+from flask import g, has_app_context
+
+# 권한 단계 (높은 단계는 낮은 단계를 포함)
+PERMISSION_LEVELS = {
+    'read': 1,
+    'write': 2,
+    'delete': 3,
+    'full_access': 3,  # 간소화된 사용자 관리의 전체 접근 (권한 관리는 제외)
+    'admin': 4
+}
+
+PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', '60'))  # 초, 0 이면 요청 단위로만 캐시
+
+# 권한 버전 (models.project_permission.PermissionVersion, 한 행) - 부여/회수마다 증가
+PERMISSION_VERSION_SQL = 'SELECT version FROM permission_versions WHERE id = 1'
+BUMP_PERMISSION_VERSION_SQL = '''
+    INSERT INTO permission_versions (id, version, updated_at) VALUES (1, 1, ?)
+    ON CONFLICT (id) DO UPDATE SET version = permission_versions.version + 1, updated_at = excluded.updated_at
+'''
+
+def permission_level(permission_type):
+    return PERMISSION_LEVELS.get(permission_type, 0)
+
+def _rows(conn, sql, params):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+class PermissionMap:
+    """사용자 한 명의 전체 프로젝트 권한 (역할 + 프로젝트별 권한 유형)"""
+    
+    def __init__(self, user_id, role, projects, version=0):
+        self.user_id = user_id
+        self.role = role
+        self.projects = projects  # {project_id: permission_type}
+        self.version = version  # 읽기 전에 확인한 권한 버전
+        self.loaded_at = time.monotonic()
+    
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+    
+    def permission_type(self, project_id):
+        """프로젝트 권한 유형 (시스템 관리자는 'admin', 권한이 없으면 None)"""
+        if self.is_admin:
+            return 'admin'
+        return self.projects.get(project_id)
+    
+    def can(self, project_id, permission_type='read'):
+        return permission_level(self.permission_type(project_id)) >= permission_level(permission_type)
+    
+    def check_projects(self, project_ids, permission_type='read'):
+        """여러 프로젝트 권한 일괄 확인 -> {project_id: bool}"""
+        return {project_id: self.can(project_id, permission_type) for project_id in project_ids}
+    
+    def project_ids(self, permission_type='read'):
+        """권한이 있는 프로젝트 ID 목록 (시스템 관리자는 None = 전체)"""
+        if self.is_admin:
+            return None
+        required = permission_level(permission_type)
+        return [project_id for project_id, granted in self.projects.items()
+                if permission_level(granted) >= required]
+
+class PermissionResolver:
+    """프로젝트 권한 조회를 한곳에서 처리
+    
+    사용자 권한 전체를 두 번의 쿼리로 한 번에 읽어 요청 동안(flask.g) 재사용하고,
+    프로세스 캐시에 보관합니다. 권한을 부여/회수하는 라우트는 invalidate() 로 DB 의
+    권한 버전을 올리고, 각 워커는 요청마다 한 번 버전을 읽어 바뀌었으면 캐시를 비우므로
+    다른 워커/서버에도 다음 요청부터 바로 반영됩니다. PERMISSION_CACHE_TTL 은 버전을
+    올리지 않고 DB 를 직접 고친 경우를 위한 상한입니다. conn 은 DB-API 연결 (raw
+    sqlite3, PGConnection 또는 SQLAlchemy 세션의 연결) 입니다.
+    """
+    
+    def __init__(self, ttl=PERMISSION_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._version = None  # 캐시에 든 권한 맵의 버전
+    
+    def get_map(self, conn, user_id):
+        request_cache = self._request_cache()
+        if request_cache is not None and user_id in request_cache:
+            return request_cache[user_id]
+        
+        version = self._current_version(conn)
+        with self._lock:
+            if version != self._version:
+                # 다른 워커(또는 이 워커)에서 권한이 바뀜
+                self._cache.clear()
+                self._version = version
+            cached = self._cache.get(user_id)
+        if cached is None or time.monotonic() - cached.loaded_at >= self.ttl:
+            cached = self._load(conn, user_id, version)
+            with self._lock:
+                # 읽는 동안 버전이 바뀌었으면 캐시에 남기지 않음 (이번 요청에만 사용)
+                if self.ttl > 0 and version == self._version:
+                    self._cache[user_id] = cached
+        
+        if request_cache is not None:
+            request_cache[user_id] = cached
+        return cached
+    
+    def invalidate(self, user_id=None, conn=None):
+        """권한 부여/회수/역할 변경 시 호출 -> 모든 워커의 권한 캐시 무효화
+        
+        conn 을 주면 그 트랜잭션 안에서 권한 버전을 올리므로 (커밋은 호출자) 변경과
+        함께 커밋해야 합니다. 없으면 별도 연결로 바로 커밋합니다.
+        """
+        if conn is not None:
+            self._bump_version(conn)
+        else:
+            from utils.database import get_connection
+            own = get_connection()
+            try:
+                self._bump_version(own)
+                own.commit()
+            finally:
+                own.close()
+        
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+        request_cache = self._request_cache()
+        if request_cache is not None:
+            if user_id is None:
+                request_cache.clear()
+            else:
+                request_cache.pop(user_id, None)
+            g.pop('_permission_version', None)
+    
+    @staticmethod
+    def _bump_version(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(BUMP_PERMISSION_VERSION_SQL, (datetime.utcnow().isoformat(sep=' '),))
+        finally:
+            cursor.close()
+    
+    def _current_version(self, conn):
+        """DB 의 권한 버전 (요청당 한 번 조회)"""
+        if has_app_context() and '_permission_version' in g:
+            return g._permission_version
+        rows = _rows(conn, PERMISSION_VERSION_SQL, ())
+        version = rows[0][0] if rows else 0
+        if has_app_context():
+            g._permission_version = version
+        return version
+    
+    def has_project_permission(self, conn, user_id, project_id, permission_type='read'):
+        return self.get_map(conn, user_id).can(project_id, permission_type)
+    
+    def check_projects(self, conn, user_id, project_ids, permission_type='read'):
+        """프로젝트 목록 권한 일괄 확인 -> {project_id: bool}"""
+        return self.get_map(conn, user_id).check_projects(project_ids, permission_type)
+    
+    def check_folders(self, conn, user_id, folder_ids, permission_type='read'):
+        """폴더 목록 권한 일괄 확인 -> {folder_id: bool} (한 번의 쿼리)
+        
+        프로젝트 권한이 충분하면 허용하고, 아니면 폴더에 직접 부여된 권한을 봅니다.
+        """
+        try:
+            folder_ids = [int(folder_id) for folder_id in folder_ids]
+        except (TypeError, ValueError):
+            raise ValueError('folder_ids must be a list of integer folder IDs')
+        permission_map = self.get_map(conn, user_id)
+        result = {folder_id: False for folder_id in folder_ids}
+        if not folder_ids:
+            return result
+        
+        required = permission_level(permission_type)
+        for start in range(0, len(folder_ids), 500):  # SQL 변수 개수 제한 대비
+            chunk = folder_ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = _rows(conn, f'''
+                SELECT f.id, f.project_id, fp.permission_type
+                FROM project_folders f
+                LEFT JOIN folder_permissions fp ON fp.folder_id = f.id AND fp.user_id = ?
+                WHERE f.id IN ({placeholders})
+            ''', [user_id] + chunk)
+            for folder_id, project_id, folder_permission in rows:
+                result[folder_id] = (
+                    permission_map.can(project_id, permission_type)
+                    or permission_level(folder_permission) >= required
+                )
+        return result
+    
+    def _load(self, conn, user_id, version=0):
+        user = _rows(conn, 'SELECT role FROM users WHERE id = ?', (user_id,))
+        role = user[0][0] if user else None
+        projects = {}
+        if user and role != 'admin':
+            for project_id, permission_type in _rows(
+                conn, 'SELECT project_id, permission_type FROM project_permissions WHERE user_id = ?', (user_id,)
+            ):
+                projects[project_id] = permission_type
+        return PermissionMap(user_id, role, projects, version)
+    
+    @staticmethod
+    def _request_cache():
+        if not has_app_context():
+            return None
+        if not hasattr(g, '_permission_maps'):
+            g._permission_maps = {}
+        return g._permission_maps
+
+permission_resolver = PermissionResolver()
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+
+DB_PATH = os.getenv('SQLITE_DB_PATH', 'database/app.db')
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '30000'))  # 잠금 대기 시간 ("database is locked" 방지)
+CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))  # 연결당 페이지 캐시
+MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+MAX_IDLE_PER_THREAD = 4  # 스레드별로 보관할 유휴 연결 수
+
+def apply_pragmas(conn):
+    """WAL 저널 및 성능 PRAGMA 적용 (raw sqlite3 / SQLAlchemy 연결 공통)
+    
+    WAL 은 읽기와 쓰기가 서로 막지 않게 하고, synchronous=NORMAL 은 WAL 에서
+    커밋마다 fsync 하지 않아도 DB 가 손상되지 않습니다 (전원 장애 시 마지막 커밋만 유실 가능).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+        cursor.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    finally:
+        cursor.close()
+
+class PooledConnection(sqlite3.Connection):
+    """close() 하면 닫지 않고 풀로 돌려주는 연결
+    
+    기존 코드의 conn = get_db_connection() ... conn.close() 흐름을 그대로 쓸 수 있습니다.
+    커밋하지 않은 트랜잭션은 반환 시 롤백됩니다.
+    """
+    
+    _pool = None
+    _checked_out = False
+    
+    def close(self):
+        if self._pool is None:
+            super().close()
+        elif self._checked_out:
+            self._pool.release(self)
+        # 이미 반납된 연결의 중복 close() 는 무시
+    
+    def discard(self):
+        """풀에 돌려주지 않고 실제로 닫기"""
+        self._pool = None
+        super().close()
+
+class SQLitePool:
+    """스레드별 sqlite3 연결 재사용 풀
+    
+    sqlite3 연결은 만든 스레드에서만 쓸 수 있으므로 스레드마다 유휴 연결 스택을
+    둡니다. 한 요청에서 연결을 여러 번 빌려도 (중첩 포함) 서로 다른 연결을 받고,
+    반납된 연결은 같은 스레드의 다음 요청이 재사용합니다.
+    """
+    
+    def __init__(self, db_path=DB_PATH, max_idle=MAX_IDLE_PER_THREAD):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._local = threading.local()
+    
+    def connect(self):
+        idle = self._idle()
+        conn = idle.pop() if idle else self._open()
+        conn._checked_out = True
+        return conn
+    
+    def release(self, conn):
+        conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.discard()
+            return
+        
+        idle = self._idle()
+        if len(idle) >= self.max_idle:
+            conn.discard()
+        else:
+            idle.append(conn)
+    
+    def close_idle(self):
+        """현재 스레드의 유휴 연결 닫기 (백그라운드 스레드 종료 시)"""
+        idle = self._idle()
+        while idle:
+            idle.pop().discard()
+    
+    def _idle(self):
+        if not hasattr(self._local, 'idle'):
+            self._local.idle = []
+        return self._local.idle
+    
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, factory=PooledConnection)
+        conn._pool = self
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn)
+        return conn
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=DB_PATH):
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = SQLitePool(db_path)
+        return _pools[db_path]
+
+def get_connection(db_path=DB_PATH):
+    """풀에서 연결 빌리기 (row_factory=sqlite3.Row, 다 쓰면 close())"""
+    return get_pool(db_path).connect()
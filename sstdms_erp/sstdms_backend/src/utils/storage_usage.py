@@ -0,0 +1,270 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from utils.blob_store import BLOB_TABLE_SQL
+from utils.database import get_connection, begin_write, release_thread_connections
+
+GLOBAL_SCOPE = '*'
+RECONCILE_BATCH_SIZE = 50
+RECONCILE_INTERVAL_SECONDS = 300
+
+USAGE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS storage_usage (
+        scope TEXT NOT NULL,
+        file_type TEXT NOT NULL DEFAULT '',
+        total_size BIGINT NOT NULL DEFAULT 0,
+        file_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT,
+        PRIMARY KEY (scope, file_type)
+    )
+'''
+
+STATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS storage_usage_state (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    )
+'''
+
+# 사용량 원본 테이블: 프로젝트별 파일 형식 합계
+USAGE_SOURCES = {
+    'project_files_enhanced': '''
+        SELECT file_type, COALESCE(SUM(file_size), 0), COUNT(*)
+        FROM project_files_enhanced WHERE project_id = ? GROUP BY file_type
+    ''',
+    'documents': '''
+        SELECT file_type, COALESCE(SUM(file_size), 0), COUNT(*)
+        FROM documents WHERE project_id = ? AND status != 'deleted' GROUP BY file_type
+    '''
+}
+
+def ensure_usage_tables(conn):
+    """사용량 카운터 / blob 참조 테이블 생성 (시작 시 한 번, 마이그레이션 006 과 같은 정의)"""
+    conn.execute(USAGE_TABLE_SQL)
+    conn.execute(STATE_TABLE_SQL)
+    conn.execute(BLOB_TABLE_SQL)
+    conn.commit()
+
+def normalize_file_type(file_type):
+    """'.PDF', 'pdf', 'a.pdf' -> 'pdf'"""
+    file_type = (file_type or '').lower()
+    if '.' in file_type:
+        file_type = os.path.splitext(file_type)[1] or file_type
+    return file_type.lstrip('.')
+
+def record_usage(conn, project_id, file_type, size, count=1):
+    """업로드(+)/삭제(-) 시 프로젝트 및 전체 사용량 반영 (커밋은 호출자가 수행)
+    
+    파일 행과 같은 트랜잭션으로 커밋되므로 카운터와 실제 기록이 어긋나지 않습니다.
+    """
+    now = datetime.now().isoformat()
+    for scope in (project_id, GLOBAL_SCOPE):
+        conn.execute('''
+            INSERT INTO storage_usage (scope, file_type, total_size, file_count, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(scope, file_type) DO UPDATE SET
+                total_size = storage_usage.total_size + excluded.total_size,
+                file_count = storage_usage.file_count + excluded.file_count,
+                updated_at = excluded.updated_at
+        ''', (scope, normalize_file_type(file_type), size or 0, count, now))
+
+def get_usage(conn, project_id=None):
+    """유지 중인 카운터로 사용량 조회 (파일시스템을 읽지 않음)"""
+    rows = conn.execute('''
+        SELECT file_type, total_size, file_count FROM storage_usage
+        WHERE scope = ? AND file_count > 0
+        ORDER BY total_size DESC
+    ''', (project_id or GLOBAL_SCOPE,)).fetchall()
+    
+    total_size = sum(row[1] for row in rows)
+    usage = {
+        'total_size': total_size,
+        'file_count': sum(row[2] for row in rows),
+        'total_size_mb': round(total_size / (1024 * 1024), 2),
+        'total_size_gb': round(total_size / (1024 * 1024 * 1024), 2),
+        'file_types': [
+            {'file_type': row[0], 'count': row[2], 'total_size': row[1]} for row in rows
+        ]
+    }
+    
+    if project_id is None:
+        # 중복 제거 후 실제 디스크 사용량 (blob 기준)
+        try:
+            stored = conn.execute(
+                'SELECT COALESCE(SUM(size), 0), COUNT(*) FROM file_blobs WHERE ref_count > 0'
+            ).fetchone()
+            usage['stored_size'], usage['stored_blob_count'] = stored[0], stored[1]
+        except sqlite3.OperationalError:
+            pass  # blob 저장소를 아직 사용하지 않음
+    return usage
+
+def _project_totals(conn, project_id):
+    totals = {}
+    for sql in USAGE_SOURCES.values():
+        try:
+            rows = conn.execute(sql, (project_id,)).fetchall()
+        except sqlite3.OperationalError:
+            continue  # 테이블이 없는 배포
+        for file_type, size, count in rows:
+            entry = totals.setdefault(normalize_file_type(file_type), [0, 0])
+            entry[0] += size
+            entry[1] += count
+    return totals
+
+def reconcile_project(conn, project_id):
+    """한 프로젝트의 카운터를 원본 테이블에서 다시 계산 -> 보정한 형식 수
+    
+    쓰기 잠금(begin_write) 안에서 계산하므로 동시에 진행 중인 업로드/삭제의
+    증감과 섞이지 않으며, 차이만큼 전체 카운터에도 반영합니다.
+    """
+    conn.commit()
+    begin_write(conn, 'storage_usage')
+    try:
+        actual = _project_totals(conn, project_id)
+        current = {
+            row[0]: [row[1], row[2]] for row in conn.execute(
+                'SELECT file_type, total_size, file_count FROM storage_usage WHERE scope = ?',
+                (project_id,)
+            ).fetchall()
+        }
+        
+        corrected = 0
+        for file_type in set(actual) | set(current):
+            actual_size, actual_count = actual.get(file_type, (0, 0))
+            current_size, current_count = current.get(file_type, (0, 0))
+            if actual_size != current_size or actual_count != current_count:
+                record_usage(conn, project_id, file_type,
+                             actual_size - current_size, actual_count - current_count)
+                corrected += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return corrected
+
+def reconcile_global(conn):
+    """전체 카운터를 프로젝트 카운터 합계로 다시 설정 (카운터 테이블만 읽음)"""
+    conn.commit()
+    begin_write(conn, 'storage_usage')
+    try:
+        conn.execute('DELETE FROM storage_usage WHERE scope = ?', (GLOBAL_SCOPE,))
+        conn.execute('''
+            INSERT INTO storage_usage (scope, file_type, total_size, file_count, updated_at)
+            SELECT ?, file_type, SUM(total_size), SUM(file_count), ?
+            FROM storage_usage WHERE scope != ? GROUP BY file_type
+        ''', (GLOBAL_SCOPE, datetime.now().isoformat(), GLOBAL_SCOPE))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def _next_projects(conn, cursor, batch_size):
+    candidates = set()
+    queries = [f'SELECT DISTINCT project_id FROM {table} WHERE project_id > ? ORDER BY project_id LIMIT ?'
+               for table in USAGE_SOURCES]
+    # 파일이 모두 삭제된 프로젝트의 남은 카운터도 정리
+    queries.append('SELECT DISTINCT scope FROM storage_usage WHERE scope > ? AND scope != ? ORDER BY scope LIMIT ?')
+    for sql in queries:
+        params = (cursor, GLOBAL_SCOPE, batch_size) if 'storage_usage' in sql else (cursor, batch_size)
+        try:
+            candidates.update(row[0] for row in conn.execute(sql, params).fetchall() if row[0])
+        except sqlite3.OperationalError:
+            continue
+    return sorted(candidates)[:batch_size]
+
+def reconcile_usage(conn, batch_size=RECONCILE_BATCH_SIZE, restart=False):
+    """다음 프로젝트 묶음의 카운터 재계산 (저장된 커서부터 이어서 진행)
+    
+    한 바퀴를 마치면 전체 카운터를 프로젝트 합계로 맞추고 처음부터 다시 시작합니다.
+    """
+    row = conn.execute("SELECT value FROM storage_usage_state WHERE name = 'reconcile_cursor'").fetchone()
+    cursor = row[0] if row and not restart else ''
+    
+    projects = _next_projects(conn, cursor, batch_size)
+    corrected = sum(reconcile_project(conn, project_id) for project_id in projects)
+    
+    completed_pass = len(projects) < batch_size
+    if completed_pass:
+        reconcile_global(conn)
+    conn.execute('''
+        INSERT INTO storage_usage_state (name, value) VALUES ('reconcile_cursor', ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', ('' if completed_pass else projects[-1],))
+    conn.commit()
+    
+    return {'projects': len(projects), 'corrected': corrected, 'completed_pass': completed_pass}
+
+def take_reconcile_lease(conn, owner, seconds):
+    """재계산 담당 프로세스 임대 (storage_usage_state 의 한 행) -> 이번 주기를 맡으면 True
+    
+    다른 프로세스의 임대가 끝나지 않았으면 False. 담당 프로세스는 주기마다 갱신하므로
+    여러 워커 / 노드 중 하나만 재계산하고, 그 프로세스가 죽으면 임대가 끝난 뒤 넘어갑니다.
+    """
+    begin_write(conn, 'storage_usage_state')
+    try:
+        row = conn.execute("SELECT value FROM storage_usage_state WHERE name = 'reconcile_lease'").fetchone()
+        if row and row[0]:
+            holder, expires_at = row[0].rsplit(' ', 1)
+            if holder != owner and float(expires_at) > time.time():
+                conn.rollback()
+                return False
+        conn.execute('''
+            INSERT INTO storage_usage_state (name, value) VALUES ('reconcile_lease', ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        ''', (f"{owner} {time.time() + seconds}",))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+class UsageReconciler:
+    """사용량 카운터 백그라운드 재계산 (주기마다 프로젝트 한 묶음씩)
+    
+    모든 워커에서 시작해도 임대 (take_reconcile_lease) 를 잡은 한 프로세스만 재계산합니다.
+    db_path 가 None 이면 라우트와 같은 연결 풀 (SQLITE_DB_PATH / DATABASE_URL) 을 씁니다.
+    """
+    
+    def __init__(self, db_path=None, interval=RECONCILE_INTERVAL_SECONDS,
+                 batch_size=RECONCILE_BATCH_SIZE):
+        self.db_path = db_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='storage-usage-reconciler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def run_once(self):
+        """이번 주기 재계산 (다른 프로세스가 담당 중이면 None)"""
+        conn = get_connection(self.db_path)
+        try:
+            # 한 주기를 건너뛰어도 넘겨받지 않도록 임대는 두 주기 동안 유지
+            if not take_reconcile_lease(conn, self.owner, self.interval * 2):
+                return None
+            return reconcile_usage(conn, self.batch_size)
+        finally:
+            conn.close()
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Storage usage reconciliation failed: {e}")
+        release_thread_connections(self.db_path)
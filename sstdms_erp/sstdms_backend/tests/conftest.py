@@ -0,0 +1,45 @@
+import os
+import socket
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# 앱 모듈은 src 기준 import (utils.*, routes.*), 알림 모듈은 notification 폴더 기준 import
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.join(SRC, 'notification'))
+
+REJECTED = "nobody@example.com"
+
+class _Handler:
+    """Accepts every message except for REJECTED (550)."""
+    
+    def __init__(self):
+        self.received = []
+    
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    """Local SMTP server (aiosmtpd) -> (controller, handler)"""
+    Controller = pytest.importorskip("aiosmtpd.controller").Controller
+    handler = _Handler()
+    # The server drops sessions idle for 1 s, as real relays do after their timeout
+    controller = Controller(handler, hostname="127.0.0.1", port=_free_port(), timeout=1)
+    controller.start()
+    yield controller, handler
+    controller.stop()
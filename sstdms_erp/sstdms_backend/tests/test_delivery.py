@@ -0,0 +1,191 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from delivery import ChannelPolicy, ProviderThrottled, fcm_channel, kakao_channel
+from queue_manager import NotificationQueueManager
+
+class _FakeFCMProvider:
+    """Local stand-in for the FCM endpoint.
+    
+    Enforces its own limit of `rate` messages per second (429 with Retry-After
+    beyond it), fails each token with "Unavailable" at unavailable_rate, and
+    answers every request with a 503 during the outage window.
+    """
+    
+    def __init__(self, rate: float, unavailable_rate: float = 0.0, outage: tuple = (0.0, 0.0)):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.unavailable_rate = unavailable_rate
+        self.started = time.monotonic()
+        self.outage = outage
+        self.requests = 0
+        self.throttled = 0
+        self.unavailable = 0
+        self.delivered: List[str] = []
+        self.request_times: List[float] = []
+    
+    def send_fcm_multicast(self, device_tokens: List[str], title: str, body: str,
+                           data: Dict[str, Any] = None) -> Dict[str, Any]:
+        time.sleep(0.01)  # network round trip
+        now = time.monotonic()
+        self.requests += 1
+        self.request_times.append(now - self.started)
+        if self.outage[0] <= now - self.started < self.outage[1]:
+            self.unavailable += 1
+            return {"status": "error", "message": "503 Service Unavailable", "http_status": 503}
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < len(device_tokens):
+            self.throttled += 1
+            return {"status": "error", "message": "429 Too Many Requests", "http_status": 429, "retry_after": "1"}
+        self.tokens -= len(device_tokens)
+        results = []
+        for token in device_tokens:
+            if random.random() < self.unavailable_rate:
+                results.append({"error": "Unavailable"})
+            else:
+                self.delivered.append(token)
+                results.append({"message_id": f"m-{token}"})
+        return {"success": sum("message_id" in r for r in results), "failure": sum("error" in r for r in results),
+                "results": results}
+
+async def _send_notice(provider, recipients: int, policy: ChannelPolicy, payloads: int = 1) -> Dict[str, Any]:
+    """A deployment notice to `recipients` devices through an FCM channel -> run summary."""
+    manager = NotificationQueueManager(max_workers=5, retry_delay=1, max_retry_delay=10)
+    manager.register_channel("push", fcm_channel(provider, policy))
+    
+    await manager.start()
+    started = time.perf_counter()
+    for i in range(recipients):
+        await manager.add_notification(
+            user_id=i, notification_type="push", title="배포 안내", message="새 버전이 배포되었습니다.",
+            data={"device_token": f"device-{i}", "payload": {"group": i % payloads}}
+        )
+    while len(manager.completed_tasks) + len(manager.failed_tasks) < recipients:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    stats = manager.get_queue_stats()["channels"]["push"]
+    await manager.stop()
+    
+    per_second: Dict[int, int] = {}
+    for moment in provider.request_times:
+        per_second[int(moment)] = per_second.get(int(moment), 0) + 1
+    return {
+        "seconds": elapsed,
+        "sent": len(manager.completed_tasks),
+        "failed": len(manager.failed_tasks),
+        "duplicates": len(provider.delivered) - len(set(provider.delivered)),
+        "max_requests_per_second": max(per_second.values()),
+        "circuit": stats["circuit"],
+        "deferred": stats["deferred"]
+    }
+
+def _policy(rate: float, **overrides) -> ChannelPolicy:
+    options = dict(rate=rate, burst=rate * 0.5, batch_size=50, failure_threshold=3, reset_timeout=2)
+    options.update(overrides)
+    return ChannelPolicy(**options)
+
+def test_policy_below_provider_limit_gets_no_429():
+    provider = _FakeFCMProvider(rate=100)
+    result = asyncio.run(_send_notice(provider, 200, _policy(95)))
+    assert provider.throttled == 0
+    assert result["sent"] == 200 and result["duplicates"] == 0
+
+def test_policy_above_provider_limit_pauses_instead_of_storming():
+    provider = _FakeFCMProvider(rate=100)
+    result = asyncio.run(_send_notice(provider, 200, _policy(200, burst=100)))
+    # Each 429 pauses the channel for Retry-After, so there are a few, not one per retry
+    assert 0 < provider.throttled <= 5
+    assert result["max_requests_per_second"] <= 10
+    assert result["sent"] == 200 and result["duplicates"] == 0
+
+def test_retryable_token_errors_are_not_delivered_twice():
+    provider = _FakeFCMProvider(rate=1000, unavailable_rate=0.1)
+    result = asyncio.run(_send_notice(provider, 200, _policy(500)))
+    assert result["duplicates"] == 0
+    assert result["sent"] == len(set(provider.delivered))
+
+def test_circuit_parks_the_notice_during_an_outage_and_recovers():
+    provider = _FakeFCMProvider(rate=100, outage=(0.2, 2.5))
+    result = asyncio.run(_send_notice(provider, 200, _policy(95)))
+    assert result["deferred"] > 0
+    assert result["circuit"] == "closed"
+    assert result["sent"] == 200 and result["duplicates"] == 0
+
+class _Task:
+    def __init__(self, task_id: str, data: Dict[str, Any], title: str = "t", message: str = "m"):
+        self.id = task_id
+        self.data = data
+        self.title = title
+        self.message = message
+
+class _ThrottlingProvider:
+    """Delivers the first multicast, then answers 429 `throttle` times."""
+    
+    def __init__(self, throttle: int = 1):
+        self.throttle = throttle
+        self.calls = 0
+        self.delivered: List[str] = []
+        self.request_times: List[float] = []
+    
+    def send_fcm_multicast(self, device_tokens, title, body, data=None):
+        self.calls += 1
+        self.request_times.append(0.0)
+        if self.calls > 1 and self.throttle:
+            self.throttle -= 1
+            return {"status": "error", "message": "429 Too Many Requests", "http_status": 429, "retry_after": "0.1"}
+        self.delivered.extend(device_tokens)
+        return {"results": [{"message_id": token} for token in device_tokens]}
+
+def test_throttled_half_open_trial_closes_the_circuit():
+    provider = _ThrottlingProvider(throttle=1)
+    provider.calls = 1  # the trial call is throttled
+    channel = fcm_channel(provider, _policy(1000, failure_threshold=1, reset_timeout=0.01))
+    channel.breaker.record_failure()
+    time.sleep(0.02)
+    assert channel.breaker.retry_after() == 0.0  # trial let through
+    
+    task = _Task("1", {"device_token": "device-1"})
+    with pytest.raises(ProviderThrottled):
+        asyncio.run(channel.deliver([task]))
+    assert channel.breaker.state == "closed"
+    assert channel.breaker.retry_after() == 0.0
+
+def test_throttled_second_group_requeues_only_unsent_tasks():
+    provider = _ThrottlingProvider(throttle=1)
+    # Two payloads -> two multicast requests per batch; the second one is throttled
+    result = asyncio.run(_send_notice(provider, 20, _policy(1000), payloads=2))
+    assert provider.calls == 3
+    assert result["sent"] == 20
+    assert sorted(provider.delivered) == sorted(f"device-{i}" for i in range(20))
+
+class _FailingKakao:
+    """Kakao API whose second request fails with a server error."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.delivered: List[str] = []
+    
+    def send_text_messages(self, receiver_uuids, text):
+        self.calls += 1
+        if self.calls == 2:
+            return {"code": -1, "msg": "internal error"}
+        self.delivered.extend(receiver_uuids)
+        return {"successful_receiver_uuids": list(receiver_uuids)}
+
+def test_kakao_failure_reports_chunks_already_sent():
+    api = _FailingKakao()
+    channel = kakao_channel(api, ChannelPolicy(rate=100, batch_size=10))
+    tasks = [_Task(str(i), {"kakao_uuid": f"uuid-{i}"}) for i in range(10)]
+    
+    with pytest.raises(Exception) as info:
+        asyncio.run(channel.deliver(tasks))
+    completed: Optional[Dict[str, Any]] = info.value.completed
+    assert sorted(completed) == [str(i) for i in range(5)]
+    assert all(result.ok for result in completed.values())
+    assert api.delivered == [f"uuid-{i}" for i in range(5)]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from flask import Flask
+
+from conftest import REJECTED
+from delivery import ChannelPolicy, email_channel
+from queue_manager import NotificationQueueManager
+from queue_store import NotificationStore
+from utils.email_sender import EmailSender
+import routes.notification_api as notification_api
+
+@pytest.fixture
+def client(smtp_server, tmp_path, monkeypatch):
+    controller, handler = smtp_server
+    queue = NotificationQueueManager(store=NotificationStore(str(tmp_path / 'queue.db'), database_url=None))
+    sender = EmailSender(controller.hostname, controller.port, None, None, use_tls=False)
+    
+    def register(manager):
+        policy = ChannelPolicy(rate=50, batch_size=10)
+        manager.register_channel('email', email_channel(sender, 'noreply@example.com', policy))
+    
+    monkeypatch.setattr(notification_api, 'notification_queue', queue)
+    monkeypatch.setattr(notification_api, 'register_default_handlers', register)
+    monkeypatch.setattr(notification_api, '_queue_loop', None)
+    monkeypatch.setattr(notification_api, 'DEPLOYMENT_POLL_INTERVAL', 0.05)
+    
+    app = Flask(__name__)
+    app.register_blueprint(notification_api.notification_bp, url_prefix='/api')
+    yield app.test_client(), handler
+    
+    loop = notification_api._queue_loop
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(queue.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    sender.close()
+    queue.store.close()
+
+def _notice(**fields):
+    body = {'project_name': 'P1', 'drawing_name': 'GA', 'deployed_by': 'kim',
+            'recipients': ['a@example.com', 'b@example.com', REJECTED], 'admin_email': 'admin@example.com'}
+    body.update(fields)
+    return body
+
+def test_notice_goes_through_the_queue_with_per_recipient_results(client):
+    client, handler = client
+    response = client.post('/api/send_deployment_notification', json=_notice(wait=True))
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['success_count'] == 2
+    assert [failure['email'] for failure in body['failed_recipients']] == [REJECTED]
+    assert '550' in body['failed_recipients'][0]['error']
+    assert body['admin_notification'] is True
+    
+    status = client.get(f"/api/deployment_notifications/{body['job_id']}").get_json()
+    assert status['status'] == 'completed'
+    assert {result['email']: result['status'] for result in status['results']} == {
+        'a@example.com': 'sent', 'b@example.com': 'sent', REJECTED: 'failed'}
+    assert sorted(handler.received) == ['a@example.com', 'admin@example.com', 'b@example.com']
+
+def test_repeated_request_with_the_same_job_id_sends_once(client):
+    client, handler = client
+    for _ in range(2):
+        response = client.post('/api/send_deployment_notification',
+                               json=_notice(job_id='deploy-1', recipients=['a@example.com'], wait=True))
+        assert response.status_code == 200
+    assert sorted(handler.received) == ['a@example.com', 'admin@example.com']
+
+def test_unknown_job_is_404(client):
+    client, _ = client
+    assert client.get('/api/deployment_notifications/missing').status_code == 404
@@ -0,0 +1,67 @@
+import pytest
+from flask import Flask
+
+from models.user import db
+# 외래 키 대상 테이블 (projects, project_folders) 등록
+from models.document import Project  # noqa: F401
+from models.project_permission import ProjectFolder  # noqa: F401
+from models.drawing import DrawingListEntry, DrawingListVersion
+import routes.drawing as drawing
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(drawing.drawing_bp, url_prefix='/api')
+    drawing.export_cache.clear()
+    with app.app_context():
+        db.create_all()
+        DrawingListEntry.replace_project_drawings('P1', [
+            {'no': f'D-{i:03d}', 'dwg_name': f'Drawing {i}', 'start_date': '2024-01-01'} for i in range(50)
+        ])
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        yield client
+
+@pytest.fixture
+def row_reads(monkeypatch):
+    reads = []
+    original = DrawingListEntry.iter_for_project.__func__
+    
+    def counting(cls, project_id, batch_size=1000):
+        reads.append(project_id)
+        return original(cls, project_id, batch_size)
+    
+    monkeypatch.setattr(DrawingListEntry, 'iter_for_project', classmethod(counting))
+    return reads
+
+def test_unchanged_list_is_served_without_reading_rows(client, row_reads):
+    first = client.get('/api/drawings/P1/export')
+    assert first.status_code == 200
+    assert row_reads == ['P1']
+    
+    second = client.get('/api/drawings/P1/export')
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert row_reads == ['P1']
+    
+    not_modified = client.get('/api/drawings/P1/export', headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert row_reads == ['P1']
+
+def test_version_bump_invalidates_export(client, row_reads):
+    etag = client.get('/api/drawings/P1/export').headers['ETag']
+    DrawingListVersion.bump('P1')
+    db.session.commit()
+    
+    response = client.get('/api/drawings/P1/export', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert row_reads == ['P1', 'P1']
+
+def test_project_without_drawings_is_404(client):
+    assert client.get('/api/drawings/P2/export').status_code == 404
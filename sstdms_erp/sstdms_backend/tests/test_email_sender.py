@@ -0,0 +1,46 @@
+import time
+
+from conftest import REJECTED
+from utils.email_sender import EmailSender
+
+def _sender(controller, **options):
+    return EmailSender(controller.hostname, controller.port, None, None, use_tls=False, **options)
+
+def _batch(count, rejected=()):
+    return [{'receiver_email': address, 'subject': 'SSTDMS', 'body': f'메시지 {i}'}
+            for i, address in enumerate([f'user{i}@example.com' for i in range(count)] + list(rejected))]
+
+def test_batch_reuses_pooled_sessions(smtp_server):
+    controller, handler = smtp_server
+    sender = _sender(controller, pool_size=4)
+    results = sender.send_batch('noreply@example.com', _batch(100))
+    sender.close()
+    
+    assert all(result['success'] for result in results)
+    assert sorted(handler.received) == sorted(f'user{i}@example.com' for i in range(100))
+    assert sender.stats['connections'] <= 4
+
+def test_rejected_recipient_gets_a_permanent_result(smtp_server):
+    controller, handler = smtp_server
+    sender = _sender(controller, pool_size=2)
+    results = sender.send_batch('noreply@example.com', _batch(5, rejected=[REJECTED]))
+    sender.close()
+    
+    by_email = {result['email']: result for result in results}
+    assert not by_email[REJECTED]['success'] and by_email[REJECTED]['permanent']
+    assert '550' in by_email[REJECTED]['message']
+    assert sum(result['success'] for result in results) == 5
+    # The refusal does not cost the session
+    assert sender.stats['connections'] <= 2
+
+def test_session_closed_while_idle_reconnects(smtp_server):
+    controller, handler = smtp_server
+    sender = _sender(controller, pool_size=1)
+    assert sender.send_email('noreply@example.com', 'a@example.com', 's', 'b')[0]
+    time.sleep(1.5)  # the server closes the idle session
+    
+    success, message = sender.send_email('noreply@example.com', 'b@example.com', 's', 'b')
+    sender.close()
+    assert success, message
+    assert sender.stats['reconnects'] == 1
+    assert handler.received == ['a@example.com', 'b@example.com']
@@ -0,0 +1,40 @@
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+
+from excel_processor import iter_excel_chunks
+from routes.excel import _cell
+
+def _workbook(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def test_index_keeps_sheet_row_numbers_across_blank_rows():
+    source = _workbook([
+        ['사용자명', '부서'],
+        ['a', '설계팀'],
+        [None, None],
+        ['b', None],
+        [None, None],
+        [None, None],
+        ['c', '품질팀'],
+    ])
+    chunks = list(iter_excel_chunks(source, chunk_size=2))
+    # 시트 행 번호 = index + 2 (헤더가 1행)
+    rows = {row['사용자명']: index + 2 for df in chunks for index, row in df.iterrows()}
+    assert rows == {'a': 2, 'b': 4, 'c': 7}
+
+def test_empty_optional_cells_use_defaults():
+    source = _workbook([['사용자명', '부서', '역할'], ['a', None, None]])
+    row = next(iter_excel_chunks(source)).iloc[0]
+    assert _cell(row, '부서', '') == ''
+    assert _cell(row, '역할', 'user') == 'user'
+    assert _cell(row, '언어', 'ko') == 'ko'
+    assert _cell(pd.Series({'부서': float('nan')}), '부서', '') == ''
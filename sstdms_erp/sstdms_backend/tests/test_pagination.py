@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+from utils.pagination import STREAM_BATCH_SIZE, PageRequest, encode_cursor, stream_listing
+
+ROWS = [{'id': i} for i in range(1, 2001)]
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+def fetch_rows(cursor, size):
+    start = cursor[1] if cursor else 0
+    return ROWS[start:start + size]
+
+def list_page(app, **args):
+    with app.test_request_context():
+        page = PageRequest(MultiDict(args), ('id',), 'id', 'asc')
+        response = stream_listing(page, fetch_rows, lambda row: (row['id'], row['id']), dict, key='items')
+        return json.loads(response.get_data())
+
+@pytest.mark.parametrize('limit', [STREAM_BATCH_SIZE - 1, STREAM_BATCH_SIZE, STREAM_BATCH_SIZE + 1, 2 * STREAM_BATCH_SIZE])
+def test_page_at_batch_boundary_reports_more(app, limit):
+    body = list_page(app, limit=limit)
+    assert [row['id'] for row in body['items']] == list(range(1, limit + 1))
+    assert body['has_more'] is True
+    assert body['next_cursor']
+
+def test_paging_with_batch_sized_limit_reaches_every_row(app):
+    seen, cursor = [], None
+    while True:
+        args = {'limit': STREAM_BATCH_SIZE}
+        if cursor:
+            args['cursor'] = cursor
+        body = list_page(app, **args)
+        seen.extend(row['id'] for row in body['items'])
+        if not body['has_more']:
+            break
+        cursor = body['next_cursor']
+    assert seen == [row['id'] for row in ROWS]
+
+def test_last_page_has_no_cursor(app):
+    body = list_page(app, limit=STREAM_BATCH_SIZE, cursor=encode_cursor(1500, 1500))
+    assert [row['id'] for row in body['items']] == list(range(1501, 2001))
+    assert body['has_more'] is False
+    assert body['next_cursor'] is None
+
+def test_unpaged_listing_returns_everything(app):
+    with app.test_request_context():
+        page = PageRequest(MultiDict(), ('id',), 'id', 'asc')
+        response = stream_listing(page, fetch_rows, lambda row: (row['id'], row['id']), dict)
+        assert len(json.loads(response.get_data())) == len(ROWS)
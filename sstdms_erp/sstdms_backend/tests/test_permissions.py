@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from utils.permissions import PermissionResolver
+
+SCHEMA = '''
+    CREATE TABLE users (id INTEGER PRIMARY KEY, role TEXT);
+    CREATE TABLE project_permissions (user_id INTEGER, project_id TEXT, permission_type TEXT);
+    CREATE TABLE permission_versions (id INTEGER PRIMARY KEY, version INTEGER, updated_at TEXT);
+    CREATE TABLE project_folders (id INTEGER PRIMARY KEY, project_id TEXT);
+    CREATE TABLE folder_permissions (folder_id INTEGER, user_id INTEGER, permission_type TEXT);
+    INSERT INTO users VALUES (1, 'user');
+    INSERT INTO project_permissions VALUES (1, 'P1', 'write');
+    INSERT INTO project_folders VALUES (10, 'P1');
+'''
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'perm.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+def test_revoke_in_one_worker_reaches_another(db_path):
+    # 두 워커 = 각자 프로세스 캐시를 가진 두 resolver
+    worker_a, worker_b = PermissionResolver(ttl=3600), PermissionResolver(ttl=3600)
+    conn_a, conn_b = sqlite3.connect(db_path), sqlite3.connect(db_path)
+    try:
+        assert worker_b.has_project_permission(conn_b, 1, 'P1', 'write')
+        
+        conn_a.execute("DELETE FROM project_permissions WHERE user_id = 1 AND project_id = 'P1'")
+        worker_a.invalidate(1, conn_a)
+        conn_a.commit()
+        
+        assert not worker_b.has_project_permission(conn_b, 1, 'P1', 'read')
+        assert not worker_a.has_project_permission(conn_a, 1, 'P1', 'read')
+    finally:
+        conn_a.close()
+        conn_b.close()
+
+def test_cached_map_is_reused_while_version_unchanged(db_path):
+    resolver = PermissionResolver(ttl=3600)
+    conn = sqlite3.connect(db_path)
+    try:
+        first = resolver.get_map(conn, 1)
+        assert resolver.get_map(conn, 1) is first
+    finally:
+        conn.close()
+
+def test_check_folders_rejects_non_numeric_ids(db_path):
+    resolver = PermissionResolver()
+    conn = sqlite3.connect(db_path)
+    try:
+        assert resolver.check_folders(conn, 1, ['10'], 'write') == {10: True}
+        with pytest.raises(ValueError):
+            resolver.check_folders(conn, 1, ['abc'])
+    finally:
+        conn.close()
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from delivery import ChannelPolicy, DeliveryChannel, DeliveryResult
+from queue_manager import (NotificationPriority, NotificationQueueManager, NotificationStatus,
+                           NotificationTask, benchmark_shared_dispatch, run_dispatchers)
+from queue_store import NotificationStore
+
+def _task(store, notification_type="email", scheduled_at=None):
+    task = NotificationTask(
+        id=str(uuid.uuid4()), user_id=1, notification_type=notification_type, title="t", message="m", data={},
+        priority=NotificationPriority.NORMAL, status=NotificationStatus.PENDING, created_at=datetime.now(),
+        scheduled_at=scheduled_at
+    )
+    store.enqueue(task.to_dict())
+    return task
+
+def _failed_task(store):
+    task = _task(store)
+    store.fail(task.id, 3, "boom")
+    return task.id
+
+def test_shared_retry_only_reschedules_in_store(tmp_path):
+    store = NotificationStore(str(tmp_path / "queue.db"), database_url=None)
+    task_id = _failed_task(store)
+    manager = NotificationQueueManager(store=store, shared=True)
+    
+    assert asyncio.run(manager.retry_failed_task(task_id))
+    
+    # Not queued locally: a dispatcher claims it from the store exactly once
+    assert manager._ready == []
+    assert store.get(task_id)["status"] == "pending"
+    assert [row["id"] for row in store.claim("dispatcher", 10)] == [task_id]
+    assert store.claim("other-dispatcher", 10) == []
+    store.close()
+
+def test_local_retry_queues_the_task(tmp_path):
+    store = NotificationStore(str(tmp_path / "queue.db"), database_url=None)
+    task_id = _failed_task(store)
+    manager = NotificationQueueManager(store=store)
+    
+    assert asyncio.run(manager.retry_failed_task(task_id))
+    assert [entry[2].id for entry in manager._ready] == [task_id]
+    store.close()
+
+def test_dispatcher_processes_deliver_each_task_once():
+    result, = benchmark_shared_dispatch(tasks=300, process_counts=(3,), workers_per_process=3, handler_delay=0.001)
+    assert result["duplicate_deliveries"] == 0
+    assert sum(result["per_process"]) == 300
+
+def test_extend_lease_only_renews_the_current_owner(tmp_path):
+    store = NotificationStore(str(tmp_path / "queue.db"), visibility_timeout=0.05, database_url=None)
+    first, second = _task(store), _task(store)
+    claimed = [row["id"] for row in store.claim("a", 2)]
+    assert sorted(store.extend_lease(claimed, "a")) == sorted(claimed)
+    assert store.extend_lease(claimed, "b") == []
+    
+    time.sleep(0.1)
+    assert len(store.claim("b", 1)) == 1  # one expired lease goes to b, the other back to the queue
+    assert store.extend_lease([first.id, second.id], "a") == []
+    store.close()
+
+def _counting_channel(rate, sent):
+    async def send_batch(tasks):
+        sent.extend(task.id for task in tasks)
+        return [DeliveryResult(True) for _ in tasks]
+    return DeliveryChannel("counting", send_batch, ChannelPolicy(rate=rate, burst=1, batch_window=0))
+
+def test_buffered_tasks_past_the_visibility_timeout_are_sent_once(tmp_path):
+    async def run():
+        db_path = str(tmp_path / "queue.db")
+        ids = [_task(NotificationStore(db_path, database_url=None), "counting").id for _ in range(30)]
+        sent = []
+        managers = []
+        for _ in range(2):
+            manager = NotificationQueueManager(
+                store=NotificationStore(db_path, visibility_timeout=0.5, database_url=None),
+                shared=True, poll_interval=0.05
+            )
+            # 30 tasks at 20/s wait up to 1.5s in the buffers, past the 0.5s lease
+            manager.register_channel("counting", _counting_channel(20, sent))
+            managers.append(manager)
+            await manager.start()
+        deadline = time.monotonic() + 10
+        while managers[0].store.counts().get("sent", 0) < len(ids) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for manager in managers:
+            await manager.stop()
+        return ids, sent
+    
+    ids, sent = asyncio.run(run())
+    assert sorted(sent) == sorted(ids)
+
+RATE_TEST_RATE = 20
+
+def _rate_limited_setup(manager):
+    """Dispatcher setup for the shared rate limit test: logs the time of every send."""
+    log_path = os.environ["NOTIFICATION_RATE_TEST_LOG"]
+    
+    async def send_batch(tasks):
+        with open(log_path, "a") as f:
+            for _ in tasks:
+                f.write(f"{time.time()} {os.getpid()}\n")
+        return [DeliveryResult(True) for _ in tasks]
+    
+    # A small buffer so that both dispatchers claim part of the queue
+    manager.register_channel("limited", DeliveryChannel(
+        "limited", send_batch, ChannelPolicy(rate=RATE_TEST_RATE, burst=1, batch_window=0, max_pending=2)
+    ))
+
+def test_rate_limit_holds_across_dispatcher_processes(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "queue.db")
+    log_path = tmp_path / "sends.log"
+    monkeypatch.setenv("NOTIFICATION_RATE_TEST_LOG", str(log_path))
+    store = NotificationStore(db_path, database_url=None)
+    due_at = datetime.now() + timedelta(seconds=3)
+    tasks = 40
+    for _ in range(tasks):
+        _task(store, "limited", due_at)
+    
+    dispatchers = run_dispatchers(2, 2, _rate_limited_setup, db_path, None, wait=False)
+    try:
+        deadline = time.monotonic() + 30
+        while store.counts().get("sent", 0) < tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        for process in dispatchers:
+            process.terminate()
+        for process in dispatchers:
+            process.join()
+        store.close()
+    
+    sends = [line.split() for line in log_path.read_text().splitlines()]
+    times = sorted(float(moment) for moment, _ in sends)
+    assert len(times) == tasks
+    assert len({pid for _, pid in sends}) == 2
+    # One bucket for both processes: 40 sends at 20/s take about 2s (1s with a bucket each)
+    assert times[-1] - times[0] >= (tasks - 1) / RATE_TEST_RATE * 0.9
+    assert max(sum(1 for t in times if start <= t < start + 1) for start in times) <= RATE_TEST_RATE + 1
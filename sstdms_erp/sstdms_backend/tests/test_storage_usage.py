@@ -0,0 +1,69 @@
+import io
+import os
+import stat
+import time
+
+from utils.blob_store import BlobStore, collect_unreferenced_blobs
+from utils.database import get_connection
+from utils.storage_usage import (UsageReconciler, ensure_usage_tables, get_usage,
+                                 record_usage, take_reconcile_lease)
+
+def _connect(tmp_path):
+    conn = get_connection(str(tmp_path / 'app.db'))
+    ensure_usage_tables(conn)
+    return conn
+
+def test_counters_need_no_per_call_ddl(tmp_path):
+    conn = _connect(tmp_path)
+    try:
+        record_usage(conn, 'P1', '.PDF', 100)
+        record_usage(conn, 'P1', 'pdf', 50)
+        conn.commit()
+        usage = get_usage(conn, 'P1')
+        assert usage['total_size'] == 150 and usage['file_count'] == 2
+        assert get_usage(conn)['file_types'] == [{'file_type': 'pdf', 'count': 2, 'total_size': 150}]
+        assert get_usage(conn)['stored_blob_count'] == 0
+    finally:
+        conn.close()
+
+def test_only_the_lease_holder_reconciles(tmp_path):
+    conn = _connect(tmp_path)
+    try:
+        assert take_reconcile_lease(conn, 'worker-a', 60)
+        assert not take_reconcile_lease(conn, 'worker-b', 60)
+        assert take_reconcile_lease(conn, 'worker-a', 0.05)  # 담당자는 갱신
+        time.sleep(0.1)
+        assert take_reconcile_lease(conn, 'worker-b', 60)  # 임대가 끝나면 넘겨받음
+    finally:
+        conn.close()
+
+def test_second_reconciler_skips_its_cycle(tmp_path):
+    _connect(tmp_path).close()
+    first = UsageReconciler(str(tmp_path / 'app.db'), interval=60)
+    second = UsageReconciler(str(tmp_path / 'app.db'), interval=60)
+    assert first.run_once() is not None
+    assert second.run_once() is None
+    assert first.run_once() is not None
+
+def test_blobs_and_their_links_are_read_only(tmp_path):
+    store = BlobStore(tmp_path / 'blobs')
+    blob_path, _, _, created = store.put_stream(io.BytesIO(b'drawing'))
+    link_path = store.link(blob_path, tmp_path / 'project' / 'a.dwg')
+    assert created
+    assert os.path.samefile(blob_path, link_path)
+    assert stat.S_IMODE(os.stat(link_path).st_mode) == 0o444
+
+def test_abandoned_upload_leaves_no_links_and_is_collected(tmp_path):
+    conn = _connect(tmp_path)
+    try:
+        store = BlobStore(tmp_path / 'blobs')
+        blob_path, digest, size, _ = store.put_stream(io.BytesIO(b'orphan'))
+        links = [store.link(blob_path, tmp_path / 'project' / 'a.pdf'),
+                 store.link(blob_path, tmp_path / 'backups' / 'a.pdf')]
+        store.abandon(conn, blob_path, digest, size, links)
+        
+        assert not any(path.exists() for path in links)
+        assert collect_unreferenced_blobs(conn, grace_seconds=0) == 1
+        assert not blob_path.exists()
+    finally:
+        conn.close()
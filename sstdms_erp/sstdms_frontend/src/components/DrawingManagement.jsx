@@ -468,7 +468,7 @@ const GanttChart = ({ projectId, onBack }) => {
       const response = await fetch(`/api/drawings/gantt/${projectId}`);
       if (response.ok) {
         const data = await response.json();
-        setGanttData(data);
+        setGanttData(data.gantt_data);
       }
     } catch (error) {
       console.error('Error fetching gantt data:', error);